@@ -0,0 +1,286 @@
+"""
+Cross-match aggregates
+
+Library-wide numbers (team results per map, player career stats, average
+economy by round) live in materialized tables (database.AGGREGATE_TABLES).
+Every demo contributes one set of partial rows, computed once when it is
+saved and added in the same transaction as its metadata; deleting the demo
+subtracts them again. Dashboard queries read the aggregate tables directly,
+so they cost the same whatever the size of the library.
+
+    python -m app.aggregates --check     # compare with a fresh recomputation
+    python -m app.aggregates --rebuild   # recompute from the stored demos
+"""
+
+import argparse
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app import analytics, artifacts, columnar, database, lineups, storage
+
+SIDES = ("CT", "T")
+SOURCE_TABLES = ("kills", "damages", "players", "rounds")
+
+# Stat sheet name -> agg_players column (openingKills -> opening_kills)
+PLAYER_COLUMNS = {name: re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower() for name in analytics.ROUND_STATS}
+
+Partials = Dict[str, List[Dict[str, Any]]]
+
+
+def match_tables(match_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, np.ndarray]]]:
+    """Header and decoded source tables of parser output held in memory"""
+    game_data = columnar.get_game_data(match_data)
+    header = match_data.get('header', game_data.get('header', {}))
+    return header, {name: columnar.rows_to_table(game_data.get(name) or []) for name in SOURCE_TABLES}
+
+
+def stored_tables(demo_id: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, np.ndarray]]]:
+    """Header and source tables of a saved demo (columnar store if built, else the JSON)"""
+    if columnar.has_columns(demo_id):
+        return columnar.load_header(demo_id), {name: columnar.load_table(demo_id, name) for name in SOURCE_TABLES}
+    return match_tables(storage.read_demo(demo_id))
+
+
+def _round_teams(sheet: Dict[str, Any]) -> List[Dict[str, Optional[str]]]:
+    """Team on each side in every round of a stat sheet (None where the kill feed does not tell)"""
+    team_names = sorted({str(t) for t in sheet["teams"] if t})
+    result = []
+    for i in range(len(sheet["roundNums"])):
+        sides = sheet["sides"][:, i]
+        teams = {}
+        for side in SIDES:
+            on_side = sheet["teams"][(sides == side) & (sheet["teams"] != '')]
+            teams[side] = str(on_side[0]) if len(on_side) else None
+        # With two teams, one known side gives the other
+        if len(team_names) == 2:
+            for side, other in (SIDES, SIDES[::-1]):
+                if teams[side] is None and teams[other] is not None:
+                    teams[side] = next(t for t in team_names if t != teams[other])
+        result.append(teams)
+    return result
+
+
+def demo_partials(header: Dict[str, Any], tables: Dict[str, Dict[str, np.ndarray]], map_name: str) -> Partials:
+    """
+    One demo's contribution to every aggregate table
+
+    Returns:
+        Dict of aggregate table -> rows (key, label and counted columns)
+    """
+    sheet = analytics.stat_sheet_from_tables(
+        header, tables['kills'], tables['damages'], tables['players'], tables['rounds']
+    )
+    rounds = tables['rounds']
+    n_rounds = len(sheet["roundNums"])
+    winner_by_round = {}
+    if rounds and 'winnerSide' in rounds:
+        winner_by_round = dict(zip(rounds['roundNum'].astype(np.int64).tolist(), rounds['winnerSide'].tolist()))
+
+    players = [
+        {
+            "steam_id": steam_id,
+            "name": str(sheet["names"][p]),
+            "demos": 1,
+            "rounds": n_rounds,
+            **{column: int(sheet["stats"][name][p].sum()) for name, column in PLAYER_COLUMNS.items()},
+        }
+        for p, steam_id in enumerate(sheet["steamIds"].tolist())
+    ]
+
+    # Team results: rounds won per team from the round winners' sides
+    won: Dict[str, int] = {}
+    played: Dict[str, int] = {}
+    for round_num, teams in zip(sheet["roundNums"].tolist(), _round_teams(sheet)):
+        winner = winner_by_round.get(round_num)
+        if winner not in SIDES or None in teams.values():
+            continue
+        for side, team in teams.items():
+            played[team] = played.get(team, 0) + 1
+            won[team] = won.get(team, 0) + int(side == winner)
+    team_maps = []
+    if len(played) == 2:
+        (team_a, team_b) = sorted(played)
+        for team, other in ((team_a, team_b), (team_b, team_a)):
+            team_maps.append({
+                "team": team,
+                "map_name": map_name,
+                "matches": 1,
+                "wins": int(won[team] > won[other]),
+                "losses": int(won[team] < won[other]),
+                "ties": int(won[team] == won[other]),
+                "rounds_won": won[team],
+                "rounds_lost": played[team] - won[team],
+            })
+
+    economy = []
+    for i in range(columnar.table_length(rounds)):
+        round_num = int(rounds['roundNum'][i])
+        for side, prefix in (("CT", "ct"), ("T", "t")):
+            if f'{prefix}StartMoney' not in rounds and f'{prefix}EquipmentValue' not in rounds:
+                continue
+            economy.append({
+                "map_name": map_name,
+                "round_num": round_num,
+                "side": side,
+                "rounds": 1,
+                "start_money": int(rounds[f'{prefix}StartMoney'][i]) if f'{prefix}StartMoney' in rounds else 0,
+                "equipment_value": int(rounds[f'{prefix}EquipmentValue'][i]) if f'{prefix}EquipmentValue' in rounds else 0,
+                "wins": int(winner_by_round.get(round_num) == side),
+            })
+
+    return {"agg_team_maps": team_maps, "agg_players": players, "agg_economy": economy}
+
+
+def match_partials(match_data: Dict[str, Any], map_name: str) -> Partials:
+    """
+    Partials of parser output being saved
+
+    Raises ValueError if they cannot be computed from it: the demo is then
+    rejected, as saving it would leave it out of the aggregates.
+    """
+    try:
+        header, tables = match_tables(match_data)
+        return demo_partials(header, tables, map_name)
+    except Exception as e:
+        raise ValueError(f"Cannot compute aggregate partials: {type(e).__name__}: {e}") from e
+
+
+def team_results(map_name: Optional[str] = None, team: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Matches, wins and round win rate of every team on every map"""
+    return [
+        {
+            "team": row["team"],
+            "mapName": row["map_name"],
+            "matches": row["matches"],
+            "wins": row["wins"],
+            "losses": row["losses"],
+            "ties": row["ties"],
+            "winRate": round(row["wins"] / row["matches"], 3),
+            "roundsWon": row["rounds_won"],
+            "roundsLost": row["rounds_lost"],
+            "roundWinRate": round(row["rounds_won"] / max(row["rounds_won"] + row["rounds_lost"], 1), 3),
+        }
+        for row in database.get_aggregates("agg_team_maps", order_by="matches", map_name=map_name, team=team)
+    ]
+
+
+def player_careers(steam_id: Optional[int] = None, order_by: str = "kills",
+                   limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Career totals and rates of every player (same totals as analytics.aggregate_sheets)"""
+    return [
+        {
+            "steamId": row["steam_id"],
+            "name": row["name"],
+            "demos": row["demos"],
+            "totals": analytics.add_rates(
+                {name: row[column] for name, column in PLAYER_COLUMNS.items()}, row["rounds"]
+            ),
+        }
+        for row in database.get_aggregates(
+            "agg_players", order_by=PLAYER_COLUMNS.get(order_by, order_by), limit=limit, steam_id=steam_id
+        )
+    ]
+
+
+def economy_by_round(map_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Average start money, equipment value and win rate per round number and side"""
+    by_round: Dict[int, Dict[str, Any]] = {}
+    for row in database.get_aggregates("agg_economy", map_name=map_name):
+        entry = by_round.setdefault(row["round_num"], {"roundNum": row["round_num"]})
+        side = entry.setdefault(row["side"], {"rounds": 0, "startMoney": 0, "equipmentValue": 0, "wins": 0})
+        side["rounds"] += row["rounds"]
+        side["startMoney"] += row["start_money"]
+        side["equipmentValue"] += row["equipment_value"]
+        side["wins"] += row["wins"]
+    result = []
+    for round_num in sorted(by_round):
+        entry = by_round[round_num]
+        for side in SIDES:
+            if side in entry:
+                totals = entry[side]
+                entry[side] = {
+                    "rounds": totals["rounds"],
+                    "avgStartMoney": round(totals["startMoney"] / totals["rounds"], 1),
+                    "avgEquipmentValue": round(totals["equipmentValue"] / totals["rounds"], 1),
+                    "winRate": round(totals["wins"] / totals["rounds"], 3),
+                }
+        result.append(entry)
+    return result
+
+
+def compute_all_partials() -> Tuple[Dict[str, Partials], List[Dict[str, str]]]:
+    """Recompute the partials of every saved demo, returns (demo_id -> partials, errors)"""
+    partials: Dict[str, Partials] = {}
+    errors = []
+    for demo in database.get_all_demos():
+        demo_id = demo['demo_id']
+        try:
+            header, tables = stored_tables(demo_id)
+            partials[demo_id] = demo_partials(header, tables, demo['map_name'])
+            if columnar.has_columns(demo_id):
+                partials[demo_id]["agg_winprob"] = artifacts.win_observations(demo_id, demo['map_name'])
+                partials[demo_id]["agg_lineups"] = lineups.lineup_rows(demo_id, demo['map_name'])
+        except Exception as e:
+            errors.append({"demo_id": demo_id, "error": f"{type(e).__name__}: {e}"})
+    return partials, errors
+
+
+def _summed(partials: Dict[str, Partials]) -> Dict[str, Dict[tuple, Dict[str, int]]]:
+    """Aggregate rows (table -> key -> counts) that a set of demo partials adds up to"""
+    totals: Dict[str, Dict[tuple, Dict[str, int]]] = {table: {} for table in database.AGGREGATE_TABLES}
+    for contribution in partials.values():
+        for table, spec in database.AGGREGATE_TABLES.items():
+            for row in contribution.get(table, []):
+                counts = totals[table].setdefault(tuple(row[k] for k in spec["keys"]), dict.fromkeys(spec["counts"], 0))
+                for column in spec["counts"]:
+                    counts[column] += int(row.get(column) or 0)
+    return {table: {k: c for k, c in rows.items() if c[database.AGGREGATE_TABLES[table]["counts"][0]] > 0}
+            for table, rows in totals.items()}
+
+
+def check_aggregates(partials: Dict[str, Partials]) -> List[str]:
+    """Differences between the stored aggregate tables and what the partials add up to"""
+    expected = _summed(partials)
+    problems = []
+    for table, spec in database.AGGREGATE_TABLES.items():
+        stored = {
+            tuple(row[k] for k in spec["keys"]): {c: row[c] for c in spec["counts"]}
+            for row in database.get_aggregates(table)
+        }
+        for key in sorted(set(stored) | set(expected[table]), key=str):
+            if stored.get(key) != expected[table].get(key):
+                problems.append(f"{table} {key}: stored {stored.get(key)}, expected {expected[table].get(key)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check or rebuild the cross-match aggregate tables')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='Recompute every demo\'s partials and replace the aggregate tables')
+    parser.add_argument('--check', action='store_true',
+                       help='Report differences between the stored tables and a recomputation')
+    args = parser.parse_args()
+
+    database.create_tables()
+    partials, errors = compute_all_partials()
+    for failure in errors:
+        print(f"✗ {failure['demo_id']}: {failure['error']}")
+
+    if args.check or not args.rebuild:
+        problems = check_aggregates(partials)
+        for problem in problems:
+            print(f"✗ {problem}")
+        print(f"{'✗' if problems else '✓'} {len(problems)} differences across {len(partials)} demos")
+
+    if args.rebuild:
+        if not database.replace_aggregates(partials):
+            raise SystemExit(1)
+        artifacts.invalidate_win_tables()
+        lineups.invalidate()
+        print(f"✓ Rebuilt aggregates from {len(partials)} demos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+"""
+Kill/damage analytics
+
+Per-player, per-round stat sheets built from the columnar kills, damages
+and rounds tables. Events are assigned to rounds with searchsorted on the
+round tick ranges, and every stat is a grouped reduction (bincount over
+player x round cells), so a demo takes milliseconds and a batch of demos
+is a loop over cached sheets.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app import artifacts, columnar, metrics
+from app.config import STATS_CACHE_SIZE, TRADE_WINDOW_SECONDS
+
+MAX_HEALTH = 100
+
+# Counted stats of every player in every round, in output order
+ROUND_STATS = (
+    "kills", "deaths", "assists", "headshots", "damage",
+    "openingKills", "openingDeaths", "tradeKills", "tradedDeaths", "survived", "kast",
+)
+
+# LRU cache of stat sheets: demo_id -> sheet
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+metrics.register_cache("stat_sheet")
+
+
+def round_ranges(rounds: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Full tick range of every round (like buildRoundTickRanges in the frontend)
+
+    Returns:
+        Tuple (round_nums, start_ticks, end_ticks) sorted by start tick
+    """
+    if not rounds:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    starts = rounds['startTick'].astype(np.int64)
+    order = np.argsort(starts, kind='stable')
+    return (rounds['roundNum'].astype(np.int64)[order],
+            starts[order],
+            rounds['endTick'].astype(np.int64)[order])
+
+
+def _lookup(sorted_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Position of every value in a sorted id array, -1 if absent"""
+    idx = np.searchsorted(sorted_ids, values)
+    found = idx < len(sorted_ids)
+    found[found] = sorted_ids[idx[found]] == values[found]
+    return np.where(found, idx, -1)
+
+
+def _grouped_count(player_idx: np.ndarray, round_idx: np.ndarray, n_players: int, n_rounds: int,
+                   weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sum of events (or weights) per (player, round) cell, skipping unknown players and rounds"""
+    known = (player_idx >= 0) & (round_idx >= 0)
+    cells = player_idx[known] * n_rounds + round_idx[known]
+    totals = np.bincount(
+        cells, weights=None if weights is None else weights[known], minlength=n_players * n_rounds
+    )
+    return totals.reshape(n_players, n_rounds)
+
+
+def _effective_damage(damages: Dict[str, np.ndarray], round_idx: np.ndarray) -> np.ndarray:
+    """
+    Damage of every hit capped at the victim's health before it
+
+    A victim's health before a hit is its health after the previous hit in
+    the same round (MAX_HEALTH for the first), so overkill damage does not
+    inflate ADR. Without a health column the raw damage is used.
+    """
+    damage = damages['damage'].astype(np.float64)
+    if 'health' not in damages:
+        return damage
+    order = np.lexsort((damages['tick'], damages['victimId'], round_idx))
+    victims, rounds_sorted = damages['victimId'][order], round_idx[order]
+    health_after = damages['health'].astype(np.float64)[order]
+    first_hit = np.ones(len(order), dtype=bool)
+    first_hit[1:] = (victims[1:] != victims[:-1]) | (rounds_sorted[1:] != rounds_sorted[:-1])
+    health_before = np.empty(len(order))
+    health_before[first_hit] = MAX_HEALTH
+    health_before[~first_hit] = health_after[np.flatnonzero(~first_hit) - 1]
+    capped = np.empty(len(order))
+    capped[order] = np.minimum(damage[order], health_before)
+    return capped
+
+
+def _trade_pairs(kills: Dict[str, np.ndarray], round_idx: np.ndarray, valid: np.ndarray,
+                 window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trades among the kills of a demo
+
+    Kill j trades kill i when, in the same round and within window ticks,
+    j's victim is i's killer and j's killer is on i's victim's team.
+
+    Returns:
+        Tuple (is_trade_kill, was_traded) boolean arrays over the kills
+    """
+    ticks = kills['tick'].astype(np.int64)
+    delay = ticks[None, :] - ticks[:, None]
+    pairs = (
+        (round_idx[:, None] == round_idx[None, :])
+        & (round_idx[:, None] >= 0)
+        & (delay >= 0) & (delay <= window)
+        & (kills['attackerId'][:, None] == kills['victimId'][None, :])
+        & (kills['victimTeam'][:, None] == kills['attackerTeam'][None, :])
+        & valid[:, None] & valid[None, :]
+    )
+    np.fill_diagonal(pairs, False)
+    return pairs.any(axis=0), pairs.any(axis=1)
+
+
+def _team_sides(kills: Dict[str, np.ndarray], round_idx: np.ndarray, teams: np.ndarray,
+                n_rounds: int) -> np.ndarray:
+    """Side ("CT"/"T", "" if unknown) of every team in every round, read off the kill feed"""
+    sides = np.full((n_rounds, len(teams)), '', dtype='<U2')
+    if not kills or 'attackerSide' not in kills:
+        return sides
+    event_rounds = np.concatenate([round_idx, round_idx])
+    event_teams = np.concatenate([kills['attackerTeam'], kills['victimTeam']])
+    event_sides = np.concatenate([kills['attackerSide'], kills['victimSide']])
+    team_idx = np.searchsorted(teams, event_teams)
+    known = (event_rounds >= 0) & np.isin(event_sides, ("CT", "T")) & np.isin(event_teams, teams)
+    sides[event_rounds[known], team_idx[known]] = event_sides[known]
+    return sides
+
+
+def build_stat_sheet(demo_id: str) -> Dict[str, Any]:
+    """
+    Per-player, per-round stat sheet of a demo
+
+    Returns:
+        Dict with steamIds, names and teams (one per player), roundNums,
+        sides (players x rounds), stats (name -> players x rounds array, see
+        ROUND_STATS) and weapons (per player and weapon kill/headshot counts)
+    """
+    return stat_sheet_from_tables(
+        columnar.load_header(demo_id),
+        columnar.load_table(demo_id, 'kills', [
+            'tick', 'attackerId', 'attackerName', 'attackerTeam', 'attackerSide', 'victimId', 'victimName',
+            'victimTeam', 'victimSide', 'assisterId', 'weapon', 'isHeadshot',
+        ]),
+        columnar.load_table(demo_id, 'damages', ['tick', 'attackerId', 'victimId', 'damage', 'health']),
+        columnar.load_table(demo_id, 'players', ['steamId', 'name', 'team']),
+        columnar.load_table(demo_id, 'rounds', ['roundNum', 'startTick', 'endTick'])
+    )
+
+
+def stat_sheet_from_tables(header: Dict[str, Any], kills: Dict[str, np.ndarray], damages: Dict[str, np.ndarray],
+                           players: Dict[str, np.ndarray], rounds: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Stat sheet (see build_stat_sheet) from already loaded tables, e.g. columnar.rows_to_table output"""
+    round_nums, starts, ends = round_ranges(rounds)
+    n_rounds = len(round_nums)
+
+    # Players: the players table, plus anyone else who shows up in the kill feed
+    ids = [players.get('steamId', np.array([], dtype=np.int64)).astype(np.int64)]
+    names = [players.get('name', np.array([], dtype=str))]
+    teams = [players.get('team', np.array([], dtype=str))]
+    if kills:
+        ids += [kills['attackerId'].astype(np.int64), kills['victimId'].astype(np.int64)]
+        names += [kills['attackerName'], kills['victimName']]
+        teams += [kills['attackerTeam'], kills['victimTeam']]
+    all_ids = np.concatenate(ids)
+    steam_ids, first = np.unique(all_ids, return_index=True)
+    keep = steam_ids != 0
+    steam_ids, first = steam_ids[keep], first[keep]
+    player_names = np.concatenate(names)[first]
+    player_teams = np.concatenate(teams)[first]
+    n_players = len(steam_ids)
+
+    stats = {name: np.zeros((n_players, n_rounds), dtype=np.int64) for name in ROUND_STATS}
+    weapons = {"player": np.array([], dtype=np.int64), "weapon": np.array([], dtype=str),
+               "kills": np.array([], dtype=np.int64), "headshots": np.array([], dtype=np.int64)}
+    team_names = np.unique(player_teams)
+    team_sides = np.full((n_rounds, len(team_names)), '', dtype='<U2')
+
+    traded = np.zeros((n_players, n_rounds), dtype=bool)
+    if kills and n_rounds:
+        tick_rate = header.get('tickRate') or 64
+        kill_round = artifacts.assign_rounds(kills['tick'].astype(np.int64), starts, ends)
+        attacker = _lookup(steam_ids, kills['attackerId'].astype(np.int64))
+        victim = _lookup(steam_ids, kills['victimId'].astype(np.int64))
+        assister = _lookup(steam_ids, kills['assisterId'].astype(np.int64))
+        # Suicides, world damage and team kills are deaths but not kills
+        valid = (
+            (kills['attackerId'] != 0)
+            & (kills['attackerId'] != kills['victimId'])
+            & (kills['attackerTeam'] != kills['victimTeam'])
+        )
+        headshot = valid & kills['isHeadshot'].astype(bool)
+
+        stats["kills"] = _grouped_count(attacker[valid], kill_round[valid], n_players, n_rounds)
+        stats["deaths"] = _grouped_count(victim, kill_round, n_players, n_rounds)
+        stats["assists"] = _grouped_count(assister, kill_round, n_players, n_rounds)
+        stats["headshots"] = _grouped_count(attacker[headshot], kill_round[headshot], n_players, n_rounds)
+
+        # Opening duel: the first death of each round (kills are stored in tick order)
+        in_round = np.flatnonzero(kill_round >= 0)
+        _, first_kill = np.unique(kill_round[in_round], return_index=True)
+        opening = in_round[first_kill]
+        stats["openingDeaths"] = _grouped_count(victim[opening], kill_round[opening], n_players, n_rounds)
+        opening = opening[valid[opening]]
+        stats["openingKills"] = _grouped_count(attacker[opening], kill_round[opening], n_players, n_rounds)
+
+        trade_kill, was_traded = _trade_pairs(kills, kill_round, valid, int(TRADE_WINDOW_SECONDS * tick_rate))
+        stats["tradeKills"] = _grouped_count(attacker[trade_kill], kill_round[trade_kill], n_players, n_rounds)
+        stats["tradedDeaths"] = _grouped_count(victim[was_traded], kill_round[was_traded], n_players, n_rounds)
+        traded = stats["tradedDeaths"] > 0
+
+        # Headshots by weapon: group valid kills by (player, weapon)
+        weapon_names, weapon_idx = np.unique(kills['weapon'][valid], return_inverse=True)
+        known = attacker[valid] >= 0
+        cells = attacker[valid][known] * len(weapon_names) + weapon_idx[known]
+        weapon_kills = np.bincount(cells, minlength=n_players * len(weapon_names))
+        weapon_hs = np.bincount(cells, weights=headshot[valid][known], minlength=n_players * len(weapon_names))
+        used = np.flatnonzero(weapon_kills)
+        weapons = {
+            "player": used // max(len(weapon_names), 1),
+            "weapon": weapon_names[used % max(len(weapon_names), 1)],
+            "kills": weapon_kills[used].astype(np.int64),
+            "headshots": weapon_hs[used].astype(np.int64),
+        }
+        team_sides = _team_sides(kills, kill_round, team_names, n_rounds)
+
+    if damages and n_rounds:
+        damage_round = artifacts.assign_rounds(damages['tick'].astype(np.int64), starts, ends)
+        attacker = _lookup(steam_ids, damages['attackerId'].astype(np.int64))
+        victim = _lookup(steam_ids, damages['victimId'].astype(np.int64))
+        # Self and team damage do not count towards ADR
+        valid = (attacker >= 0) & (attacker != victim)
+        valid &= (victim < 0) | (player_teams[np.maximum(attacker, 0)] != player_teams[np.maximum(victim, 0)])
+        effective = _effective_damage(damages, damage_round)
+        stats["damage"] = np.rint(
+            _grouped_count(attacker[valid], damage_round[valid], n_players, n_rounds, effective[valid])
+        ).astype(np.int64)
+
+    stats["survived"] = (stats["deaths"] == 0).astype(np.int64)
+    # KAST: a kill, assist, survival or traded death in the round
+    stats["kast"] = (
+        (stats["kills"] > 0) | (stats["assists"] > 0) | (stats["survived"] > 0) | traded
+    ).astype(np.int64)
+
+    sides = team_sides[:, np.searchsorted(team_names, player_teams)].T if n_players else np.empty((0, n_rounds), dtype='<U2')
+    return {
+        "steamIds": steam_ids,
+        "names": player_names,
+        "teams": player_teams,
+        "roundNums": round_nums,
+        "sides": sides,
+        "stats": stats,
+        "weapons": weapons,
+    }
+
+
+def stat_sheet(demo_id: str) -> Dict[str, Any]:
+    """Stat sheet of a demo through the LRU cache"""
+    with _cache_lock:
+        sheet = _cache.get(demo_id)
+        if sheet is not None:
+            _cache.move_to_end(demo_id)
+    metrics.record_cache("stat_sheet", sheet is not None)
+    if sheet is not None:
+        return sheet
+
+    sheet = build_stat_sheet(demo_id)
+    if STATS_CACHE_SIZE > 0:
+        with _cache_lock:
+            _cache[demo_id] = sheet
+            while len(_cache) > STATS_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return sheet
+
+
+def evict_demo(demo_id: str):
+    """Drop the cached stat sheet of a demo"""
+    with _cache_lock:
+        _cache.pop(demo_id, None)
+
+
+def add_rates(totals: Dict[str, Any], rounds_played: int) -> Dict[str, Any]:
+    """Add per-round rates and percentages to summed stats"""
+    totals["roundsPlayed"] = rounds_played
+    totals["adr"] = round(totals["damage"] / rounds_played, 1) if rounds_played else 0.0
+    totals["kpr"] = round(totals["kills"] / rounds_played, 2) if rounds_played else 0.0
+    totals["dpr"] = round(totals["deaths"] / rounds_played, 2) if rounds_played else 0.0
+    totals["kastPct"] = round(100.0 * totals["kast"] / rounds_played, 1) if rounds_played else 0.0
+    totals["hsPct"] = round(100.0 * totals["headshots"] / totals["kills"], 1) if totals["kills"] else 0.0
+    return totals
+
+
+def _weapon_json(kills: np.ndarray, headshots: np.ndarray, names: np.ndarray) -> Dict[str, Any]:
+    """Weapon name -> kills, headshots and headshot %"""
+    return {
+        str(name): {"kills": int(k), "headshots": int(h), "hsPct": round(100.0 * h / k, 1)}
+        for name, k, h in sorted(zip(names, kills.tolist(), headshots.tolist()), key=lambda w: -w[1])
+    }
+
+
+def sheet_to_json(sheet: Dict[str, Any], per_round: bool = True) -> Dict[str, Any]:
+    """Serializable stat sheet: one entry per player with totals, weapons and (optionally) rounds"""
+    stats = sheet["stats"]
+    n_rounds = len(sheet["roundNums"])
+    weapons = sheet["weapons"]
+    result = []
+    for p, steam_id in enumerate(sheet["steamIds"].tolist()):
+        totals = {name: int(stats[name][p].sum()) for name in ROUND_STATS}
+        mine = weapons["player"] == p
+        entry = {
+            "steamId": steam_id,
+            "name": str(sheet["names"][p]),
+            "team": str(sheet["teams"][p]),
+            "totals": add_rates(totals, n_rounds),
+            "weapons": _weapon_json(weapons["kills"][mine], weapons["headshots"][mine], weapons["weapon"][mine]),
+        }
+        if per_round:
+            entry["rounds"] = [
+                {"round": int(r), "side": str(sheet["sides"][p, i]) or None,
+                 **{name: int(stats[name][p, i]) for name in ROUND_STATS}}
+                for i, r in enumerate(sheet["roundNums"].tolist())
+            ]
+        result.append(entry)
+    result.sort(key=lambda e: -e["totals"]["kills"])
+    return {"rounds": sheet["roundNums"].tolist(), "players": result}
+
+
+def aggregate_sheets(sheets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Career totals across demos, grouped by steam id
+
+    Per-demo totals are stacked into one (players x stats) matrix and summed
+    per steam id with bincount; rates are recomputed from the sums.
+    """
+    if not sheets:
+        return []
+    ids = np.concatenate([s["steamIds"] for s in sheets])
+    names = np.concatenate([s["names"] for s in sheets])
+    totals = np.concatenate([
+        np.stack([s["stats"][name].sum(axis=1) for name in ROUND_STATS], axis=1).reshape(-1, len(ROUND_STATS))
+        for s in sheets
+    ])
+    rounds_played = np.concatenate([np.full(len(s["steamIds"]), len(s["roundNums"])) for s in sheets])
+
+    steam_ids, inverse = np.unique(ids, return_inverse=True)
+    # Latest name wins (sheets are given oldest first)
+    last = np.zeros(len(steam_ids), dtype=np.int64)
+    np.maximum.at(last, inverse, np.arange(len(ids)))
+    summed = np.stack([
+        np.bincount(inverse, weights=totals[:, k], minlength=len(steam_ids)) for k in range(len(ROUND_STATS))
+    ], axis=1).astype(np.int64)
+    played = np.bincount(inverse, weights=rounds_played, minlength=len(steam_ids)).astype(np.int64)
+    demos = np.bincount(inverse, minlength=len(steam_ids))
+
+    # Weapons: group (steam id, weapon) pairs across demos
+    weapon_ids = np.concatenate([s["steamIds"][s["weapons"]["player"]] for s in sheets])
+    weapon_names = np.concatenate([s["weapons"]["weapon"].astype(str) for s in sheets])
+    weapon_kills = np.concatenate([s["weapons"]["kills"] for s in sheets])
+    weapon_hs = np.concatenate([s["weapons"]["headshots"] for s in sheets])
+    names_uniq, weapon_idx = np.unique(weapon_names, return_inverse=True)
+    pair_player = np.searchsorted(steam_ids, weapon_ids)
+    pairs, pair_inverse = np.unique(pair_player * max(len(names_uniq), 1) + weapon_idx, return_inverse=True)
+    pair_kills = np.bincount(pair_inverse, weights=weapon_kills, minlength=len(pairs)).astype(np.int64)
+    pair_hs = np.bincount(pair_inverse, weights=weapon_hs, minlength=len(pairs)).astype(np.int64)
+    pair_owner = pairs // max(len(names_uniq), 1)
+    pair_weapon = names_uniq[pairs % max(len(names_uniq), 1)] if len(names_uniq) else np.array([], dtype=str)
+
+    result = []
+    for p, steam_id in enumerate(steam_ids.tolist()):
+        mine = pair_owner == p
+        result.append({
+            "steamId": steam_id,
+            "name": str(names[last[p]]),
+            "demos": int(demos[p]),
+            "totals": add_rates({name: int(summed[p, k]) for k, name in enumerate(ROUND_STATS)}, int(played[p])),
+            "weapons": _weapon_json(pair_kills[mine], pair_hs[mine], pair_weapon[mine]),
+        })
+    result.sort(key=lambda e: -e["totals"]["kills"])
+    return result
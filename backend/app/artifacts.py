@@ -0,0 +1,870 @@
+"""
+Derived demo artifacts
+
+Builders for everything the ingest pipeline precomputes after a demo is
+saved. Each builder reads the columnar store of the demo and writes one
+file into its artifact directory.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app import columnar, database, lineups, storage
+from app.config import (
+    BOMB_TIMER_SECONDS,
+    HEATMAP_GRID_SIZE,
+    HEATMAP_HIRES_GRID_SIZE,
+    ROUND_TIME_SECONDS,
+    SPATIAL_CELL_SIZE,
+    TICK_LOD_FACTORS,
+    TICK_PATH_TOLERANCE,
+    WINPROB_DIR
+)
+from app.maps import get_map_config, level_index, level_names, world_to_grid
+
+SIDES = ("CT", "T")
+
+# Team equipment value thresholds used to classify buys
+ECO_MAX_EQUIPMENT = 5000
+FORCE_MAX_EQUIPMENT = 20000
+PISTOL_ROUNDS = {1, 13}
+
+# Tick table resolutions: full rate, every Nth sampled tick, simplified player paths
+TICK_RESOLUTIONS = ("full",) + tuple(str(f) for f in TICK_LOD_FACTORS) + ("path",)
+
+# Replay frames: per player slot values, after the frame's tick
+FRAME_FIELDS = ("x", "y", "viewX", "health", "alive", "weaponId")
+FRAME_EVENT_TABLES = {"kills": "kill", "grenades": "grenade", "smokes": "smoke", "bombs": "bomb"}
+
+# Round state timeline: bomb state codes and the bomb events that set them
+BOMB_STATES = ("none", "planted", "defusing", "defused", "exploded")
+BOMB_EVENT_STATES = {"planted": 1, "defuse_start": 2, "defuse_abort": 1, "defused": 3, "exploded": 4}
+ROUND_STATE_FIELDS = ("ctAlive", "tAlive", "ctHp", "tHp", "ctEquipment", "tEquipment", "bomb", "bombSite", "deadline")
+
+# Win probability observations: buy classes (see classify_buy), most players alive per side
+WINPROB_BUYS = ("pistol", "eco", "force", "full")
+WINPROB_MAX_ALIVE = 5
+
+# Position columns indexed for region queries, per table
+SPATIAL_TABLES = {
+    "ticks": ("x", "y"),
+    "kills": ("victimX", "victimY"),
+    "grenades": ("x", "y"),
+    "smokes": ("x", "y"),
+}
+# Side column of each indexed table (None: the table has no side)
+SPATIAL_SIDE_FIELDS = {
+    "ticks": "side",
+    "kills": "victimSide",
+    "grenades": "throwerSide",
+    "smokes": None,
+}
+SPATIAL_INDEX_VERSION = 2  # Bump when the index layout changes; older indexes are rebuilt
+
+
+def _write_json(demo_id: str, name: str, payload: Any):
+    """Write a JSON artifact"""
+    path = storage.artifact_dir(demo_id) / name
+    with open(path, 'w') as f:
+        json.dump(payload, f)
+
+
+def load_artifact(demo_id: str, name: str) -> Optional[Any]:
+    """Load a JSON artifact, or None if it has not been built"""
+    path = storage.artifact_dir(demo_id) / name
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def round_live_ranges(rounds: Dict[str, np.ndarray]):
+    """
+    Live (post freeze time) tick range of every round
+
+    Returns:
+        Tuple (round_nums, start_ticks, end_ticks) sorted by start tick
+    """
+    if not rounds:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    starts = rounds['startTick'].astype(np.int64)
+    if 'freezeTimeEndTick' in rounds:
+        freeze_end = rounds['freezeTimeEndTick'].astype(np.int64)
+        starts = np.where(freeze_end > 0, freeze_end, starts)
+    order = np.argsort(starts, kind='stable')
+    return (rounds['roundNum'].astype(np.int64)[order],
+            starts[order],
+            rounds['endTick'].astype(np.int64)[order])
+
+
+def assign_rounds(ticks: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Index of the round each tick falls into (live range only)
+
+    Returns:
+        Array of round indices, -1 for ticks outside every round
+    """
+    idx = np.searchsorted(starts, ticks, side='right') - 1
+    valid = idx >= 0
+    valid[valid] = ticks[valid] <= ends[idx[valid]]
+    return np.where(valid, idx, -1)
+
+
+def build_columns(demo_id: str) -> Dict[str, Any]:
+    """Convert the raw parser JSON into the columnar store"""
+    match_data = storage.read_demo(demo_id)
+    row_counts = columnar.write_demo_columns(demo_id, match_data)
+    return {"tables": row_counts}
+
+
+def build_round_index(demo_id: str) -> Dict[str, Any]:
+    """Row ranges of every table per round, so a round can be sliced without scanning"""
+    rounds = columnar.load_table(demo_id, 'rounds')
+    tick_columns = {
+        table: columnar.load_table(demo_id, table, ['tick']).get('tick')
+        for table in columnar.list_tables(demo_id)
+        if table != 'rounds'
+    }
+
+    index = []
+    for i in range(columnar.table_length(rounds)):
+        start_tick = int(rounds['startTick'][i])
+        end_tick = int(rounds['endTick'][i])
+        entry = {
+            "roundNum": int(rounds['roundNum'][i]),
+            "startTick": start_tick,
+            "freezeTimeEndTick": int(rounds['freezeTimeEndTick'][i]) if 'freezeTimeEndTick' in rounds else start_tick,
+            "endTick": end_tick,
+            "rows": {},
+        }
+        for table, ticks in tick_columns.items():
+            if ticks is None:
+                continue
+            lo = int(np.searchsorted(ticks, start_tick, side='left'))
+            hi = int(np.searchsorted(ticks, end_tick, side='right'))
+            entry["rows"][table] = [lo, hi]
+        index.append(entry)
+
+    _write_json(demo_id, "round_index.json", {"rounds": index})
+    return {"rounds": len(index)}
+
+
+def simplify_path(ticks: np.ndarray, xs: np.ndarray, ys: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker simplification of one player path, in time
+
+    Distances are measured to where the player would be at the same tick
+    when interpolating linearly between the kept vertices, so a replay that
+    interpolates the simplified path stays within tolerance of the full one
+    (pauses and speed changes are kept, not just turns).
+
+    Returns:
+        Boolean mask of the vertices to keep (always the first and last)
+    """
+    keep = np.zeros(len(xs), dtype=bool)
+    if len(xs) == 0:
+        return keep
+    keep[[0, -1]] = True
+    ticks = ticks.astype(np.float64)
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        span = ticks[last] - ticks[first]
+        ratio = (ticks[first + 1:last] - ticks[first]) / span if span > 0 else np.zeros(last - first - 1)
+        distance = np.hypot(
+            xs[first + 1:last] - (xs[first] + ratio * (xs[last] - xs[first])),
+            ys[first + 1:last] - (ys[first] + ratio * (ys[last] - ys[first]))
+        )
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return keep
+
+
+def build_tick_lod(demo_id: str) -> Dict[str, Any]:
+    """
+    Reduced-resolution copies of the ticks table
+
+    For every factor in TICK_LOD_FACTORS, the rows of every Nth sampled tick
+    (all players of those ticks). The "path" copy keeps, per player, round
+    and alive state, only the rows needed to replay the path within
+    TICK_PATH_TOLERANCE game units by interpolating between them.
+    """
+    source = columnar.table_path(demo_id, 'ticks')
+    ticks = columnar.load_table(demo_id, 'ticks', ['tick', 'steamId', 'x', 'y', 'isAlive'])
+    if 'tick' not in ticks:
+        return {}
+
+    tick_values = ticks['tick'].astype(np.int64)
+    sample_rank = np.searchsorted(np.unique(tick_values), tick_values)
+    summary = {"full": int(len(tick_values))}
+    for factor in TICK_LOD_FACTORS:
+        rows = np.flatnonzero(sample_rank % factor == 0)
+        columnar.write_table_rows(source, columnar.lod_path(demo_id, 'ticks', str(factor)), rows)
+        summary[str(factor)] = int(len(rows))
+
+    if 'x' in ticks and 'y' in ticks and 'steamId' in ticks:
+        rounds = columnar.load_table(demo_id, 'rounds', ['startTick'])
+        starts = np.sort(rounds['startTick'].astype(np.int64)) if rounds else np.array([], dtype=np.int64)
+        round_bucket = np.searchsorted(starts, tick_values, side='right')
+        alive = ticks['isAlive'].astype(bool) if 'isAlive' in ticks else np.ones(len(tick_values), dtype=bool)
+        order = np.lexsort((tick_values, alive, round_bucket, ticks['steamId']))
+        # One polyline per run of rows with the same player, round and alive state
+        key_change = np.zeros(len(order), dtype=bool)
+        key_change[:1] = True
+        for key in (ticks['steamId'], round_bucket, alive):
+            key_change[1:] |= key[order][1:] != key[order][:-1]
+        bounds = np.append(np.flatnonzero(key_change), len(order))
+        path_ticks = tick_values[order]
+        xs, ys = ticks['x'].astype(np.float64)[order], ticks['y'].astype(np.float64)[order]
+        keep = np.zeros(len(order), dtype=bool)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            keep[start:end] = simplify_path(
+                path_ticks[start:end], xs[start:end], ys[start:end], TICK_PATH_TOLERANCE
+            )
+        rows = np.sort(order[keep])
+        columnar.write_table_rows(source, columnar.lod_path(demo_id, 'ticks', 'path'), rows)
+        summary["path"] = int(len(rows))
+    return summary
+
+
+def heatmap_cube_path(demo_id: str, grid_size: int = HEATMAP_GRID_SIZE) -> Path:
+    """Path of the heatmap cube of a demo at a grid size"""
+    name = "heatmap_cube.npz" if grid_size == HEATMAP_GRID_SIZE else f"heatmap_cube_{grid_size}.npz"
+    return storage.artifact_dir(demo_id) / name
+
+
+def bin_heatmap_counts(
+    ticks: Dict[str, np.ndarray],
+    starts: np.ndarray,
+    ends: np.ndarray,
+    map_config: Dict[str, Any],
+    grid_size: int
+) -> np.ndarray:
+    """
+    Count alive positions per (round, level, side, row, col) in live round time
+
+    Positions are split by the map's level z thresholds in the same pass;
+    ticks without a z column all count towards the default level.
+
+    Args:
+        ticks: Columns tick, x, y, side (and optionally z, isAlive)
+        starts, ends: Live tick ranges of the rounds, sorted by start
+        map_config: Map bounds and levels
+        grid_size: Bins per dimension
+
+    Returns:
+        uint32 array shaped (rounds, levels, len(SIDES), grid_size, grid_size)
+    """
+    n_levels = len(map_config['levels'])
+    shape = (len(starts), n_levels, len(SIDES), grid_size, grid_size)
+    if not ticks or not len(starts):
+        return np.zeros(shape, dtype=np.uint32)
+
+    round_idx = assign_rounds(ticks['tick'], starts, ends)
+    side_idx = np.full(len(round_idx), -1)
+    for s, side in enumerate(SIDES):
+        side_idx[ticks['side'] == side] = s
+    level_idx = np.broadcast_to(level_index(ticks.get('z'), map_config), round_idx.shape)
+    rows, cols, in_bounds = world_to_grid(ticks['x'], ticks['y'], map_config, grid_size)
+    keep = (round_idx >= 0) & (side_idx >= 0) & in_bounds
+    if 'isAlive' in ticks:
+        keep &= ticks['isAlive'].astype(bool)
+
+    group = (round_idx[keep] * n_levels + level_idx[keep]) * len(SIDES) + side_idx[keep]
+    flat = (group * grid_size + rows[keep]) * grid_size + cols[keep]
+    return np.bincount(flat, minlength=int(np.prod(shape))).astype(np.uint32).reshape(shape)
+
+
+def build_heatmap_cube(demo_id: str, grid_size: int = HEATMAP_GRID_SIZE) -> Dict[str, Any]:
+    """
+    Raw position counts per (round, level, side, row, col) for alive players in live round time
+
+    Summing the cube over any subset of rounds gives the histogram the
+    utils/ heatmap scripts produce, without touching the ticks again.
+    """
+    map_name = columnar.load_header(demo_id).get('mapName')
+    map_config = get_map_config(map_name)
+    if map_config is None:
+        return {"skipped": f"unknown map {map_name}"}
+
+    round_nums, starts, ends = round_live_ranges(columnar.load_table(demo_id, 'rounds'))
+    ticks = columnar.load_table(demo_id, 'ticks', ['tick', 'x', 'y', 'z', 'side', 'isAlive'])
+    counts = bin_heatmap_counts(ticks, starts, ends, map_config, grid_size)
+
+    np.savez_compressed(
+        heatmap_cube_path(demo_id, grid_size),
+        counts=counts,
+        round_nums=round_nums,
+        levels=np.array(level_names(map_config)),
+        sides=np.array(SIDES),
+        bounds=np.array([map_config['minX'], map_config['maxX'], map_config['minY'], map_config['maxY']]),
+    )
+    return {"gridSize": grid_size, "samples": int(counts.sum())}
+
+
+def load_heatmap_cube(demo_id: str, grid_size: int = HEATMAP_GRID_SIZE) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Load a heatmap cube (counts, round_nums), or None if it has not been built
+
+    Cubes written before levels were tracked hold every position in the
+    default (top) level.
+    """
+    path = heatmap_cube_path(demo_id, grid_size)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        counts = npz['counts']
+        round_nums = npz['round_nums']
+    if counts.ndim == 4:
+        map_config = get_map_config(columnar.load_header(demo_id).get('mapName'))
+        n_levels = len(map_config['levels']) if map_config else 1
+        leveled = np.zeros((counts.shape[0], n_levels) + counts.shape[1:], dtype=counts.dtype)
+        leveled[:, -1] = counts
+        counts = leveled
+    return {"counts": counts, "round_nums": round_nums}
+
+
+def build_player_stats(demo_id: str) -> Dict[str, Any]:
+    """Per-player kills, deaths, assists, headshot % and ADR"""
+    kills = columnar.load_table(demo_id, 'kills', ['attackerId', 'victimId', 'assisterId', 'isHeadshot'])
+    damages = columnar.load_table(demo_id, 'damages', ['attackerId', 'victimId', 'damage'])
+    players = columnar.load_table(demo_id, 'players', ['steamId', 'name', 'team'])
+    n_rounds = columnar.table_length(columnar.load_table(demo_id, 'rounds', ['roundNum']))
+
+    stats: Dict[int, Dict[str, Any]] = {}
+
+    def entry(steam_id: int) -> Dict[str, Any]:
+        return stats.setdefault(steam_id, {
+            "steamId": steam_id, "name": None, "team": None,
+            "kills": 0, "deaths": 0, "assists": 0, "headshots": 0, "damage": 0,
+        })
+
+    def add_counts(ids: np.ndarray, key: str, weights: Optional[np.ndarray] = None):
+        known = ids != 0
+        ids = ids[known]
+        if weights is not None:
+            weights = weights[known]
+        uniq, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights, minlength=len(uniq))
+        for steam_id, total in zip(uniq.tolist(), totals.tolist()):
+            entry(steam_id)[key] += int(total)
+
+    for i in range(columnar.table_length(players)):
+        player = entry(int(players['steamId'][i]))
+        player["name"] = str(players['name'][i])
+        player["team"] = str(players['team'][i])
+
+    if kills:
+        not_suicide = kills['attackerId'] != kills['victimId']
+        add_counts(kills['attackerId'][not_suicide], "kills")
+        add_counts(kills['victimId'], "deaths")
+        add_counts(kills['assisterId'], "assists")
+        headshot = not_suicide & kills['isHeadshot'].astype(bool)
+        add_counts(kills['attackerId'][headshot], "headshots")
+
+    if damages:
+        valid = (damages['attackerId'] != 0) & (damages['attackerId'] != damages['victimId'])
+        add_counts(damages['attackerId'][valid], "damage", damages['damage'][valid].astype(np.float64))
+
+    for player in stats.values():
+        player["hsPct"] = round(100.0 * player["headshots"] / player["kills"], 1) if player["kills"] else 0.0
+        player["adr"] = round(player["damage"] / n_rounds, 1) if n_rounds else 0.0
+
+    result = sorted(stats.values(), key=lambda p: -p["kills"])
+    _write_json(demo_id, "player_stats.json", {"rounds": n_rounds, "players": result})
+    return {"players": len(result)}
+
+
+def classify_buy(round_num: int, equipment_value: int) -> str:
+    """Classify a team buy from its equipment value at freeze time end"""
+    if round_num in PISTOL_ROUNDS:
+        return "pistol"
+    if equipment_value < ECO_MAX_EQUIPMENT:
+        return "eco"
+    if equipment_value < FORCE_MAX_EQUIPMENT:
+        return "force"
+    return "full"
+
+
+def build_economy_summary(demo_id: str) -> Dict[str, Any]:
+    """Per-round money, equipment value and buy type, plus win counts per buy type"""
+    rounds = columnar.load_table(demo_id, 'rounds')
+    summary: List[Dict[str, Any]] = []
+    buy_results: Dict[str, Dict[str, Dict[str, int]]] = {
+        side: {} for side in SIDES
+    }
+
+    for i in range(columnar.table_length(rounds)):
+        round_num = int(rounds['roundNum'][i])
+        winner = str(rounds['winnerSide'][i]) if 'winnerSide' in rounds else None
+        item = {"roundNum": round_num, "winnerSide": winner}
+        for side, prefix in (("CT", "ct"), ("T", "t")):
+            money = int(rounds[f'{prefix}StartMoney'][i]) if f'{prefix}StartMoney' in rounds else 0
+            equipment = int(rounds[f'{prefix}EquipmentValue'][i]) if f'{prefix}EquipmentValue' in rounds else 0
+            buy = classify_buy(round_num, equipment)
+            item[f"{prefix}StartMoney"] = money
+            item[f"{prefix}EquipmentValue"] = equipment
+            item[f"{prefix}Buy"] = buy
+            counts = buy_results[side].setdefault(buy, {"played": 0, "won": 0})
+            counts["played"] += 1
+            counts["won"] += int(winner == side)
+        summary.append(item)
+
+    _write_json(demo_id, "economy.json", {"rounds": summary, "buyResults": buy_results})
+    return {"rounds": len(summary)}
+
+
+def spatial_index_path(demo_id: str, table: str) -> Path:
+    """Path of the spatial index of one table of a demo"""
+    return storage.artifact_dir(demo_id) / f"spatial_{table}.npz"
+
+
+def build_spatial_index(demo_id: str) -> Dict[str, Any]:
+    """
+    Grid-bucket index over the positions of ticks, kills, grenades and smokes
+
+    Rows are sorted by (cell, tick) on a SPATIAL_CELL_SIZE grid laid over
+    the extent of the table. Cells are numbered row-major, so
+    cell_starts[c]:cell_starts[c + 1] is the slice of sorted rows in cell c
+    and a bounding box maps to one contiguous slice per grid row.
+
+    The ticks index only holds samples of living players, like the heatmap
+    cubes. Side (and, for ticks, player name) codes are stored per sorted
+    row, so region queries never read those columns of the table.
+    """
+    summary = {}
+    for table, (x_field, y_field) in SPATIAL_TABLES.items():
+        side_field = SPATIAL_SIDE_FIELDS[table]
+        labels = ([side_field] if side_field else []) + (['name', 'isAlive'] if table == 'ticks' else [])
+        columns = columnar.load_table(demo_id, table, ['tick', x_field, y_field] + labels)
+        if x_field not in columns or y_field not in columns:
+            continue
+        xs = columns[x_field].astype(np.float64)
+        ys = columns[y_field].astype(np.float64)
+        ticks = columns['tick'].astype(np.int64) if 'tick' in columns else np.zeros(len(xs), dtype=np.int64)
+        usable = np.isfinite(xs) & np.isfinite(ys)
+        if 'isAlive' in columns:
+            usable &= columns['isAlive'].astype(bool)
+        valid = np.flatnonzero(usable)
+
+        origin = np.array([xs[valid].min(), ys[valid].min()]) if len(valid) else np.zeros(2)
+        extent = np.array([xs[valid].max(), ys[valid].max()]) - origin if len(valid) else np.zeros(2)
+        shape = np.maximum(np.ceil(extent / SPATIAL_CELL_SIZE).astype(np.int64), 1)
+        cols = np.minimum(((xs[valid] - origin[0]) // SPATIAL_CELL_SIZE).astype(np.int64), shape[0] - 1)
+        rows = np.minimum(((ys[valid] - origin[1]) // SPATIAL_CELL_SIZE).astype(np.int64), shape[1] - 1)
+        cells = rows * shape[0] + cols
+
+        order = np.lexsort((ticks[valid], cells))
+        sorted_rows = valid[order]
+        cell_starts = np.searchsorted(cells[order], np.arange(shape[0] * shape[1] + 1))
+
+        # Position sampling interval of the table (ticks are recorded every N ticks)
+        unique_ticks = np.unique(ticks)
+        interval = int(np.median(np.diff(unique_ticks))) if len(unique_ticks) > 1 else 1
+
+        # Labels as codes into small per-index dictionaries
+        codes = {}
+        for key, field in (("side", side_field), ("player", 'name' if table == 'ticks' else None)):
+            if field and field in columns:
+                names, inverse = np.unique(columns[field][sorted_rows].astype(str), return_inverse=True)
+                codes[f"{key}_names"] = names
+                codes[f"{key}_codes"] = inverse.astype(np.int32)
+
+        np.savez(
+            spatial_index_path(demo_id, table),
+            version=np.int64(SPATIAL_INDEX_VERSION),
+            rows=sorted_rows,
+            x=xs[sorted_rows],
+            y=ys[sorted_rows],
+            tick=ticks[sorted_rows],
+            cell_starts=cell_starts,
+            origin=origin,
+            shape=shape,
+            cell_size=np.float64(SPATIAL_CELL_SIZE),
+            sample_interval=np.int64(interval),
+            **codes,
+        )
+        summary[table] = {"rows": int(len(sorted_rows)), "cells": int(shape[0] * shape[1])}
+    return summary
+
+
+def replay_frames_path(demo_id: str, round_num: int) -> Path:
+    """Path of the packed replay frames of a round (meta JSON next to it)"""
+    return storage.artifact_dir(demo_id) / "frames" / f"round_{round_num}.bin"
+
+
+def build_replay_frames(demo_id: str) -> Dict[str, Any]:
+    """
+    Packed replay frames and a merged event feed for every round
+
+    Each round is a little-endian float32 array of fixed-stride frames, one
+    per sampled tick from round start to end: the tick, then FRAME_FIELDS
+    for every player slot (NaN position when a player has no sample, -1
+    weaponId when unarmed). Frame i starts at byte i * frameStride, so a
+    player can seek with an HTTP range request. The meta JSON lists the
+    slots, weapon names, stride and the round's kills, grenades, smokes
+    and bomb events sorted by tick.
+    """
+    rounds = columnar.load_table(demo_id, 'rounds', ['roundNum', 'startTick', 'endTick'])
+    ticks = columnar.load_table(demo_id, 'ticks', [
+        'tick', 'steamId', 'name', 'team', 'side', 'x', 'y', 'viewX', 'health', 'isAlive', 'activeWeapon'
+    ])
+    if not rounds or 'tick' not in ticks:
+        return {"rounds": 0}
+    tick_values = ticks['tick'].astype(np.int64)
+    events = {
+        kind: columnar.load_table(demo_id, table)
+        for table, kind in FRAME_EVENT_TABLES.items()
+    }
+    n_rows = columnar.table_length(ticks)
+
+    def column(name: str, default: float) -> np.ndarray:
+        return ticks[name].astype(np.float32) if name in ticks else np.full(n_rows, default, dtype=np.float32)
+
+    values = {
+        "x": column('x', np.nan),
+        "y": column('y', np.nan),
+        "viewX": column('viewX', np.nan),
+        "health": column('health', np.nan),
+        "alive": column('isAlive', 1.0),
+    }
+    frame_count = 0
+    replay_frames_path(demo_id, 0).parent.mkdir(parents=True, exist_ok=True)
+    for i in range(columnar.table_length(rounds)):
+        round_num = int(rounds['roundNum'][i])
+        start_tick, end_tick = int(rounds['startTick'][i]), int(rounds['endTick'][i])
+        lo = int(np.searchsorted(tick_values, start_tick, side='left'))
+        hi = int(np.searchsorted(tick_values, end_tick, side='right'))
+        round_ticks = tick_values[lo:hi]
+        frame_ticks, frame_idx = np.unique(round_ticks, return_inverse=True)
+        if not len(frame_ticks):
+            continue  # No tick samples in this round (truncated demo): no frames to serve
+
+        # Slots: CT first, then T, by name, fixed for the whole round
+        round_ids = ticks['steamId'][lo:hi]
+        steam_ids, first = np.unique(round_ids, return_index=True)
+        first += lo
+        sides = ticks['side'][first] if 'side' in ticks else np.full(len(first), '')
+        names = ticks['name'][first] if 'name' in ticks else steam_ids.astype(str)
+        slot_order = np.lexsort((names, sides != "CT"))
+        slot_of = np.empty(len(steam_ids), dtype=np.int64)
+        slot_of[slot_order] = np.arange(len(steam_ids))
+        slot_idx = slot_of[np.searchsorted(steam_ids, round_ids)]
+
+        weapon_names = np.array([], dtype=str)
+        weapon_ids = np.full(hi - lo, -1, dtype=np.float32)
+        if 'activeWeapon' in ticks:
+            weapon_names, codes = np.unique(ticks['activeWeapon'][lo:hi], return_inverse=True)
+            weapon_ids = np.where(weapon_names[codes] == '', -1, codes).astype(np.float32)
+
+        frames = np.full((len(frame_ticks), len(steam_ids), len(FRAME_FIELDS)), np.nan, dtype=np.float32)
+        frames[..., FRAME_FIELDS.index("alive")] = 0.0
+        frames[..., FRAME_FIELDS.index("weaponId")] = -1.0
+        for f, field in enumerate(FRAME_FIELDS):
+            source = weapon_ids if field == "weaponId" else values[field][lo:hi]
+            frames[frame_idx, slot_idx, f] = source
+        packed = np.concatenate(
+            [frame_ticks.astype(np.float32)[:, None], frames.reshape(len(frame_ticks), -1)], axis=1
+        )
+
+        feed = []
+        for kind, table in events.items():
+            if 'tick' not in table:
+                continue
+            event_ticks = table['tick'].astype(np.int64)
+            rows = slice(int(np.searchsorted(event_ticks, start_tick, side='left')),
+                         int(np.searchsorted(event_ticks, end_tick, side='right')))
+            feed += [{"type": kind, **row} for row in columnar.to_rows({k: v[rows] for k, v in table.items()})]
+        feed.sort(key=lambda e: e['tick'])
+
+        path = replay_frames_path(demo_id, round_num)
+        path.write_bytes(packed.astype('<f4').tobytes())
+        meta = {
+            "roundNum": round_num,
+            "startTick": start_tick,
+            "endTick": end_tick,
+            "frameCount": int(len(frame_ticks)),
+            "frameStride": int(packed.shape[1] * 4),
+            "slotFields": list(FRAME_FIELDS),  # Frame layout: tick, then these per slot
+            "slots": [
+                {
+                    "slot": slot,
+                    "steamId": int(steam_ids[p]),
+                    "name": str(names[p]),
+                    "team": str(ticks['team'][first[p]]) if 'team' in ticks else None,
+                    "side": str(sides[p]) or None,
+                }
+                for slot, p in enumerate(slot_order.tolist())
+            ],
+            "weapons": weapon_names.tolist(),
+            "events": feed,
+        }
+        with open(path.with_suffix(".json"), 'w') as f:
+            json.dump(meta, f)
+        frame_count += len(frame_ticks)
+    return {"rounds": int(columnar.table_length(rounds)), "frames": frame_count}
+
+
+def load_replay_meta(demo_id: str, round_num: int) -> Optional[Dict[str, Any]]:
+    """Meta JSON of a round's replay frames, or None if not built"""
+    path = replay_frames_path(demo_id, round_num).with_suffix(".json")
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def round_state_path(demo_id: str) -> Path:
+    """Path of the round state timeline of a demo"""
+    return storage.artifact_dir(demo_id) / "round_state.npz"
+
+
+def build_round_state(demo_id: str) -> Dict[str, Any]:
+    """
+    Event-sourced state timeline of every round
+
+    Alive players per side start from the round's roster and drop at each
+    kill, or at the next tick sample for deaths outside the kill feed. HP
+    and equipment totals of the living come from the sampled ticks, and
+    the bomb state follows the bomb events.
+
+    Only change-points are stored (a row whenever one of ROUND_STATE_FIELDS
+    changes), including the deadline tick of the round clock or bomb
+    timer, so the state at any tick is one binary search away (see
+    roundstate.states_at).
+    """
+    rounds = columnar.load_table(demo_id, 'rounds', ['roundNum', 'startTick', 'endTick', 'freezeTimeEndTick'])
+    ticks = columnar.load_table(demo_id, 'ticks', ['tick', 'steamId', 'side', 'isAlive', 'health', 'equipmentValue'])
+    if not rounds or 'tick' not in ticks or 'side' not in ticks:
+        return {"rounds": 0}
+    kills = columnar.load_table(demo_id, 'kills', ['tick', 'victimSide'])
+    bombs = columnar.load_table(demo_id, 'bombs', ['tick', 'event', 'site'])
+    tick_rate = columnar.load_header(demo_id).get('tickRate') or 64
+    n_rows = columnar.table_length(ticks)
+
+    tick_values = ticks['tick'].astype(np.int64)
+    side_codes = np.select([ticks['side'] == SIDES[0], ticks['side'] == SIDES[1]], [0, 1], -1)
+    health = ticks['health'].astype(np.int64) if 'health' in ticks else np.zeros(n_rows, dtype=np.int64)
+    alive = ticks['isAlive'].astype(bool) if 'isAlive' in ticks else health > 0
+    equipment = ticks['equipmentValue'].astype(np.int64) if 'equipmentValue' in ticks else np.zeros(n_rows, dtype=np.int64)
+
+    kill_ticks = np.array([], dtype=np.int64)
+    kill_sides = np.array([], dtype=np.int64)
+    if 'victimSide' in kills:
+        kill_ticks = kills['tick'].astype(np.int64)
+        kill_sides = np.select([kills['victimSide'] == side for side in SIDES], [0, 1], -1)
+    bomb_ticks = np.array([], dtype=np.int64)
+    bomb_codes = bomb_sites = np.array([], dtype=np.int64)
+    sites = np.array([], dtype=str)
+    if bombs:
+        known = np.isin(bombs['event'], list(BOMB_EVENT_STATES))
+        bomb_ticks = bombs['tick'].astype(np.int64)[known]
+        bomb_codes = np.array([BOMB_EVENT_STATES[e] for e in bombs['event'][known]], dtype=np.int64)
+        sites, bomb_sites = np.unique(bombs['site'][known] if 'site' in bombs else np.full(len(bomb_ticks), ''),
+                                      return_inverse=True)
+    plant_ticks = bomb_ticks[bomb_codes == 1]
+
+    timeline = []
+    for i in range(columnar.table_length(rounds)):
+        start_tick, end_tick = int(rounds['startTick'][i]), int(rounds['endTick'][i])
+        freeze_end = int(rounds['freezeTimeEndTick'][i]) if 'freezeTimeEndTick' in rounds else start_tick
+        lo = int(np.searchsorted(tick_values, start_tick, side='left'))
+        hi = int(np.searchsorted(tick_values, end_tick, side='right'))
+        frame_ticks, frame_idx = np.unique(tick_values[lo:hi], return_inverse=True)
+        sides = side_codes[lo:hi]
+        valid = sides >= 0
+        bins = (frame_idx * 2 + sides)[valid]
+        living = alive[lo:hi][valid]
+        n_bins = 2 * max(len(frame_ticks), 1)
+        hp = np.bincount(bins, weights=health[lo:hi][valid] * living, minlength=n_bins).astype(np.int64)
+        spent = np.bincount(bins, weights=equipment[lo:hi][valid] * living, minlength=n_bins).astype(np.int64)
+        sampled_alive = np.bincount(bins, weights=living, minlength=n_bins).astype(np.int64)
+        roster = [len(np.unique(ticks['steamId'][lo:hi][sides == s])) for s in (0, 1)]
+
+        def in_round(event_ticks: np.ndarray) -> slice:
+            return slice(int(np.searchsorted(event_ticks, start_tick, side='left')),
+                         int(np.searchsorted(event_ticks, end_tick, side='right')))
+
+        kill_rows, bomb_rows = in_round(kill_ticks), in_round(bomb_ticks)
+        points = np.unique(np.concatenate([
+            [start_tick, freeze_end], frame_ticks, kill_ticks[kill_rows], bomb_ticks[bomb_rows]
+        ]))
+        points = points[(points >= start_tick) & (points <= end_tick)]
+
+        # Latest sample at or before each point (the first one before any)
+        frame = np.clip(np.searchsorted(frame_ticks, points, side='right') - 1, 0, None)
+        columns = {}
+        for s, side in enumerate(("ct", "t")):
+            # Kills are exact; samples also catch deaths missing from the kill feed (bomb, fall damage)
+            deaths = kill_ticks[kill_rows][kill_sides[kill_rows] == s]
+            alive_after_kills = np.maximum(roster[s] - np.searchsorted(deaths, points, side='right'), 0)
+            columns[f"{side}Alive"] = np.minimum(alive_after_kills, sampled_alive[frame * 2 + s]) \
+                if len(frame_ticks) else alive_after_kills
+            columns[f"{side}Hp"] = hp[frame * 2 + s]
+            columns[f"{side}Equipment"] = spent[frame * 2 + s]
+
+        event = np.searchsorted(bomb_ticks[bomb_rows], points, side='right') - 1
+        has_event = event >= 0
+        columns["bomb"] = np.zeros(len(points), dtype=np.int64)
+        columns["bomb"][has_event] = bomb_codes[bomb_rows][event[has_event]]
+        columns["bombSite"] = np.full(len(points), -1, dtype=np.int64)
+        columns["bombSite"][has_event] = bomb_sites[bomb_rows][event[has_event]]
+
+        # Round clock until the plant, then the bomb timer
+        round_plants = plant_ticks[in_round(plant_ticks)]
+        plant = np.searchsorted(round_plants, points, side='right') - 1
+        planted = plant >= 0
+        columns["deadline"] = np.full(len(points), freeze_end + int(ROUND_TIME_SECONDS * tick_rate), dtype=np.int64)
+        columns["deadline"][planted] = round_plants[plant[planted]] + int(BOMB_TIMER_SECONDS * tick_rate)
+
+        state = np.column_stack([columns[field] for field in ROUND_STATE_FIELDS])
+        changed = np.ones(len(points), dtype=bool)
+        changed[1:] = np.any(state[1:] != state[:-1], axis=1)
+        timeline.append({
+            "tick": points[changed],
+            "roundNum": np.full(int(changed.sum()), int(rounds['roundNum'][i])),
+            **{field: columns[field][changed] for field in ROUND_STATE_FIELDS},
+        })
+
+    arrays = {name: np.concatenate([r[name] for r in timeline]).astype(np.int64) for name in timeline[0]}
+    np.savez(
+        round_state_path(demo_id),
+        **arrays,
+        bombSites=sites,
+        rounds_roundNum=rounds['roundNum'].astype(np.int64),
+        rounds_startTick=rounds['startTick'].astype(np.int64),
+        rounds_endTick=rounds['endTick'].astype(np.int64),
+        tick_rate=np.float64(tick_rate),
+    )
+    return {"rounds": len(timeline), "changePoints": int(len(arrays["tick"]))}
+
+
+def win_tables_stamp_path() -> Path:
+    """File touched whenever the win probability counts change (see winprob.load_tables)"""
+    return WINPROB_DIR / "counts.stamp"
+
+
+def invalidate_win_tables():
+    """Mark the fitted win probability tables as stale"""
+    win_tables_stamp_path().touch()
+
+
+def win_observations(demo_id: str, map_name: str) -> List[Dict[str, Any]]:
+    """
+    Round state observations of a demo for the win probability tables
+
+    Every distinct (CT alive, T alive, bomb planted) state a round passes
+    through counts once, keyed with both teams' buy class; ct_wins counts
+    the observations of rounds CT went on to win.
+    """
+    path = round_state_path(demo_id)
+    if not path.exists():
+        build_round_state(demo_id)
+        if not path.exists():
+            return []
+    rounds = columnar.load_table(demo_id, 'rounds', ['roundNum', 'winnerSide', 'ctEquipmentValue', 'tEquipmentValue'])
+    if 'winnerSide' not in rounds:
+        return []
+    with np.load(path, allow_pickle=False) as npz:
+        timeline = {name: npz[name] for name in ('roundNum', 'ctAlive', 'tAlive', 'bomb')}
+
+    counts: Dict[tuple, List[int]] = {}
+    for i in range(columnar.table_length(rounds)):
+        winner = str(rounds['winnerSide'][i])
+        if winner not in SIDES:
+            continue
+        round_num = int(rounds['roundNum'][i])
+        buys = tuple(
+            classify_buy(round_num, int(rounds[column][i]) if column in rounds else 0)
+            for column in ('ctEquipmentValue', 'tEquipmentValue')
+        )
+        rows = timeline['roundNum'] == round_num
+        states = set(zip(
+            (timeline['bomb'][rows] > 0).astype(int).tolist(),
+            np.clip(timeline['ctAlive'][rows], 0, WINPROB_MAX_ALIVE).tolist(),
+            np.clip(timeline['tAlive'][rows], 0, WINPROB_MAX_ALIVE).tolist(),
+        ))
+        for state in states:
+            entry = counts.setdefault(buys + state, [0, 0])
+            entry[0] += 1
+            entry[1] += int(winner == "CT")
+
+    return [
+        {
+            "map_name": map_name,
+            "ct_buy": ct_buy,
+            "t_buy": t_buy,
+            "bomb_planted": planted,
+            "ct_alive": ct_alive,
+            "t_alive": t_alive,
+            "observations": observations,
+            "ct_wins": ct_wins,
+        }
+        for (ct_buy, t_buy, planted, ct_alive, t_alive), (observations, ct_wins) in sorted(counts.items())
+    ]
+
+
+def build_win_observations(demo_id: str) -> Dict[str, Any]:
+    """Add a demo's round state observations to the win probability counts (agg_winprob)"""
+    metadata = database.get_demo_metadata(demo_id)
+    if metadata is None:
+        raise LookupError(f"No metadata row for demo {demo_id}")
+    rows = win_observations(demo_id, metadata['map_name'])
+    if not database.merge_demo_partials(demo_id, {"agg_winprob": rows}):
+        raise RuntimeError(f"Could not add the win observations of demo {demo_id}")
+    invalidate_win_tables()
+    return {"observations": sum(row["observations"] for row in rows)}
+
+
+# Ordered build steps; later steps read what earlier ones wrote
+ARTIFACT_STEPS: List[tuple] = [
+    ("columns", build_columns),
+    ("round_index", build_round_index),
+    ("tick_lod", build_tick_lod),
+    ("heatmap_cube", build_heatmap_cube),
+    ("heatmap_cube_hires", lambda demo_id: build_heatmap_cube(demo_id, HEATMAP_HIRES_GRID_SIZE)),
+    ("player_stats", build_player_stats),
+    ("economy", build_economy_summary),
+    ("spatial_index", build_spatial_index),
+    ("replay_frames", build_replay_frames),
+    ("round_state", build_round_state),
+    ("win_observations", build_win_observations),
+    ("grenade_lineups", lineups.build_demo_lineups),
+]
+
+# Steps that add to the library-wide counts, so need the demo's metadata row
+METADATA_STEPS = ("win_observations", "grenade_lineups")
+
+
+def build_all(demo_id: str, on_step: Optional[Callable[[str], None]] = None,
+              steps: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Build every derived artifact of a demo
+
+    Args:
+        demo_id: Demo to process
+        on_step: Called with the step name before each step runs
+        steps: Names of the steps to run (default: all), still in ARTIFACT_STEPS order
+
+    Returns:
+        Dict mapping step name to its summary
+    """
+    storage.artifact_dir(demo_id).mkdir(parents=True, exist_ok=True)
+    selected = None if steps is None else set(steps)
+    results = {}
+    for name, builder in ARTIFACT_STEPS:
+        if selected is not None and name not in selected:
+            continue
+        if on_step:
+            on_step(name)
+        results[name] = builder(demo_id)
+    return results
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Bulk import of parsed demos
+
+Ingests a directory of parser JSON files without going through the API:
+files are validated and written to storage by a multiprocessing pool, and
+all metadata rows are inserted with executemany in a single transaction.
+
+Usage (from the backend directory):
+    python -m app.bulk_import /path/to/parsed_demos --workers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app import aggregates, artifacts, database, storage
+from app.config import MAX_JSON_SIZE_MB
+
+
+def derive_metadata(match_data: Dict[str, Any], demo_name: str) -> Dict[str, Any]:
+    """Build demo metadata from parser output (same fields the frontend sends)"""
+    game_data = match_data.get('game', match_data)
+    header = match_data.get('header', game_data.get('header', {}))
+    rounds = game_data.get('rounds', [])
+    players = game_data.get('players', [])
+
+    # Teams on each side at the start of the match
+    team_ct = team_t = None
+    for tick in game_data.get('ticks', [])[:50]:
+        if tick.get('side') == 'CT' and team_ct is None:
+            team_ct = tick.get('team')
+        elif tick.get('side') == 'T' and team_t is None:
+            team_t = tick.get('team')
+
+    last_round = rounds[-1] if rounds else {}
+    return {
+        "map_name": header.get('mapName') or "Unknown",
+        "date": datetime.utcnow().isoformat(),
+        "team_ct": team_ct,
+        "team_t": team_t,
+        "player_count": len(players),
+        "round_count": len(rounds),
+        "score_ct": last_round.get('ctScore'),
+        "score_t": last_round.get('tScore'),
+        "demo_name": demo_name,
+    }
+
+
+def _import_file(task: tuple) -> Dict[str, Any]:
+    """Pool worker: validate one file, write it to storage and optionally build artifacts"""
+    path, build_artifacts = task
+    path = Path(path)
+    result = {"path": str(path), "bytes_read": 0, "error": None}
+    demo_id = str(uuid.uuid4())
+
+    try:
+        raw = path.read_bytes()
+        result["bytes_read"] = len(raw)
+        size_mb = len(raw) / (1024 * 1024)
+        if size_mb > MAX_JSON_SIZE_MB:
+            raise ValueError(f"JSON data too large ({size_mb:.2f}MB). Maximum: {MAX_JSON_SIZE_MB}MB")
+
+        content = json.loads(raw)
+        if not isinstance(content, dict):
+            raise ValueError("Top-level JSON value is not an object")
+
+        if 'data' in content and 'metadata' in content:
+            # Saved request body ({"metadata": ..., "data": ...})
+            match_data = content['data']
+            metadata = derive_metadata(match_data, path.name)
+            metadata.update({k: v for k, v in content['metadata'].items() if v is not None})
+            json_data = json.dumps(match_data)
+            storage.write_demo_json(demo_id, json_data)
+            file_size = len(json_data.encode('utf-8'))
+        else:
+            # Plain parser output, stored byte for byte
+            match_data = content
+            metadata = derive_metadata(match_data, path.name)
+            storage.demo_path(demo_id).write_bytes(raw)
+            file_size = len(raw)
+
+        game_data = match_data.get('game', match_data)
+        if 'ticks' not in game_data or 'rounds' not in game_data:
+            raise ValueError("Not a parser output file (missing ticks/rounds)")
+        result["partials"] = aggregates.match_partials(match_data, metadata['map_name'])
+
+        if build_artifacts:
+            # Steps needing the metadata row run after the batch insert (_build_metadata_steps)
+            database.upsert_job(demo_id, 'running')
+            result["artifacts"] = artifacts.build_all(
+                demo_id, steps=[name for name, _ in artifacts.ARTIFACT_STEPS if name not in artifacts.METADATA_STEPS]
+            )
+
+        result.update(demo_id=demo_id, metadata=metadata, file_size=file_size)
+    except Exception as e:
+        storage.delete_demo_files(demo_id)
+        database.delete_job(demo_id)
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+def _build_metadata_steps(task: tuple) -> Dict[str, Any]:
+    """Pool worker: run the artifact steps that need the demo's metadata row and record the job"""
+    demo_id, built = task
+    try:
+        results = {**built, **artifacts.build_all(demo_id, steps=artifacts.METADATA_STEPS)}
+        database.update_job(demo_id, status='done', step=None, error=None, result=json.dumps(results))
+        return {"demo_id": demo_id, "error": None}
+    except Exception as e:
+        message = f"{type(e).__name__}: {e}"
+        database.update_job(demo_id, status='failed', error=message)
+        return {"demo_id": demo_id, "error": message}
+
+
+def bulk_import(
+    input_dir: Path,
+    workers: Optional[int] = None,
+    pattern: str = "*.json",
+    build_artifacts: bool = False
+) -> Dict[str, Any]:
+    """
+    Import every matching JSON file of a directory
+
+    Args:
+        input_dir: Directory with parser JSON files
+        workers: Pool size (default: CPU count)
+        pattern: Glob pattern for input files
+        build_artifacts: Build derived artifacts in the pool instead of
+            queueing them for the server's ingest workers
+
+    Returns:
+        Summary with imported/failed counts, artifact build failures
+        (imported demos whose job failed) and throughput
+    """
+    files = sorted(p for p in Path(input_dir).glob(pattern) if p.is_file())
+    database.create_tables()
+
+    started = time.perf_counter()
+    imported: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    artifact_errors: List[Dict[str, Any]] = []
+
+    if files:
+        tasks = [(str(p), build_artifacts) for p in files]
+        with multiprocessing.Pool(processes=workers) as pool:
+            for i, result in enumerate(pool.imap_unordered(_import_file, tasks), 1):
+                (failed if result["error"] else imported).append(result)
+                print(f"\r  Processed {i}/{len(files)} files", end="", flush=True)
+        print()
+
+    write_done = time.perf_counter()
+
+    if imported:
+        ok = database.save_demos_metadata_batch(
+            [(r["demo_id"], r["metadata"], r["file_size"]) for r in imported],
+            job_status='running' if build_artifacts else 'queued',
+            partials={r["demo_id"]: r["partials"] for r in imported}
+        )
+        if not ok:
+            # Roll back the files written for this batch
+            for r in imported:
+                storage.delete_demo_files(r["demo_id"])
+            failed.extend({**r, "error": "metadata insert failed"} for r in imported)
+            imported = []
+
+    db_done = time.perf_counter()
+
+    if imported and build_artifacts:
+        tasks = [(r["demo_id"], r["artifacts"]) for r in imported]
+        with multiprocessing.Pool(processes=workers) as pool:
+            artifact_errors = [r for r in pool.imap_unordered(_build_metadata_steps, tasks) if r["error"]]
+
+    elapsed = time.perf_counter() - started
+    total_mb = sum(r["bytes_read"] for r in imported) / (1024 * 1024)
+    return {
+        "files": len(files),
+        "imported": len(imported),
+        "failed": failed,
+        "artifact_errors": artifact_errors,
+        "elapsed_s": elapsed,
+        "write_s": write_done - started,
+        "db_s": db_done - write_done,
+        "demos_per_s": len(imported) / elapsed if elapsed > 0 else 0.0,
+        "mb_per_s": total_mb / elapsed if elapsed > 0 else 0.0,
+        "total_mb": total_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import a directory of parsed CS2 demos')
+    parser.add_argument('input_dir', help='Directory containing parser JSON files')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--pattern', type=str, default='*.json',
+                       help='Glob pattern for input files (default: *.json)')
+    parser.add_argument('--build-artifacts', action='store_true',
+                       help='Build derived artifacts during import '
+                            '(default: queue them for the server to build on next start)')
+
+    args = parser.parse_args()
+
+    print(f"Importing demos from {args.input_dir}...")
+    summary = bulk_import(
+        Path(args.input_dir),
+        workers=args.workers,
+        pattern=args.pattern,
+        build_artifacts=args.build_artifacts
+    )
+
+    for failure in summary["failed"]:
+        print(f"✗ {failure['path']}: {failure['error']}")
+    for failure in summary["artifact_errors"]:
+        print(f"✗ {failure['demo_id']}: artifacts failed: {failure['error']}")
+
+    print(f"\n✓ Imported {summary['imported']}/{summary['files']} demos "
+          f"({summary['total_mb']:.1f} MB) in {summary['elapsed_s']:.2f}s")
+    print(f"  Storage writes: {summary['write_s']:.2f}s, metadata insert: {summary['db_s']:.3f}s")
+    print(f"  Throughput: {summary['demos_per_s']:.1f} demos/s, {summary['mb_per_s']:.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
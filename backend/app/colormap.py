@@ -0,0 +1,64 @@
+"""
+Heatmap colormaps
+
+Red (T) and blue (CT) colormaps as precomputed RGBA lookup tables, and
+the LUT alpha blend that draws a normalized density layer onto RGB
+pixels. Shared by the radar tiles and the heatmap scripts in utils/
+(through utils/backend_path.py), so both render the same colors.
+"""
+
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+LUT_SIZE = 256
+
+# Same color stops as the matplotlib colormaps the PNGs used to be drawn with
+COLOR_STOPS = {
+    "T": ['#00000000', '#ef444420', '#ef444460', '#ef4444aa', '#ef4444'],
+    "CT": ['#00000000', '#3b82f620', '#3b82f660', '#3b82f6aa', '#3b82f6'],
+}
+
+
+def _hex_to_rgba(color: str) -> List[float]:
+    """'#rrggbb' or '#rrggbbaa' to floats in 0-1"""
+    color = color.lstrip('#')
+    channels = [int(color[i:i + 2], 16) / 255 for i in range(0, len(color), 2)]
+    return channels + [1.0] * (4 - len(channels))
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(side: str) -> np.ndarray:
+    """
+    RGBA lookup table (LUT_SIZE x 4, floats 0-1) for a side
+
+    Linear interpolation between equally spaced color stops, like
+    LinearSegmentedColormap.from_list.
+    """
+    stops = np.array([_hex_to_rgba(c) for c in COLOR_STOPS[side]])
+    positions = np.linspace(0, 1, len(stops))
+    samples = np.linspace(0, 1, LUT_SIZE)
+    lut = np.stack([np.interp(samples, positions, stops[:, ch]) for ch in range(4)], axis=1)
+    lut = lut.astype(np.float32)
+    lut.setflags(write=False)
+    return lut
+
+
+def blend(canvas: np.ndarray, values: np.ndarray, side: str, alpha: float) -> np.ndarray:
+    """
+    Alpha-blend a colorized density layer into an RGB float canvas (in place)
+
+    Args:
+        canvas: H x W x 3 float array
+        values: H x W density normalized 0-1
+        side: "CT" or "T" (selects the colormap)
+        alpha: Layer transparency
+    """
+    index = (np.clip(values, 0.0, 1.0) * (LUT_SIZE - 1)).astype(np.uint8)
+    # LUT entry 0 is fully transparent, so only touch pixels with density
+    covered = index > 0
+    lut = colormap_lut(side)
+    weight = lut[index[covered], 3:4] * alpha
+    canvas[covered] = canvas[covered] * (1 - weight) + lut[index[covered], :3] * weight
+    return canvas
@@ -0,0 +1,307 @@
+"""
+Columnar demo store
+
+Every list-of-records table of the parser output (ticks, kills, rounds, ...)
+is stored as one .npz file with one array per field. String fields are
+dictionary-encoded (int32 codes + the distinct values), so repeated names,
+teams and weapons cost four bytes per row. Event tables are sorted by tick,
+which lets readers slice round ranges with np.searchsorted.
+
+The ticks table is stored with the per-player delta varint codec of
+app.tickcodec in blocks per round; readers get the same arrays back, and
+a tick range only decodes the blocks it overlaps.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app import metrics, tickcodec
+from app.storage import artifact_dir
+
+SCHEMA_KEY = "__schema__"
+DICT_SUFFIX = "__dict"
+
+
+def get_game_data(match_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle both flat and nested game structure"""
+    return match_data.get('game', match_data)
+
+
+def columns_dir(demo_id: str) -> Path:
+    """Directory holding the columnar tables of a demo"""
+    return artifact_dir(demo_id) / "columns"
+
+
+def table_path(demo_id: str, table: str) -> Path:
+    """Path of a single columnar table"""
+    return columns_dir(demo_id) / f"{table}.npz"
+
+
+def lod_path(demo_id: str, table: str, resolution: str) -> Path:
+    """Path of a reduced-resolution copy of a table (kept out of list_tables)"""
+    return columns_dir(demo_id) / "lod" / f"{table}_{resolution}.npz"
+
+
+def _column_kind(values: List[Any]) -> str:
+    """Infer the storage kind of a column from its first non-null value"""
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, bool):
+        return "bool"
+    if isinstance(sample, int):
+        return "float" if any(isinstance(v, float) or v is None for v in values) else "int"
+    if isinstance(sample, float):
+        return "float"
+    if isinstance(sample, str) or sample is None:
+        return "str"
+    return "json"
+
+
+def _dictionary_encode(values: Iterable[str]):
+    """Encode strings as int32 codes into a table of distinct values"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(v, len(index)) for v in values), dtype=np.int32
+    )
+    return codes, np.array(list(index), dtype=str)
+
+
+def to_columns(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert a list of records into arrays
+
+    Returns:
+        Dict with "arrays" (name -> ndarray, including dictionaries) and
+        "schema" (field name -> kind, in record order)
+    """
+    fields = list(dict.fromkeys(k for row in rows[:1000] for k in row))
+    arrays = {}
+    schema = {}
+
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        kind = _column_kind(values)
+        schema[field] = kind
+
+        if kind == "bool":
+            arrays[field] = np.array([bool(v) for v in values], dtype=np.bool_)
+        elif kind == "int":
+            arrays[field] = np.array(values, dtype=np.int64)
+        elif kind == "float":
+            arrays[field] = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+        else:
+            if kind == "json":
+                values = [json.dumps(v) for v in values]
+            else:
+                values = ['' if v is None else v for v in values]
+            codes, dictionary = _dictionary_encode(values)
+            arrays[field] = codes
+            arrays[field + DICT_SUFFIX] = dictionary
+
+    return {"arrays": arrays, "schema": schema}
+
+
+def rows_to_table(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Records as decoded columns, the same arrays read_table returns for a stored table"""
+    if not rows:
+        return {}
+    encoded = to_columns(rows)
+    arrays = sort_by_tick(encoded["arrays"])
+    table = {}
+    for field, kind in encoded["schema"].items():
+        values = arrays[field]
+        if kind in ("str", "json"):
+            dictionary = arrays[field + DICT_SUFFIX]
+            if kind == "json":
+                dictionary = np.array([json.loads(s) for s in dictionary] + [None], dtype=object)[:-1]
+            values = dictionary[values]
+        table[field] = values
+    return table
+
+
+def sort_by_tick(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Stable-sort all row arrays by the tick column (no-op if already sorted)"""
+    ticks = arrays.get('tick')
+    if ticks is None or len(ticks) < 2 or np.all(ticks[1:] >= ticks[:-1]):
+        return arrays
+    order = np.argsort(ticks, kind='stable')
+    return {
+        name: arr if name.endswith(DICT_SUFFIX) else arr[order]
+        for name, arr in arrays.items()
+    }
+
+
+def write_table(path: Path, rows: List[Dict[str, Any]], block_ticks: Optional[np.ndarray] = None) -> int:
+    """
+    Write one table as .npz, returns the number of bytes written
+
+    With block_ticks (e.g. round start ticks), per-player tables are stored
+    with the delta varint codec in blocks starting at those ticks.
+    """
+    encoded = to_columns(rows)
+    arrays = sort_by_tick(encoded["arrays"])
+    if block_ticks is not None and tickcodec.can_encode(arrays, encoded["schema"]):
+        dictionaries = {name: arr for name, arr in arrays.items() if name.endswith(DICT_SUFFIX)}
+        arrays = {**dictionaries, **tickcodec.encode_table(arrays, encoded["schema"], block_ticks)}
+    arrays[SCHEMA_KEY] = np.array(json.dumps(encoded["schema"]))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **arrays)
+    return path.stat().st_size
+
+
+def write_table_rows(src: Path, dst: Path, rows: np.ndarray) -> int:
+    """
+    Copy a subset of a table's rows into a new table file
+
+    Codes are copied as stored, so dictionaries and the schema carry over
+    without decoding strings. The copy is always a plain table. Returns the
+    number of bytes written.
+    """
+    with np.load(src, allow_pickle=False) as npz:
+        schema = json.loads(str(npz[SCHEMA_KEY]))
+        stored, _ = _read_arrays(npz, schema, list(schema))
+        arrays = {name: values[rows] for name, values in stored.items()}
+        arrays.update({name: npz[name] for name in npz.files if name.endswith(DICT_SUFFIX)})
+        arrays[SCHEMA_KEY] = npz[SCHEMA_KEY]
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(dst, **arrays)
+    return dst.stat().st_size
+
+
+def write_demo_columns(demo_id: str, match_data: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Write every table of a parsed demo into the columnar store
+
+    Returns:
+        Dict mapping table name to row count
+    """
+    game_data = get_game_data(match_data)
+    out_dir = columns_dir(demo_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Tick blocks start at every round start, so a round decodes on its own
+    round_starts = np.array(
+        [r['startTick'] for r in game_data.get('rounds') or [] if isinstance(r, dict) and 'startTick' in r],
+        dtype=np.int64
+    )
+
+    row_counts = {}
+    for name, value in game_data.items():
+        if isinstance(value, list) and all(isinstance(r, dict) for r in value[:1]):
+            write_table(out_dir / f"{name}.npz", value, round_starts if name == 'ticks' else None)
+            row_counts[name] = len(value)
+
+    header = match_data.get('header', game_data.get('header', {}))
+    with open(out_dir / "header.json", 'w') as f:
+        json.dump(header, f)
+
+    return row_counts
+
+
+def has_columns(demo_id: str) -> bool:
+    """Check if the columnar store of a demo has been built"""
+    return (columns_dir(demo_id) / "header.json").exists()
+
+
+def list_tables(demo_id: str) -> List[str]:
+    """Names of the columnar tables stored for a demo"""
+    return sorted(p.stem for p in columns_dir(demo_id).glob("*.npz"))
+
+
+def load_header(demo_id: str) -> Dict[str, Any]:
+    """Load the parser header stored alongside the columnar tables"""
+    with open(columns_dir(demo_id) / "header.json", 'r') as f:
+        return json.load(f)
+
+
+def load_schema(demo_id: str, table: str) -> Dict[str, str]:
+    """Load the field kinds of a columnar table"""
+    with np.load(table_path(demo_id, table), allow_pickle=False) as npz:
+        return json.loads(str(npz[SCHEMA_KEY]))
+
+
+def _read_arrays(npz, schema: Dict[str, str], fields: List[str],
+                 tick_range: Optional[Tuple[Optional[int], Optional[int]]] = None
+                 ) -> Tuple[Dict[str, np.ndarray], int]:
+    """Stored arrays of some fields (strings as codes) and the bytes read, plain or codec tables"""
+    if tickcodec.CODEC_KEY in npz.files:
+        return tickcodec.decode_table(npz, schema, fields, tick_range)
+    if tick_range is None or 'tick' not in schema:
+        arrays = {field: npz[field] for field in fields}
+        return arrays, sum(values.nbytes for values in arrays.values())
+    ticks = npz['tick']
+    first_tick, last_tick = tick_range
+    lo = 0 if first_tick is None else int(np.searchsorted(ticks, first_tick, side='left'))
+    hi = len(ticks) if last_tick is None else int(np.searchsorted(ticks, last_tick, side='right'))
+    arrays = {field: ticks[lo:hi] if field == 'tick' else tickcodec.read_slice(npz, field, lo, hi) for field in fields}
+    return arrays, ticks.nbytes + sum(values.nbytes for field, values in arrays.items() if field != 'tick')
+
+
+def read_table(path: Path, columns: Optional[List[str]] = None,
+               tick_range: Optional[Tuple[Optional[int], Optional[int]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Read a columnar table
+
+    Args:
+        path: Path of the .npz table
+        columns: Fields to load, or None for all (only requested arrays are read)
+        tick_range: Optional (first, last) ticks to keep, inclusive, either may be None
+
+    Returns:
+        Dict of field name -> array; string fields are decoded
+    """
+    table = {}
+    with metrics.STORAGE_SECONDS.time(op="read_columns"), np.load(path, allow_pickle=False) as npz:
+        schema = json.loads(str(npz[SCHEMA_KEY]))
+        fields = [field for field in columns or list(schema) if field in schema]
+        stored, read_bytes = _read_arrays(npz, schema, fields, tick_range)
+        for field in fields:
+            kind = schema[field]
+            values = stored[field]
+            if kind in ("str", "json"):
+                dictionary = npz[field + DICT_SUFFIX]
+                read_bytes += dictionary.nbytes
+                if kind == "json":
+                    dictionary = np.array([json.loads(s) for s in dictionary] + [None], dtype=object)[:-1]
+                values = dictionary[values] if len(dictionary) else np.array([], dtype=str)
+            table[field] = values
+    metrics.STORAGE_BYTES_READ.inc(read_bytes, kind="columns")
+    return table
+
+
+def load_table(demo_id: str, table: str, columns: Optional[List[str]] = None,
+               resolution: Optional[str] = None,
+               tick_range: Optional[Tuple[Optional[int], Optional[int]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Read a columnar table of a demo (empty dict if the table does not exist)
+
+    resolution selects a reduced copy written by the ingest pipeline
+    (see artifacts.build_tick_lod); None or "full" reads the table itself.
+    tick_range keeps only the rows of (first, last) ticks.
+    """
+    path = table_path(demo_id, table) if resolution in (None, "full") else lod_path(demo_id, table, resolution)
+    if not path.exists():
+        return {}
+    return read_table(path, columns, tick_range)
+
+
+def table_length(table: Dict[str, np.ndarray]) -> int:
+    """Number of rows in a loaded table"""
+    return len(next(iter(table.values()))) if table else 0
+
+
+def to_rows(table: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Convert loaded columns back into a list of JSON-serializable records"""
+    names = list(table)
+    lists = []
+    for name in names:
+        arr = table[name]
+        values = arr.tolist()
+        if arr.dtype.kind == 'f' and np.isnan(arr).any():
+            values = [None if v != v else v for v in values]
+        lists.append(values)
+    return [dict(zip(names, vals)) for vals in zip(*lists)]
@@ -5,12 +5,25 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Data directories
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.environ.get("CS2_DATA_DIR", BASE_DIR / "data"))
 DEMOS_DIR = DATA_DIR / "demos"
+ARTIFACTS_DIR = DATA_DIR / "artifacts"
+PROFILES_DIR = DATA_DIR / "profiles"
+TILES_DIR = DATA_DIR / "tiles"
+WINPROB_DIR = DATA_DIR / "winprob"
+LINEUPS_DIR = DATA_DIR / "lineups"
 DB_PATH = DATA_DIR / "metadata.db"
 
 # Create directories if they don't exist
 DEMOS_DIR.mkdir(parents=True, exist_ok=True)
+ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+TILES_DIR.mkdir(parents=True, exist_ok=True)
+WINPROB_DIR.mkdir(parents=True, exist_ok=True)
+LINEUPS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Radar images (served by the frontend)
+RADAR_DIR = Path(os.environ.get("CS2_RADAR_DIR", BASE_DIR.parent / "frontend" / "public" / "radar_images"))
 
 # CORS settings
 CORS_ORIGINS = [
@@ -25,6 +38,69 @@ CORS_ORIGINS = [
 # File settings
 MAX_JSON_SIZE_MB = 500  # Maximum JSON file size in MB
 
+# Demo loading settings
+DEMO_CACHE_SIZE = int(os.environ.get("CS2_DEMO_CACHE_SIZE", 8))  # Parsed demos kept in memory (LRU)
+BATCH_MAX_DEMOS = 200  # Maximum demo ids per /demos/batch request
+BATCH_CONCURRENCY = 4  # Demos loaded in parallel per batch request
+
+# Ingest pipeline settings
+INGEST_ENABLED = os.environ.get("CS2_INGEST", "1") == "1"  # Set CS2_INGEST=0 to skip background artifact builds
+INGEST_WORKERS = int(os.environ.get("CS2_INGEST_WORKERS", 2))  # Worker processes
+INGEST_MAX_ATTEMPTS = 3  # Attempts per job before it is marked failed
+INGEST_RETRY_DELAY_S = 2.0  # Base delay between attempts (doubles each retry)
+HEATMAP_GRID_SIZE = 50  # Bins per dimension of the precomputed heatmap cube
+HEATMAP_HIRES_GRID_SIZE = 256  # Bins per dimension of the high-resolution cube
+TICK_FLOAT_DECIMALS = 2  # Tick floats (positions, angles, velocities) are stored to this precision
+TICK_LOD_FACTORS = (4, 16)  # Reduced tick tables keep every Nth sampled tick
+TICK_PATH_TOLERANCE = 24.0  # Simplified player paths stay within this many game units
+
+# Smoothed heatmap settings
+HEATMAP_MAX_GRID_SIZE = 1024  # Largest grid served by /demo/{id}/heatmap
+HEATMAP_DEFAULT_BANDWIDTH = 80.0  # Gaussian bandwidth (sigma) in game units
+HEATMAP_CACHE_SIZE = 16  # Raw histograms kept in memory (LRU)
+
+# Tile pyramid settings
+TILE_SIZE = 256  # Tile width and height in pixels
+TILE_MAX_ZOOM = 4  # Deepest zoom level (2^z x 2^z tiles)
+TILE_CACHE_MAX_MB = float(os.environ.get("CS2_TILE_CACHE_MAX_MB", 512))  # Disk cache limit (LRU eviction)
+TILE_HEATMAP_ALPHA = 0.6  # Heatmap layer transparency
+
+# Region query settings
+SPATIAL_CELL_SIZE = 128.0  # Spatial index bucket size in game units
+SPATIAL_CACHE_SIZE = 16  # Loaded spatial indexes kept in memory (LRU)
+REGION_QUERY_MAX_ROWS = 10000  # Most event rows returned by one region query
+
+# Player analytics settings
+STATS_CACHE_SIZE = 256  # Per-demo stat sheets kept in memory (LRU)
+TRADE_WINDOW_SECONDS = 5.0  # A kill within this long of a teammate's death trades it
+
+# Round state settings
+ROUND_TIME_SECONDS = 115.0  # Round clock after freeze time (competitive default)
+BOMB_TIMER_SECONDS = 40.0  # Time from plant to explosion
+ROUND_STATE_CACHE_SIZE = 64  # Round state timelines kept in memory (LRU)
+
+# Win probability settings
+WINPROB_PRIOR_STRENGTH = 20.0  # Observations a table cell needs to outweigh its smoothing prior
+WINPROB_ALIVE_WEIGHT = 0.9  # Log-odds per extra player alive in the prior of unseen states
+WINPROB_PLANT_WEIGHT = 0.8  # Log-odds towards T of a planted bomb in the same prior
+
+# Grenade lineup settings
+LINEUP_CELL_SIZE = 96.0  # Grid cell of throw and landing positions, in game units
+LINEUP_MAX_FLIGHT_SECONDS = 20.0  # Throws without a detonation within this long are dropped
+LINEUP_MIN_THROWS = 2  # Fewest throws listed as a lineup
+
+# Analytical query settings
+QUERY_MAX_ROWS = 10000  # Most rows returned by one /query request
+QUERY_TIMEOUT_S = float(os.environ.get("CS2_QUERY_TIMEOUT_S", 30.0))  # Queries running longer are cancelled
+QUERY_WORKERS = 4  # Demos scanned in parallel
+
+# Profiling settings (opt-in)
+PROFILE_ENABLED = os.environ.get("CS2_PROFILE", "0") == "1"  # Profile sampled requests
+PROFILE_SAMPLE_RATE = float(os.environ.get("CS2_PROFILE_SAMPLE_RATE", 1.0))  # Fraction of requests profiled
+PROFILE_THRESHOLD_MS = float(os.environ.get("CS2_PROFILE_THRESHOLD_MS", 500))  # Keep profiles of slower requests
+PROFILE_HEADER = "x-profile"  # Send "X-Profile: 1" to profile a single request (needs CS2_PROFILE=1)
+PROFILE_MAX_FILES = 50  # Oldest profiles are deleted beyond this count
+
 # Server settings
 HOST = "0.0.0.0"
 PORT = 8000
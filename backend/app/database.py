@@ -2,9 +2,46 @@ import sqlite3
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from app import metrics
 from app.config import DB_PATH
 
+# Materialized cross-match aggregates: table -> key columns, label columns
+# (overwritten by the latest demo) and counted columns (summed). The first
+# counted column is the number of contributing demos/rounds; a row is
+# dropped once it reaches zero.
+AGGREGATE_TABLES = {
+    "agg_team_maps": {
+        "keys": {"team": "TEXT", "map_name": "TEXT"},
+        "labels": (),
+        "counts": ("matches", "wins", "losses", "ties", "rounds_won", "rounds_lost"),
+    },
+    "agg_players": {
+        "keys": {"steam_id": "INTEGER"},
+        "labels": ("name",),
+        "counts": ("demos", "rounds", "kills", "deaths", "assists", "headshots", "damage",
+                   "opening_kills", "opening_deaths", "trade_kills", "traded_deaths", "survived", "kast"),
+    },
+    "agg_economy": {
+        "keys": {"map_name": "TEXT", "round_num": "INTEGER", "side": "TEXT"},
+        "labels": (),
+        "counts": ("rounds", "start_money", "equipment_value", "wins"),
+    },
+    "agg_winprob": {
+        "keys": {"map_name": "TEXT", "ct_buy": "TEXT", "t_buy": "TEXT", "bomb_planted": "INTEGER",
+                 "ct_alive": "INTEGER", "t_alive": "INTEGER"},
+        "labels": (),
+        "counts": ("observations", "ct_wins"),
+    },
+    "agg_lineups": {
+        "keys": {"map_name": "TEXT", "grenade_type": "TEXT", "side": "TEXT", "team": "TEXT",
+                 "throw_cell_x": "INTEGER", "throw_cell_y": "INTEGER",
+                 "land_cell_x": "INTEGER", "land_cell_y": "INTEGER"},
+        "labels": (),
+        "counts": ("throws", "throw_x_sum", "throw_y_sum", "land_x_sum", "land_y_sum"),
+    },
+}
+
 
 def get_connection():
     """Get a database connection"""
@@ -13,6 +50,7 @@ def get_connection():
     return conn
 
 
+@metrics.timed_db
 def create_tables():
     """Initialize database tables"""
     conn = get_connection()
@@ -35,42 +73,86 @@ def create_tables():
         )
     """)
     
+    for table, spec in AGGREGATE_TABLES.items():
+        columns = (
+            [f"{c} {kind}" for c, kind in spec["keys"].items()]
+            + [f"{c} TEXT" for c in spec["labels"]]
+            + [f"{c} INTEGER NOT NULL DEFAULT 0" for c in spec["counts"]]
+        )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {", ".join(columns)},
+                PRIMARY KEY ({", ".join(spec["keys"])})
+            )
+        """)
+    
+    # Each demo's contribution to the aggregates, subtracted again on delete
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS demo_aggregates (
+            demo_id TEXT PRIMARY KEY,
+            partials TEXT NOT NULL
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            demo_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            step TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            result TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    
     conn.commit()
     conn.close()
 
 
+@metrics.timed_db
 def save_demo_metadata(
     demo_id: str,
     metadata: Dict[str, Any],
-    file_size: int
+    file_size: int,
+    partials: Optional[Dict[str, List[Dict[str, Any]]]] = None
 ) -> bool:
-    """Save demo metadata to database"""
+    """
+    Save demo metadata to database
+    
+    partials (see aggregates.demo_partials) are added to the aggregate
+    tables in the same transaction.
+    """
     try:
         conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO demos (
-                demo_id, map_name, date, team_ct, team_t,
-                player_count, round_count, score_ct, score_t,
-                demo_name, created_at, file_size
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            demo_id,
-            metadata.get('map_name'),
-            metadata.get('date'),
-            metadata.get('team_ct'),
-            metadata.get('team_t'),
-            metadata.get('player_count'),
-            metadata.get('round_count'),
-            metadata.get('score_ct'),
-            metadata.get('score_t'),
-            metadata.get('demo_name'),
-            datetime.utcnow().isoformat(),
-            file_size
-        ))
+        with conn:
+            cursor.execute("""
+                INSERT INTO demos (
+                    demo_id, map_name, date, team_ct, team_t,
+                    player_count, round_count, score_ct, score_t,
+                    demo_name, created_at, file_size
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                demo_id,
+                metadata.get('map_name'),
+                metadata.get('date'),
+                metadata.get('team_ct'),
+                metadata.get('team_t'),
+                metadata.get('player_count'),
+                metadata.get('round_count'),
+                metadata.get('score_ct'),
+                metadata.get('score_t'),
+                metadata.get('demo_name'),
+                datetime.utcnow().isoformat(),
+                file_size
+            ))
+            
+            if partials is not None:
+                _add_partials(cursor, demo_id, partials)
         
-        conn.commit()
         conn.close()
         return True
     except Exception as e:
@@ -78,6 +160,67 @@ def save_demo_metadata(
         return False
 
 
+@metrics.timed_db
+def save_demos_metadata_batch(
+    demos: List[Tuple[str, Dict[str, Any], int]],
+    job_status: Optional[str] = None,
+    partials: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None
+) -> bool:
+    """
+    Save metadata of many demos in a single transaction
+    
+    Args:
+        demos: List of (demo_id, metadata, file_size) tuples
+        job_status: If set, also create an ingest job with this status per demo
+        partials: Optional demo_id -> aggregate partials, added in the same transaction
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        now = datetime.utcnow().isoformat()
+        
+        with conn:
+            cursor.executemany("""
+                INSERT INTO demos (
+                    demo_id, map_name, date, team_ct, team_t,
+                    player_count, round_count, score_ct, score_t,
+                    demo_name, created_at, file_size
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    demo_id,
+                    metadata.get('map_name'),
+                    metadata.get('date'),
+                    metadata.get('team_ct'),
+                    metadata.get('team_t'),
+                    metadata.get('player_count'),
+                    metadata.get('round_count'),
+                    metadata.get('score_ct'),
+                    metadata.get('score_t'),
+                    metadata.get('demo_name'),
+                    now,
+                    file_size
+                )
+                for demo_id, metadata, file_size in demos
+            ])
+            
+            if job_status:
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO ingest_jobs (demo_id, status, attempts, created_at, updated_at)
+                    VALUES (?, ?, 0, ?, ?)
+                """, [(demo_id, job_status, now, now) for demo_id, _, _ in demos])
+            
+            for demo_id, demo_partials in (partials or {}).items():
+                _add_partials(cursor, demo_id, demo_partials)
+        
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error saving metadata batch: {e}")
+        return False
+
+
+@metrics.timed_db
 def get_all_demos() -> List[Dict[str, Any]]:
     """Get all demos ordered by creation date (newest first)"""
     conn = get_connection()
@@ -94,6 +237,7 @@ def get_all_demos() -> List[Dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+@metrics.timed_db
 def get_demo_metadata(demo_id: str) -> Optional[Dict[str, Any]]:
     """Get metadata for a specific demo"""
     conn = get_connection()
@@ -110,19 +254,29 @@ def get_demo_metadata(demo_id: str) -> Optional[Dict[str, Any]]:
     return dict(row) if row else None
 
 
+@metrics.timed_db
 def delete_demo(demo_id: str) -> bool:
-    """Delete demo metadata from database"""
+    """Delete demo metadata from database, subtracting the demo from the aggregates"""
     try:
         conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            DELETE FROM demos
-            WHERE demo_id = ?
-        """, (demo_id,))
+        with conn:
+            cursor.execute("""
+                DELETE FROM demos
+                WHERE demo_id = ?
+            """, (demo_id,))
+            deleted = cursor.rowcount > 0
+            
+            cursor.execute("""
+                SELECT partials FROM demo_aggregates
+                WHERE demo_id = ?
+            """, (demo_id,))
+            row = cursor.fetchone()
+            if row:
+                _apply_partials(cursor, json.loads(row['partials']), -1)
+                cursor.execute("DELETE FROM demo_aggregates WHERE demo_id = ?", (demo_id,))
         
-        deleted = cursor.rowcount > 0
-        conn.commit()
         conn.close()
         
         return deleted
@@ -131,6 +285,146 @@ def delete_demo(demo_id: str) -> bool:
         return False
 
 
+def _apply_partials(cursor, partials: Dict[str, List[Dict[str, Any]]], sign: int):
+    """Add (sign 1) or subtract (sign -1) one demo's partial rows to the aggregate tables"""
+    for table, spec in AGGREGATE_TABLES.items():
+        rows = partials.get(table) or []
+        if not rows:
+            continue
+        keys, labels, counts = list(spec["keys"]), list(spec["labels"]), list(spec["counts"])
+        columns = keys + labels + counts
+        updates = [f"{c} = excluded.{c}" for c in labels if sign > 0]
+        updates += [f"{c} = {c} + excluded.{c}" for c in counts]
+        cursor.executemany(f"""
+            INSERT INTO {table} ({", ".join(columns)})
+            VALUES ({", ".join("?" for _ in columns)})
+            ON CONFLICT({", ".join(keys)}) DO UPDATE SET {", ".join(updates)}
+        """, [
+            [row.get(c) for c in keys + labels] + [sign * int(row.get(c) or 0) for c in counts]
+            for row in rows
+        ])
+        if sign < 0:
+            # Drop the touched rows no demo contributes to anymore
+            cursor.executemany(f"""
+                DELETE FROM {table}
+                WHERE {" AND ".join(f"{c} = ?" for c in keys)} AND {counts[0]} <= 0
+            """, [[row.get(c) for c in keys] for row in rows])
+
+
+def _add_partials(cursor, demo_id: str, partials: Dict[str, List[Dict[str, Any]]]):
+    """Record a demo's partials and add them to the aggregates"""
+    cursor.execute("""
+        INSERT INTO demo_aggregates (demo_id, partials)
+        VALUES (?, ?)
+    """, (demo_id, json.dumps(partials)))
+    _apply_partials(cursor, partials, 1)
+
+
+@metrics.timed_db
+def merge_demo_partials(demo_id: str, partials: Dict[str, List[Dict[str, Any]]]) -> bool:
+    """
+    Add partials derived after a demo was saved (e.g. at ingest)
+    
+    Tables present in partials replace the demo's earlier contribution to
+    them, so rebuilding a demo's artifacts does not count it twice. Nothing
+    is added for a demo that no longer exists.
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        with conn:
+            # Checked in the same transaction, so a concurrent delete cannot slip in between
+            cursor.execute("SELECT 1 FROM demos WHERE demo_id = ?", (demo_id,))
+            exists = cursor.fetchone() is not None
+            if exists:
+                cursor.execute("SELECT partials FROM demo_aggregates WHERE demo_id = ?", (demo_id,))
+                row = cursor.fetchone()
+                recorded = json.loads(row['partials']) if row else {}
+                _apply_partials(cursor, {table: recorded.get(table) for table in partials}, -1)
+                _apply_partials(cursor, partials, 1)
+                cursor.execute("""
+                    INSERT INTO demo_aggregates (demo_id, partials)
+                    VALUES (?, ?)
+                    ON CONFLICT(demo_id) DO UPDATE SET partials = excluded.partials
+                """, (demo_id, json.dumps({**recorded, **partials})))
+        
+        return exists
+    except Exception as e:
+        print(f"Error merging aggregate partials: {e}")
+        return False
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+@metrics.timed_db
+def get_aggregates(table: str, order_by: Optional[str] = None, limit: Optional[int] = None,
+                   **filters: Any) -> List[Dict[str, Any]]:
+    """
+    Rows of an aggregate table (see AGGREGATE_TABLES)
+    
+    Args:
+        table: Aggregate table name
+        order_by: Optional counted column to sort by, descending
+        limit: Optional maximum number of rows
+        **filters: Key or label columns to match exactly (None values are ignored)
+    """
+    spec = AGGREGATE_TABLES[table]
+    allowed = set(spec["keys"]) | set(spec["labels"])
+    filters = {k: v for k, v in filters.items() if k in allowed and v is not None}
+    where = " AND ".join(f"{k} = ?" for k in filters)
+    order = f"{order_by} DESC" if order_by in spec["counts"] else ", ".join(spec["keys"])
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT * FROM {table}
+        {"WHERE " + where if where else ""}
+        ORDER BY {order}
+        {"LIMIT ?" if limit else ""}
+    """, (*filters.values(), *([limit] if limit else [])))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in rows]
+
+
+@metrics.timed_db
+def get_demo_partials() -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """Recorded aggregate partials of every demo"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT demo_id, partials FROM demo_aggregates")
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return {row['demo_id']: json.loads(row['partials']) for row in rows}
+
+
+@metrics.timed_db
+def replace_aggregates(partials: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> bool:
+    """Rebuild every aggregate table from the given demo_id -> partials in one transaction"""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        with conn:
+            for table in AGGREGATE_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            cursor.execute("DELETE FROM demo_aggregates")
+            for demo_id, demo_partials in partials.items():
+                _add_partials(cursor, demo_id, demo_partials)
+        
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error rebuilding aggregates: {e}")
+        return False
+
+
+@metrics.timed_db
 def demo_exists(demo_id: str) -> bool:
     """Check if a demo exists"""
     conn = get_connection()
@@ -144,4 +438,120 @@ def demo_exists(demo_id: str) -> bool:
     exists = cursor.fetchone() is not None
     conn.close()
     
-    return exists
\ No newline at end of file
+    return exists
+
+
+@metrics.timed_db
+def upsert_job(demo_id: str, status: str) -> bool:
+    """Create (or reset) the ingest job of a demo"""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        now = datetime.utcnow().isoformat()
+        
+        cursor.execute("""
+            INSERT INTO ingest_jobs (demo_id, status, attempts, created_at, updated_at)
+            VALUES (?, ?, 0, ?, ?)
+            ON CONFLICT(demo_id) DO UPDATE SET
+                status = excluded.status,
+                step = NULL,
+                attempts = 0,
+                error = NULL,
+                result = NULL,
+                updated_at = excluded.updated_at
+        """, (demo_id, status, now, now))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error creating ingest job: {e}")
+        return False
+
+
+@metrics.timed_db
+def update_job(demo_id: str, **fields: Any) -> bool:
+    """Update columns (status, step, attempts, error, result) of an ingest job"""
+    allowed = {'status', 'step', 'attempts', 'error', 'result'}
+    fields = {k: v for k, v in fields.items() if k in allowed}
+    if not fields:
+        return False
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        cursor.execute(f"""
+            UPDATE ingest_jobs
+            SET {assignments}, updated_at = ?
+            WHERE demo_id = ?
+        """, (*fields.values(), datetime.utcnow().isoformat(), demo_id))
+        
+        updated = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return updated
+    except Exception as e:
+        print(f"Error updating ingest job: {e}")
+        return False
+
+
+@metrics.timed_db
+def get_job(demo_id: str) -> Optional[Dict[str, Any]]:
+    """Get the ingest job of a demo"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT * FROM ingest_jobs
+        WHERE demo_id = ?
+    """, (demo_id,))
+    
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return None
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+@metrics.timed_db
+def get_unfinished_jobs() -> List[str]:
+    """Demo ids of ingest jobs that were queued or running (e.g. before a restart)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT demo_id FROM ingest_jobs
+        WHERE status IN ('queued', 'running', 'retrying')
+        ORDER BY created_at
+    """)
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [row['demo_id'] for row in rows]
+
+
+@metrics.timed_db
+def delete_job(demo_id: str) -> bool:
+    """Delete the ingest job of a demo"""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            DELETE FROM ingest_jobs
+            WHERE demo_id = ?
+        """, (demo_id,))
+        
+        deleted = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return deleted
+    except Exception as e:
+        print(f"Error deleting ingest job: {e}")
+        return False
@@ -0,0 +1,184 @@
+"""
+Background ingest pipeline
+
+After a demo is saved, a job is queued that builds its derived artifacts
+(columnar store, round index, heatmap cube, player stats, economy summary)
+in a pool of worker processes, so the save request returns immediately and
+heavy JSON/numpy work never blocks the API process. Job state lives in the
+ingest_jobs table; failed jobs are retried with exponential backoff.
+Deleting a demo cancels its queued job; a running job stops before its
+next step and removes what it already built.
+"""
+
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from app import artifacts, database, metrics, storage
+from app.config import INGEST_ENABLED, INGEST_WORKERS, INGEST_MAX_ATTEMPTS, INGEST_RETRY_DELAY_S
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+
+
+class DemoDeleted(Exception):
+    """The demo of a job was deleted while its artifacts were being built"""
+
+
+def _run_job(demo_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Worker process entry point: build every artifact of a demo
+
+    Returns None (after removing the artifacts written so far) if the demo
+    was deleted before or during the build.
+    """
+    def on_step(step: str):
+        if not database.demo_exists(demo_id):
+            raise DemoDeleted(demo_id)
+        database.update_job(demo_id, step=step)
+
+    database.update_job(demo_id, status='running')
+    try:
+        results = artifacts.build_all(demo_id, on_step=on_step)
+    except Exception:
+        if database.demo_exists(demo_id):
+            raise
+        results = None  # Deleted between steps, or under a step that then failed
+
+    if not database.demo_exists(demo_id):
+        # build_all recreated the artifact directory the delete removed
+        storage.delete_demo_files(demo_id)
+        return None
+    return results
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get (or lazily create) the worker pool"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=INGEST_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _reset_executor():
+    """Drop a broken worker pool so the next submit creates a fresh one"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=False)
+            _executor = None
+
+
+def _submit(demo_id: str):
+    """Submit one attempt of a job to the worker pool"""
+    job = database.get_job(demo_id)
+    if job is None:
+        return  # demo was deleted while waiting for a retry
+
+    attempts = job['attempts'] + 1
+    database.update_job(demo_id, status='queued', attempts=attempts)
+
+    with _lock:
+        future = _get_executor().submit(_run_job, demo_id)
+        _pending[demo_id] = future
+    future.add_done_callback(lambda f: _on_done(demo_id, attempts, f))
+
+
+def _on_done(demo_id: str, attempts: int, future: Future):
+    """Record the outcome of a job attempt and schedule a retry if needed"""
+    with _lock:
+        _pending.pop(demo_id, None)
+
+    if future.cancelled():
+        return
+
+    error = future.exception()
+    if (error is None and future.result() is None) or database.get_job(demo_id) is None:
+        # Demo deleted meanwhile: no job row to record the outcome in, nothing to retry
+        metrics.INGEST_JOBS.inc(outcome="cancelled")
+        return
+
+    metrics.INGEST_JOBS.inc(outcome="error" if error else "done")
+    if error is None:
+        database.update_job(
+            demo_id, status='done', step=None, error=None,
+            result=json.dumps(future.result())
+        )
+        return
+
+    if isinstance(error, BrokenProcessPool):
+        _reset_executor()
+
+    message = f"{type(error).__name__}: {error}"
+    if attempts >= INGEST_MAX_ATTEMPTS:
+        print(f"Ingest failed for {demo_id} after {attempts} attempts: {message}")
+        database.update_job(demo_id, status='failed', error=message)
+        return
+
+    delay = INGEST_RETRY_DELAY_S * (2 ** (attempts - 1))
+    database.update_job(demo_id, status='retrying', error=message)
+    timer = threading.Timer(delay, _submit, args=(demo_id,))
+    timer.daemon = True
+    timer.start()
+
+
+def enqueue(demo_id: str) -> bool:
+    """Queue (or re-queue) the artifact build for a demo"""
+    if not INGEST_ENABLED or not database.upsert_job(demo_id, 'queued'):
+        return False
+    _submit(demo_id)
+    return True
+
+
+def cancel(demo_id: str) -> bool:
+    """
+    Cancel the pending job of a demo that is being deleted
+
+    A queued attempt is dropped from the pool; a running one cannot be
+    interrupted and stops by itself before its next step (see _run_job).
+
+    Returns:
+        True if a queued attempt was cancelled
+    """
+    with _lock:
+        future = _pending.get(demo_id)
+    return future is not None and future.cancel()
+
+
+def queue_depth() -> int:
+    """Number of jobs submitted to the pool that have not finished yet"""
+    with _lock:
+        return len(_pending)
+
+
+metrics.INGEST_QUEUE_DEPTH.set_function(lambda: {(): queue_depth()})
+
+
+def get_status(demo_id: str) -> Optional[Dict[str, Any]]:
+    """Get the ingest job of a demo"""
+    return database.get_job(demo_id)
+
+
+def start():
+    """Resume jobs that were queued or running when the server last stopped"""
+    if not INGEST_ENABLED:
+        return
+    for demo_id in database.get_unfinished_jobs():
+        database.update_job(demo_id, attempts=0)
+        _submit(demo_id)
+
+
+def shutdown():
+    """Stop the worker pool, letting running jobs finish"""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
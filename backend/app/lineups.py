@@ -0,0 +1,301 @@
+"""
+Grenade lineups
+
+Pairs every thrown grenade with its detonation and catalogues the
+repeated lineups of each map: throws of the same grenade type by the same
+side, from about the same spot to about the same landing spot.
+
+Throws are counted per LINEUP_CELL_SIZE grid cell of both the throw and
+the landing position (agg_lineups), so every ingested demo simply adds its
+counts (build_demo_lineups) and deleting it subtracts them. A catalogue
+joins neighbouring occupied cells into one lineup, giving the centroid of
+its throw and landing spots and how often each team used it. Catalogues
+are cached per map and only rebuilt when the counts change.
+
+    python -m app.lineups --rebuild   # recount every stored demo
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app import columnar, database
+from app.config import LINEUP_CELL_SIZE, LINEUP_MAX_FLIGHT_SECONDS, LINEUP_MIN_THROWS, LINEUPS_DIR
+
+_catalogues: Dict[str, List[Dict[str, Any]]] = {}
+_catalogues_stamp: Optional[int] = None
+_catalogues_lock = threading.Lock()
+
+
+def stamp_path() -> Path:
+    """File touched whenever the lineup counts change"""
+    return LINEUPS_DIR / "counts.stamp"
+
+
+def invalidate():
+    """Mark every cached catalogue as stale"""
+    stamp_path().touch()
+
+
+def pair_throws(grenades: Dict[str, np.ndarray], tick_rate: float) -> List[Dict[str, Any]]:
+    """
+    Match each thrown grenade with its detonation
+
+    Detonations go to the oldest pending throw of the same thrower and
+    grenade type; throws still pending after LINEUP_MAX_FLIGHT_SECONDS are
+    dropped.
+
+    Returns:
+        One dict per grenade (tick of the throw, thrower, type, throw and
+        landing position, flight time), in throw order
+    """
+    if 'eventType' not in grenades or 'throwerId' not in grenades:
+        return []
+    max_flight = LINEUP_MAX_FLIGHT_SECONDS * tick_rate
+    columns = {name: values.tolist() for name, values in grenades.items()}
+    pending: Dict[tuple, List[int]] = {}
+    throws = []
+    for i, event in enumerate(columns['eventType']):
+        key = (columns['throwerId'][i], columns['grenadeType'][i] if 'grenadeType' in columns else '')
+        tick = columns['tick'][i]
+        if event == "thrown":
+            pending.setdefault(key, []).append(i)
+            continue
+        if event != "detonate":
+            continue
+        queue = pending.get(key, [])
+        while queue and tick - columns['tick'][queue[0]] > max_flight:
+            queue.pop(0)
+        if not queue:
+            continue
+        j = queue.pop(0)
+        throws.append({
+            "tick": columns['tick'][j],
+            "throwerId": columns['throwerId'][j],
+            "throwerName": columns['throwerName'][j] if 'throwerName' in columns else None,
+            "team": columns['throwerTeam'][j] if 'throwerTeam' in columns else '',
+            "side": columns['throwerSide'][j] if 'throwerSide' in columns else '',
+            "grenadeType": key[1],
+            "throwX": columns['x'][j],
+            "throwY": columns['y'][j],
+            "landX": columns['x'][i],
+            "landY": columns['y'][i],
+            "flightSeconds": round((tick - columns['tick'][j]) / tick_rate, 2),
+        })
+    throws.sort(key=lambda t: t["tick"])
+    return throws
+
+
+def demo_throws(demo_id: str) -> List[Dict[str, Any]]:
+    """Paired throws of a stored demo"""
+    grenades = columnar.load_table(demo_id, 'grenades')
+    tick_rate = columnar.load_header(demo_id).get('tickRate') or 64
+    return pair_throws(grenades, tick_rate)
+
+
+def _cell(value: float) -> int:
+    return int(np.floor(value / LINEUP_CELL_SIZE))
+
+
+def lineup_rows(demo_id: str, map_name: str) -> List[Dict[str, Any]]:
+    """A demo's throws counted per (type, side, team, throw cell, landing cell) for agg_lineups"""
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for throw in demo_throws(demo_id):
+        positions = (throw["throwX"], throw["throwY"], throw["landX"], throw["landY"])
+        if any(p is None or p != p for p in positions):
+            continue
+        key = (throw["grenadeType"], throw["side"] or '', throw["team"] or '') + tuple(_cell(p) for p in positions)
+        row = rows.setdefault(key, {
+            "map_name": map_name,
+            "grenade_type": key[0],
+            "side": key[1],
+            "team": key[2],
+            "throw_cell_x": key[3],
+            "throw_cell_y": key[4],
+            "land_cell_x": key[5],
+            "land_cell_y": key[6],
+            "throws": 0,
+            "throw_x_sum": 0,
+            "throw_y_sum": 0,
+            "land_x_sum": 0,
+            "land_y_sum": 0,
+        })
+        row["throws"] += 1
+        for column, value in zip(("throw_x_sum", "throw_y_sum", "land_x_sum", "land_y_sum"), positions):
+            row[column] += int(round(value))
+    return list(rows.values())
+
+
+def build_demo_lineups(demo_id: str) -> Dict[str, Any]:
+    """Add a demo's throws to the lineup counts (ingest step)"""
+    metadata = database.get_demo_metadata(demo_id)
+    if metadata is None:
+        raise LookupError(f"No metadata row for demo {demo_id}")
+    rows = lineup_rows(demo_id, metadata['map_name'])
+    if not database.merge_demo_partials(demo_id, {"agg_lineups": rows}):
+        raise RuntimeError(f"Could not add the grenade throws of demo {demo_id}")
+    invalidate()
+    return {"throws": sum(row["throws"] for row in rows)}
+
+
+def build_catalogue(map_name: str) -> List[Dict[str, Any]]:
+    """
+    Every lineup of a map, most thrown first
+
+    Cells of the same grenade type and side join one lineup when both
+    their throw and landing cells are at most one cell apart (transitively).
+    """
+    groups: Dict[tuple, Dict[tuple, Dict[str, Any]]] = {}
+    for row in database.get_aggregates("agg_lineups", map_name=map_name):
+        cell = (row["throw_cell_x"], row["throw_cell_y"], row["land_cell_x"], row["land_cell_y"])
+        entry = groups.setdefault((row["grenade_type"], row["side"]), {}).setdefault(
+            cell, {"throws": 0, "sums": np.zeros(4), "teams": {}}
+        )
+        entry["throws"] += row["throws"]
+        entry["sums"] += [row["throw_x_sum"], row["throw_y_sum"], row["land_x_sum"], row["land_y_sum"]]
+        if row["team"]:
+            entry["teams"][row["team"]] = entry["teams"].get(row["team"], 0) + row["throws"]
+
+    offsets = list(itertools.product((-1, 0, 1), repeat=4))
+    lineups = []
+    for (grenade_type, side), cells in groups.items():
+        # Union-find over neighbouring occupied cells
+        parent = {cell: cell for cell in cells}
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for cell in cells:
+            for offset in offsets:
+                neighbour = tuple(c + o for c, o in zip(cell, offset))
+                if neighbour in parent:
+                    parent[find(neighbour)] = find(cell)
+
+        clusters: Dict[tuple, Dict[str, Any]] = {}
+        for cell, entry in cells.items():
+            cluster = clusters.setdefault(find(cell), {"throws": 0, "sums": np.zeros(4), "teams": {}, "cells": 0})
+            cluster["throws"] += entry["throws"]
+            cluster["sums"] += entry["sums"]
+            cluster["cells"] += 1
+            for team, count in entry["teams"].items():
+                cluster["teams"][team] = cluster["teams"].get(team, 0) + count
+
+        for cluster in clusters.values():
+            throw_x, throw_y, land_x, land_y = (cluster["sums"] / cluster["throws"]).round(1).tolist()
+            lineups.append({
+                "grenadeType": grenade_type,
+                "side": side or None,
+                "throws": cluster["throws"],
+                "throwPosition": {"x": throw_x, "y": throw_y},
+                "landPosition": {"x": land_x, "y": land_y},
+                "teams": dict(sorted(cluster["teams"].items(), key=lambda t: -t[1])),
+                "cells": cluster["cells"],
+            })
+
+    lineups.sort(key=lambda l: (-l["throws"], l["grenadeType"], l["landPosition"]["x"], l["landPosition"]["y"]))
+    for i, lineup in enumerate(lineups):
+        lineup["id"] = i
+    return lineups
+
+
+def catalogue_path(map_name: str) -> Path:
+    """Path of a map's cached catalogue"""
+    return LINEUPS_DIR / f"{map_name}.json"
+
+
+def load_catalogue(map_name: str) -> List[Dict[str, Any]]:
+    """Catalogue of a map from memory or disk, rebuilt (and saved) if the counts changed since"""
+    global _catalogues, _catalogues_stamp
+    stamp = stamp_path().stat().st_mtime_ns if stamp_path().exists() else 0
+    with _catalogues_lock:
+        if stamp != _catalogues_stamp:
+            _catalogues, _catalogues_stamp = {}, stamp
+        catalogue = _catalogues.get(map_name)
+    if catalogue is not None:
+        return catalogue
+
+    path = catalogue_path(map_name)
+    saved = None
+    if path.exists():
+        with open(path, 'r') as f:
+            saved = json.load(f)
+    if saved is not None and saved.get("stamp") == stamp:
+        catalogue = saved["lineups"]
+    else:
+        catalogue = build_catalogue(map_name)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, 'w') as f:
+            json.dump({"stamp": stamp, "lineups": catalogue}, f)
+        os.replace(tmp, path)
+
+    with _catalogues_lock:
+        if stamp == _catalogues_stamp:
+            _catalogues[map_name] = catalogue
+    return catalogue
+
+
+def find_lineups(map_name: str, grenade_type: Optional[str] = None, side: Optional[str] = None,
+                 team: Optional[str] = None, min_throws: int = LINEUP_MIN_THROWS,
+                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Repeated lineups of a map
+
+    Args:
+        map_name: Map to list
+        grenade_type: Optional grenade type, e.g. "Smoke Grenade"
+        side: Optional thrower side ("CT" or "T")
+        team: Optional team; only lineups it used, counted by its own throws
+        min_throws: Fewest throws (of the team, if given) a lineup needs
+        limit: Optional number of lineups to return
+    """
+    result = []
+    for lineup in load_catalogue(map_name):
+        if grenade_type is not None and lineup["grenadeType"] != grenade_type:
+            continue
+        if side is not None and lineup["side"] != side:
+            continue
+        throws = lineup["teams"].get(team, 0) if team is not None else lineup["throws"]
+        if throws < min_throws:
+            continue
+        result.append(lineup)
+    if team is not None:
+        result.sort(key=lambda l: -l["teams"].get(team, 0))
+    return result[:limit] if limit else result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild or list the grenade lineup catalogues')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='Recount the grenade throws of every stored demo first')
+    args = parser.parse_args()
+
+    database.create_tables()
+    if args.rebuild:
+        for demo in database.get_all_demos():
+            demo_id = demo['demo_id']
+            if not columnar.has_columns(demo_id):
+                print(f"✗ {demo_id}: artifacts not built")
+                continue
+            try:
+                summary = build_demo_lineups(demo_id)
+                print(f"✓ {demo_id}: {summary['throws']} throws")
+            except Exception as e:
+                print(f"✗ {demo_id}: {type(e).__name__}: {e}")
+
+    invalidate()
+    for map_name in sorted({demo['map_name'] for demo in database.get_all_demos()}):
+        catalogue = load_catalogue(map_name)
+        print(f"✓ {map_name}: {len(catalogue)} lineups, {sum(l['throws'] for l in catalogue)} throws")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Demo data loading with table/field projections
+
+Reads from the columnar store when the ingest pipeline has built it (only
+the requested tables and fields are decoded) and falls back to the raw
+parser JSON through the in-memory cache otherwise. Reduced tick
+resolutions (see artifacts.TICK_RESOLUTIONS) need the columnar store.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from app import artifacts, columnar, storage
+
+
+def _project_rows(rows: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Keep only the requested fields of every record"""
+    if not fields:
+        return rows
+    return [{f: row.get(f) for f in fields} for row in rows]
+
+
+def load_demo_data(
+    demo_id: str,
+    tables: Optional[List[str]] = None,
+    fields: Optional[Dict[str, List[str]]] = None,
+    resolution: str = "full"
+) -> Dict[str, Any]:
+    """
+    Load a demo's parser data, optionally projected
+
+    Args:
+        demo_id: Demo to load
+        tables: Top-level keys to include (e.g. ["header", "rounds"]), None for all
+        fields: Per-table field lists (e.g. {"ticks": ["tick", "x", "y"]})
+        resolution: Ticks resolution, "full" or a reduced one like "16" or "path"
+
+    Returns:
+        Dict shaped like the parser output, restricted to the projection
+    """
+    fields = fields or {}
+
+    if tables is None and not fields and resolution == "full":
+        return storage.read_demo_cached(demo_id)
+
+    if columnar.has_columns(demo_id):
+        if resolution != "full" and not columnar.lod_path(demo_id, 'ticks', resolution).exists():
+            # Demos ingested before reduced resolutions existed
+            artifacts.build_tick_lod(demo_id)
+        available = columnar.list_tables(demo_id)
+        wanted = tables if tables is not None else ['header'] + available
+        data = {}
+        for table in wanted:
+            if table == 'header':
+                data['header'] = columnar.load_header(demo_id)
+            elif table in available:
+                data[table] = columnar.to_rows(columnar.load_table(
+                    demo_id, table, fields.get(table), resolution if table == 'ticks' else None
+                ))
+        return data
+
+    if resolution != "full":
+        raise ValueError(f"Tick resolution {resolution} needs the columnar store, which is not built yet")
+
+    match_data = storage.read_demo_cached(demo_id)
+    game_data = columnar.get_game_data(match_data)
+    wanted = tables if tables is not None else list(game_data)
+    data = {}
+    for table in wanted:
+        if table == 'header':
+            data['header'] = match_data.get('header', game_data.get('header', {}))
+        elif table in game_data:
+            value = game_data[table]
+            data[table] = _project_rows(value, fields.get(table)) if isinstance(value, list) else value
+    return data
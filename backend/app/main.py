@@ -1,31 +1,66 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
 import json
 import uuid
 from datetime import datetime
 from pathlib import Path
+from typing import List, Optional
 
-from app.config import CORS_ORIGINS, DEMOS_DIR, MAX_JSON_SIZE_MB
+from app.config import (
+    CORS_ORIGINS,
+    MAX_JSON_SIZE_MB,
+    BATCH_MAX_DEMOS,
+    BATCH_CONCURRENCY,
+    HEATMAP_MAX_GRID_SIZE,
+    HEATMAP_DEFAULT_BANDWIDTH,
+    TILE_MAX_ZOOM,
+    REGION_QUERY_MAX_ROWS,
+    LINEUP_MIN_THROWS
+)
 from app.models import (
     DemoSaveRequest,
+    DemoBatchRequest,
     DemoResponse,
     DemoListResponse,
     DemoListItem,
-    DeleteResponse
+    DeleteResponse,
+    IngestStatusResponse,
+    RegionQueryRequest,
+    StatsBatchRequest,
+    AnalyticsQueryRequest
 )
-from app import database
+from app import aggregates, analytics, artifacts, columnar, database, density, ingest, lineups, loader, metrics, profiling, query, roundstate, spatial, storage, tiles, winprob
+from app.maps import get_map_config, level_names, site_polygon, to_world
 
 # Initialize database
 database.create_tables()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the ingest workers with the app and stop them on shutdown"""
+    ingest.start()
+    yield
+    ingest.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="CS2 Demo Analysis API",
     description="Backend for CS2 demo parsing and analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Profile sampled or explicitly requested requests (opt-in)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Record per-route latency and body sizes
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +68,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Replay players read the frame layout and seek with range requests
+    expose_headers=["Content-Range", "Accept-Ranges", "X-Frame-Stride", "X-Frame-Count", "X-Frame-Slots"],
 )
 
 
@@ -46,6 +83,43 @@ async def root():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this API process"""
+    return PlainTextResponse(
+        metrics.render_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/profiles")
+async def get_profiles():
+    """
+    List stored request profiles (newest first)
+    
+    Enable with CS2_PROFILE=1 (requests slower than CS2_PROFILE_THRESHOLD_MS)
+    or send the header "X-Profile: 1" to profile a single request.
+    """
+    profiles = profiling.list_profiles()
+    return {"profiles": profiles, "total": len(profiles)}
+
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str):
+    """
+    Download a stored profile (pstats format)
+    
+    - **name**: Profile file name as returned by /profiles
+    """
+    path = profiling.get_profile_path(name)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile not found: {name}"
+        )
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
 @app.post("/demo/save", response_model=DemoResponse)
 async def save_demo(request: DemoSaveRequest):
     """
@@ -59,7 +133,8 @@ async def save_demo(request: DemoSaveRequest):
         demo_id = str(uuid.uuid4())
         
         # Convert data to JSON string and check size
-        json_data = json.dumps(request.data)
+        with metrics.JSON_SECONDS.time(op="dumps"):
+            json_data = json.dumps(request.data)
         file_size = len(json_data.encode('utf-8'))
         
         # Check file size (convert to MB)
@@ -70,14 +145,21 @@ async def save_demo(request: DemoSaveRequest):
                 detail=f"JSON data too large ({size_mb:.2f}MB). Maximum: {MAX_JSON_SIZE_MB}MB"
             )
         
+        # The demo's contribution to the cross-match aggregates
+        metadata_dict = request.metadata.model_dump()
+        try:
+            partials = aggregates.match_partials(request.data, metadata_dict.get('map_name'))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=str(e)
+            )
+        
         # Save JSON file
-        file_path = DEMOS_DIR / f"{demo_id}.json"
-        with open(file_path, 'w') as f:
-            f.write(json_data)
+        file_path = storage.write_demo_json(demo_id, json_data)
         
-        # Save metadata to database
-        metadata_dict = request.metadata.model_dump()
-        success = database.save_demo_metadata(demo_id, metadata_dict, file_size)
+        # Save metadata to database, adding the demo to the cross-match aggregates
+        success = database.save_demo_metadata(demo_id, metadata_dict, file_size, partials)
         
         if not success:
             # Clean up file if database save failed
@@ -87,10 +169,14 @@ async def save_demo(request: DemoSaveRequest):
                 detail="Failed to save demo metadata"
             )
         
+        # Precompute derived artifacts in the background
+        queued = ingest.enqueue(demo_id)
+        
         return DemoResponse(
             demo_id=demo_id,
             message="Demo saved successfully",
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=datetime.utcnow().isoformat(),
+            ingest_status="queued" if queued else None
         )
         
     except HTTPException:
@@ -139,12 +225,38 @@ async def get_demos():
         )
 
 
+def _check_resolution(resolution: str):
+    """Reject unknown tick resolutions"""
+    if resolution not in artifacts.TICK_RESOLUTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown resolution: {resolution} (resolutions: {', '.join(artifacts.TICK_RESOLUTIONS)})"
+        )
+
+
+def _require_columns(demo_id: str):
+    """404 unless the demo exists, 409 until its columnar store is built"""
+    if not database.demo_exists(demo_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Demo not found: {demo_id}"
+        )
+    if not columnar.has_columns(demo_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Demo artifacts are not built yet: {demo_id}"
+        )
+
+
 @app.get("/demo/{demo_id}")
-async def get_demo(demo_id: str):
+async def get_demo(demo_id: str, resolution: str = "full"):
     """
     Get full data for a specific demo
     
     - **demo_id**: Unique identifier for the demo
+    - **resolution**: Ticks resolution: "full", every Nth sampled tick ("4", "16")
+      or "path" (simplified player paths). Reduced resolutions need the
+      demo's columnar store.
     """
     try:
         # Check if demo exists in database
@@ -155,7 +267,7 @@ async def get_demo(demo_id: str):
             )
         
         # Load JSON file
-        file_path = DEMOS_DIR / f"{demo_id}.json"
+        file_path = storage.demo_path(demo_id)
         
         if not file_path.exists():
             raise HTTPException(
@@ -163,24 +275,848 @@ async def get_demo(demo_id: str):
                 detail=f"Demo data file not found: {demo_id}"
             )
         
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        if resolution == "full":
+            data = storage.read_demo_cached(demo_id)
+        else:
+            _check_resolution(resolution)
+            if not columnar.has_columns(demo_id):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Demo artifacts are not built yet: {demo_id}"
+                )
+            data = await profiling.to_thread(loader.load_demo_data, demo_id, None, None, resolution)
         
         # Get metadata
         metadata = database.get_demo_metadata(demo_id)
         
-        return {
+        # Serialize directly; the generic response encoder is slow on large demos
+        with metrics.JSON_SECONDS.time(op="dumps"):
+            body = json.dumps({
+                "demo_id": demo_id,
+                "metadata": metadata,
+                "data": data
+            })
+        
+        return Response(content=body, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving demo: {str(e)}"
+        )
+
+
+def _load_batch_item(demo_id: str, request: DemoBatchRequest) -> bytes:
+    """Load, project and serialize one demo of a batch as an NDJSON line"""
+    metadata = database.get_demo_metadata(demo_id)
+    if metadata is None:
+        item = {"demo_id": demo_id, "error": f"Demo not found: {demo_id}"}
+    elif not storage.demo_path(demo_id).exists():
+        item = {"demo_id": demo_id, "error": f"Demo data file not found: {demo_id}"}
+    else:
+        item = {
             "demo_id": demo_id,
-            "metadata": metadata,
-            "data": data
+            "data": loader.load_demo_data(demo_id, request.tables, request.fields, request.resolution)
         }
+        if request.include_metadata:
+            item["metadata"] = metadata
+    with metrics.JSON_SECONDS.time(op="dumps"):
+        line = json.dumps(item) + "\n"
+    return line.encode('utf-8')
+
+
+@app.post("/demos/batch")
+async def get_demos_batch(request: DemoBatchRequest):
+    """
+    Get several demos in one streamed response
+    
+    - **demo_ids**: Demos to load
+    - **tables**: Optional top-level keys to include (e.g. ["header", "rounds"])
+    - **fields**: Optional per-table field lists (e.g. {"ticks": ["tick", "x", "y"]})
+    - **include_metadata**: Include each demo's metadata row
+    - **resolution**: Ticks resolution ("full", "4", "16" or "path")
+    
+    Returns newline-delimited JSON, one object per demo
+    ({"demo_id", "metadata", "data"} or {"demo_id", "error"}), in the
+    order the demos finish loading.
+    """
+    _check_resolution(request.resolution)
+    demo_ids = list(dict.fromkeys(request.demo_ids))
+    if len(demo_ids) > BATCH_MAX_DEMOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many demos ({len(demo_ids)}). Maximum: {BATCH_MAX_DEMOS}"
+        )
+    
+    async def stream_items():
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        
+        async def load(demo_id: str) -> bytes:
+            async with semaphore:
+                try:
+                    return await profiling.to_thread(_load_batch_item, demo_id, request)
+                except Exception as e:
+                    error = {"demo_id": demo_id, "error": f"Error retrieving demo: {str(e)}"}
+                    return (json.dumps(error) + "\n").encode('utf-8')
+        
+        tasks = [asyncio.create_task(load(demo_id)) for demo_id in demo_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_items(), media_type="application/x-ndjson")
+
+
+@app.get("/demo/{demo_id}/status", response_model=IngestStatusResponse)
+async def get_demo_status(demo_id: str):
+    """
+    Get the status of the background ingest job of a demo
+    
+    - **demo_id**: Unique identifier for the demo
+    """
+    try:
+        job = ingest.get_status(demo_id)
+        
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No ingest job for demo: {demo_id}"
+            )
+        
+        return IngestStatusResponse(
+            demo_id=demo_id,
+            status=job['status'],
+            step=job['step'],
+            attempts=job['attempts'],
+            error=job['error'],
+            artifacts=job['result'],
+            created_at=job['created_at'],
+            updated_at=job['updated_at']
+        )
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error retrieving demo: {str(e)}"
+            detail=f"Error retrieving ingest status: {str(e)}"
+        )
+
+
+def _parse_rounds(rounds: Optional[str]) -> Optional[List[int]]:
+    """Parse a comma-separated round list query parameter"""
+    if not rounds:
+        return None
+    try:
+        return [int(r) for r in rounds.split(',') if r.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid rounds: {rounds}"
+        )
+
+
+def _build_heatmap(demo_id: str, side: str, rounds: Optional[List[int]], grid_size: int,
+                   bandwidth: float, normalize: bool, level: Optional[str], resolution: str) -> bytes:
+    """Compute and serialize the smoothed heatmap of a demo"""
+    map_name = columnar.load_header(demo_id).get('mapName')
+    map_config = get_map_config(map_name)
+    if map_config is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No map configuration for map: {map_name}"
+        )
+    levels = level_names(map_config)
+    if level is not None and level not in levels:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown level for {map_name}: {level} (levels: {', '.join(levels)})"
+        )
+    sides = ["CT", "T"] if side == "both" else [side]
+    grids = density.density_grids(
+        demo_id, map_config, grid_size, bandwidth, sides, rounds, normalize, level, resolution
+    )
+    for data in grids.values():
+        data["grid"] = data["grid"].round(4).tolist()
+    
+    with metrics.JSON_SECONDS.time(op="dumps"):
+        return json.dumps({
+            "demo_id": demo_id,
+            "mapName": map_name,
+            **grids,
+            "gridSize": grid_size,
+            "bandwidth": bandwidth,
+            "level": level or levels[-1],
+            "levels": levels,
+            "bounds": {
+                "minX": map_config['minX'],
+                "maxX": map_config['maxX'],
+                "minY": map_config['minY'],
+                "maxY": map_config['maxY']
+            },
+            "filters": {"side": side, "rounds": rounds or "all", "normalize": normalize, "resolution": resolution}
+        }).encode('utf-8')
+
+
+@app.get("/demo/{demo_id}/heatmap")
+async def get_demo_heatmap(
+    demo_id: str,
+    side: str = Query("both", pattern="^(CT|T|both)$"),
+    rounds: Optional[str] = None,
+    grid_size: int = Query(256, ge=8, le=HEATMAP_MAX_GRID_SIZE),
+    bandwidth: float = Query(HEATMAP_DEFAULT_BANDWIDTH, ge=0),
+    normalize: bool = True,
+    level: Optional[str] = None,
+    resolution: str = "full"
+):
+    """
+    Get a Gaussian-smoothed position heatmap of a demo
+    
+    - **side**: "CT", "T" or "both"
+    - **rounds**: Optional comma-separated round numbers (default: all)
+    - **grid_size**: Bins per dimension
+    - **bandwidth**: Smoothing sigma in game units (0 = raw histogram)
+    - **normalize**: Scale each grid to 0-1
+    - **level**: Map level, e.g. "lower" on nuke/train/vertigo (default: the main level)
+    - **resolution**: Ticks resolution to bin ("full", "4", "16" or "path");
+      reduced resolutions read far fewer rows but count fewer samples
+    
+    Returns {"ct": {"grid", "samples"}, "t": {...}, "gridSize", "bounds", ...}.
+    Needs the demo's columnar store (built by the ingest pipeline).
+    """
+    try:
+        _require_columns(demo_id)
+        
+        _check_resolution(resolution)
+        body = await profiling.to_thread(
+            _build_heatmap, demo_id, side, _parse_rounds(rounds), grid_size, bandwidth, normalize, level,
+            resolution
+        )
+        return Response(content=body, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing heatmap: {str(e)}"
+        )
+
+
+@app.get("/tiles/{map_name}/{layer}/{z}/{x}/{y}.png")
+async def get_tile(
+    map_name: str,
+    layer: str,
+    z: int,
+    x: int,
+    y: int,
+    side: str = Query("both", pattern="^(CT|T|both)$"),
+    rounds: Optional[str] = None,
+    bandwidth: float = Query(HEATMAP_DEFAULT_BANDWIDTH, ge=0),
+    level: Optional[str] = None
+):
+    """
+    Get a 256px radar tile, optionally with a demo's heatmap on top
+    
+    - **map_name**: Map of the radar image
+    - **layer**: "radar" for the plain radar, or a demo id for radar + heatmap
+    - **z, x, y**: Tile coordinates; zoom z has 2^z x 2^z tiles, x/y from the top-left
+    - **side**, **rounds**, **bandwidth**: Heatmap filters (demo layers only)
+    - **level**: Map level, e.g. "lower" on nuke/train/vertigo (default: the main level)
+    
+    Tiles are rendered on first request and served from a disk cache afterwards.
+    """
+    try:
+        if tiles.radar_path(map_name, level) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No radar image for map: {map_name}" + (f" (level {level})" if level else "")
+            )
+        
+        if not 0 <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Tile out of range: {z}/{x}/{y}"
+            )
+        
+        if layer != tiles.RADAR_LAYER:
+            _require_columns(layer)
+            
+            demo_map = columnar.load_header(layer).get('mapName')
+            if demo_map != map_name:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Demo {layer} was played on {demo_map}, not {map_name}"
+                )
+        
+        body = await profiling.to_thread(
+            tiles.get_tile, map_name, layer, z, x, y, side, _parse_rounds(rounds), bandwidth, level
+        )
+        return Response(
+            content=body,
+            media_type="image/png",
+            headers={"Cache-Control": "public, max-age=3600"}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error rendering tile: {str(e)}"
+        )
+
+
+def _region_points(demo_id: str, request: RegionQueryRequest) -> List[List[float]]:
+    """World-coordinate outline of the region in a query"""
+    given = [r for r in (request.polygon, request.site, request.center) if r is not None]
+    if len(given) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give exactly one of polygon, site or center"
+        )
+    
+    if request.site is not None or request.normalized:
+        map_name = columnar.load_header(demo_id).get('mapName')
+        map_config = get_map_config(map_name)
+        if map_config is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"No map configuration for map: {map_name}"
+            )
+        if request.site is not None:
+            points = site_polygon(map_name, request.site)
+            if points is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"No site {request.site} defined for {map_name}"
+                )
+            return points
+    
+    points = request.polygon if request.polygon is not None else [request.center]
+    if any(len(point) != 2 for point in points):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Region points must be [x, y] pairs"
+        )
+    if len(points) < 3 and not request.radius:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A region with fewer than 3 points needs a radius"
+        )
+    return to_world(points, map_config) if request.normalized else points
+
+
+@app.post("/demo/{demo_id}/region-query")
+async def query_demo_region(demo_id: str, request: RegionQueryRequest):
+    """
+    Get the ticks or events of a demo that fall inside a map region
+    
+    The region is a polygon (world or normalized 0-1 coordinates), a
+    bombsite of the demo's map or a circle (center + radius); a radius on
+    a polygon or site grows it by that many game units. Kills are matched
+    on the victim position.
+    
+    Returns counts per side and round; ticks also report seconds spent in
+    the region per side and player, event tables the matching rows (up to
+    limit, oldest first).
+    """
+    try:
+        _require_columns(demo_id)
+        
+        if request.table not in spatial.SIDE_FIELDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown table: {request.table} (tables: {', '.join(spatial.SIDE_FIELDS)})"
+            )
+        
+        points = _region_points(demo_id, request)
+        result = await profiling.to_thread(
+            spatial.query_region,
+            demo_id,
+            request.table,
+            points,
+            request.radius or 0.0,
+            request.rounds,
+            request.side,
+            (request.tick_start, request.tick_end),
+            min(request.limit, REGION_QUERY_MAX_ROWS)
+        )
+        return {"demo_id": demo_id, "region": points, "radius": request.radius or 0.0, **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error querying region: {str(e)}"
+        )
+
+
+def _replay_meta(demo_id: str, round_num: int) -> dict:
+    """Replay frames meta of a round, building the frames of older demos on first use"""
+    _require_columns(demo_id)
+    
+    meta = artifacts.load_replay_meta(demo_id, round_num)
+    if meta is None and not artifacts.replay_frames_path(demo_id, round_num).parent.exists():
+        artifacts.build_replay_frames(demo_id)
+        meta = artifacts.load_replay_meta(demo_id, round_num)
+    if meta is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Round not found: {round_num}"
+        )
+    return meta
+
+
+@app.get("/demo/{demo_id}/rounds/{round_num}/frames")
+async def get_round_frames(demo_id: str, round_num: int):
+    """
+    Get the packed replay frames of a round
+    
+    Little-endian float32 frames of X-Frame-Stride bytes, one per sampled
+    tick: the tick, then x, y, viewX, health, alive and weaponId for every
+    player slot (slots and weapon names are in /frames/meta). Supports HTTP
+    range requests, so frame i can be fetched at bytes
+    i * stride .. (i + 1) * stride - 1 without downloading the round.
+    """
+    try:
+        meta = await profiling.to_thread(_replay_meta, demo_id, round_num)
+        return FileResponse(
+            artifacts.replay_frames_path(demo_id, round_num),
+            media_type="application/octet-stream",
+            headers={
+                "X-Frame-Stride": str(meta["frameStride"]),
+                "X-Frame-Count": str(meta["frameCount"]),
+                "X-Frame-Slots": str(len(meta["slots"])),
+                "Cache-Control": "public, max-age=3600",
+            }
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving frames: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/rounds/{round_num}/frames/meta")
+async def get_round_frames_meta(demo_id: str, round_num: int):
+    """
+    Get the layout of a round's replay frames and its event feed
+    
+    Returns frameCount, frameStride, slotFields, slots (steamId, name,
+    team, side per slot), weapons (weaponId -> name) and events: the
+    round's kills, grenades, smokes and bomb events sorted by tick.
+    """
+    try:
+        meta = await profiling.to_thread(_replay_meta, demo_id, round_num)
+        return {"demo_id": demo_id, **meta}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving frames: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/round-state")
+async def get_round_state(demo_id: str, tick: List[int] = Query(...)):
+    """
+    Get the round state at one or more ticks
+    
+    - **tick**: Tick to look up (repeat for several)
+    
+    Returns per tick the round, alive players, HP and equipment value of
+    the living per side, the man advantage, bomb state and site, and the
+    time left on the round clock or bomb timer (null outside rounds).
+    """
+    try:
+        _require_columns(demo_id)
+        states = await profiling.to_thread(roundstate.states_at, demo_id, tick)
+        if states is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Demo has no rounds: {demo_id}"
+            )
+        return {"demo_id": demo_id, "states": states}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving round state: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/rounds/{round_num}/state")
+async def get_round_state_timeline(demo_id: str, round_num: int):
+    """
+    Get every change of a round's state (alive counts, HP, equipment, bomb)
+    
+    Each entry holds from its tick until the next one.
+    """
+    try:
+        _require_columns(demo_id)
+        timeline = await profiling.to_thread(roundstate.round_timeline, demo_id, round_num)
+        if timeline is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Round not found: {round_num}"
+            )
+        return {"demo_id": demo_id, "roundNum": round_num, "timeline": timeline}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving round state: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/round-state/summary")
+async def get_round_state_summary(demo_id: str):
+    """
+    Get the seconds of man advantage per side and the clutch of every round
+    """
+    try:
+        _require_columns(demo_id)
+        summaries = await profiling.to_thread(roundstate.round_summaries, demo_id)
+        if summaries is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Demo has no rounds: {demo_id}"
+            )
+        return {"demo_id": demo_id, "rounds": summaries}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving round state: {str(e)}"
+        )
+
+
+@app.get("/winprob")
+async def get_win_probability(
+    ct_alive: int = Query(..., ge=0, le=winprob.MAX_ALIVE),
+    t_alive: int = Query(..., ge=0, le=winprob.MAX_ALIVE),
+    bomb_planted: bool = False,
+    ct_buy: Optional[str] = None,
+    t_buy: Optional[str] = None,
+    ct_equipment: Optional[int] = Query(None, ge=0),
+    t_equipment: Optional[int] = Query(None, ge=0),
+    round_num: Optional[int] = Query(None, ge=1),
+    map_name: Optional[str] = None
+):
+    """
+    Get the chance of each side winning the round from its current state
+    
+    - **ct_alive** / **t_alive**: Players alive per side
+    - **bomb_planted**: Whether the bomb is planted
+    - **ct_buy** / **t_buy**: Buy class (pistol, eco, force, full); omit to average over economies
+    - **ct_equipment** / **t_equipment**: Team equipment value instead of the buy class (with round_num)
+    - **map_name**: Map table to use; unknown maps use the table of every map
+    
+    Answers from the precomputed tables (see app.winprob).
+    """
+    buys = []
+    for buy, equipment in ((ct_buy, ct_equipment), (t_buy, t_equipment)):
+        if buy is None and equipment is not None:
+            buy = artifacts.classify_buy(round_num or 0, equipment)
+        if buy is not None and buy not in winprob.BUYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown buy: {buy} (buys: {', '.join(winprob.BUYS)})"
+            )
+        buys.append(buy)
+    
+    try:
+        return winprob.lookup(ct_alive, t_alive, bomb_planted, buys[0], buys[1], map_name)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving win probability: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/winprob")
+async def get_demo_win_probability(demo_id: str, tick: List[int] = Query(...)):
+    """
+    Get the win probability at one or more ticks of a demo
+    
+    - **tick**: Tick to look up (repeat for several)
+    
+    Uses the round state and the round's buys at each tick (null outside rounds).
+    """
+    try:
+        _require_columns(demo_id)
+        result = await profiling.to_thread(winprob.demo_win_probability, demo_id, tick)
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Demo has no rounds: {demo_id}"
+            )
+        return {"demo_id": demo_id, "ticks": result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving win probability: {str(e)}"
+        )
+
+
+@app.get("/lineups/{map_name}")
+async def get_lineups(
+    map_name: str,
+    grenade_type: Optional[str] = None,
+    side: Optional[str] = Query(None, pattern="^(CT|T)$"),
+    team: Optional[str] = None,
+    min_throws: int = Query(LINEUP_MIN_THROWS, ge=1),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """
+    Get the repeated grenade lineups of a map across the library
+    
+    - **grenade_type**: Optional grenade type, e.g. "Smoke Grenade"
+    - **side**: Optional thrower side (CT or T)
+    - **team**: Optional team; only its lineups, ranked by its own throws
+    - **min_throws**: Fewest throws a lineup needs
+    - **limit**: Optional number of lineups to return
+    
+    Each lineup has the centroid of its throw and landing spots, its
+    number of throws and the throws per team.
+    """
+    try:
+        result = await profiling.to_thread(
+            lineups.find_lineups, map_name, grenade_type, side, team, min_throws, limit
+        )
+        return {"map_name": map_name, "lineups": result}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving lineups: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/grenade-throws")
+async def get_grenade_throws(demo_id: str):
+    """
+    Get every grenade of a demo with its throw and landing position
+    """
+    try:
+        _require_columns(demo_id)
+        throws = await profiling.to_thread(lineups.demo_throws, demo_id)
+        return {"demo_id": demo_id, "throws": throws}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving grenade throws: {str(e)}"
+        )
+
+
+@app.get("/demo/{demo_id}/stats")
+async def get_demo_stats(demo_id: str, per_round: bool = True):
+    """
+    Get the kill/damage stat sheet of a demo
+    
+    - **per_round**: Include every player's per-round rows
+    
+    Returns per-player totals (kills, deaths, assists, ADR, KAST, headshot %,
+    opening duels, trades), headshots by weapon and optionally per-round
+    stats with the player's side. Needs the demo's columnar store.
+    """
+    try:
+        _require_columns(demo_id)
+        
+        sheet = await profiling.to_thread(analytics.stat_sheet, demo_id)
+        return {"demo_id": demo_id, **analytics.sheet_to_json(sheet, per_round)}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing stats: {str(e)}"
+        )
+
+
+def _batch_stats(demo_ids: List[str], per_demo: bool) -> dict:
+    """Stat sheets of several demos, aggregated per player"""
+    sheets = []
+    demos = []
+    errors = []
+    for demo_id in demo_ids:
+        if not database.demo_exists(demo_id):
+            errors.append({"demo_id": demo_id, "error": f"Demo not found: {demo_id}"})
+            continue
+        if not columnar.has_columns(demo_id):
+            errors.append({"demo_id": demo_id, "error": f"Demo artifacts are not built yet: {demo_id}"})
+            continue
+        try:
+            sheet = analytics.stat_sheet(demo_id)
+        except Exception as e:
+            errors.append({"demo_id": demo_id, "error": f"Error computing stats: {str(e)}"})
+            continue
+        sheets.append(sheet)
+        if per_demo:
+            demos.append({"demo_id": demo_id, **analytics.sheet_to_json(sheet, per_round=False)})
+    
+    result = {"demos": len(sheets), "players": analytics.aggregate_sheets(sheets), "errors": errors}
+    if per_demo:
+        result["perDemo"] = demos
+    return result
+
+
+@app.post("/demos/stats")
+async def get_demos_stats(request: StatsBatchRequest):
+    """
+    Get player stats aggregated over several demos
+    
+    - **demo_ids**: Demos to include (later demos win for player names)
+    - **per_demo**: Also return each demo's per-player totals
+    
+    Players are matched by steam id; rates (ADR, KAST, headshot %) are
+    recomputed over all rounds played. Demos that are missing or not built
+    yet are listed under "errors".
+    """
+    demo_ids = list(dict.fromkeys(request.demo_ids))
+    if len(demo_ids) > BATCH_MAX_DEMOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many demos ({len(demo_ids)}). Maximum: {BATCH_MAX_DEMOS}"
+        )
+    
+    try:
+        return await profiling.to_thread(_batch_stats, demo_ids, request.per_demo)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error computing stats: {str(e)}"
+        )
+
+
+@app.get("/aggregates/teams")
+async def get_team_aggregates(map_name: Optional[str] = None, team: Optional[str] = None):
+    """
+    Get every team's results per map across the library
+    
+    - **map_name**: Optional map to restrict to
+    - **team**: Optional team name to restrict to
+    
+    Read from the aggregate tables kept up to date on save and delete.
+    """
+    try:
+        return {"teams": aggregates.team_results(map_name, team)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving aggregates: {str(e)}"
+        )
+
+
+@app.get("/aggregates/players")
+async def get_player_aggregates(
+    steam_id: Optional[int] = None,
+    order_by: str = "kills",
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """
+    Get career stats of every player across the library
+    
+    - **steam_id**: Optional player to restrict to
+    - **order_by**: Stat to sort by, descending (e.g. "kills", "damage", "kast")
+    - **limit**: Optional number of players to return
+    """
+    if order_by not in aggregates.PLAYER_COLUMNS and order_by not in ("demos", "rounds"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown stat: {order_by}"
+        )
+    
+    try:
+        return {"players": aggregates.player_careers(steam_id, order_by, limit)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving aggregates: {str(e)}"
+        )
+
+
+@app.get("/aggregates/economy")
+async def get_economy_aggregates(map_name: Optional[str] = None):
+    """
+    Get average money, equipment value and win rate per round number and side
+    
+    - **map_name**: Optional map to restrict to
+    """
+    try:
+        return {"rounds": aggregates.economy_by_round(map_name)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving aggregates: {str(e)}"
+        )
+
+
+@app.post("/query")
+async def run_analytics_query(request: AnalyticsQueryRequest):
+    """
+    Run a read-only analytical query over the demo library
+    
+    Filters one columnar table (or "demos", the metadata) across every demo
+    with an expression such as "weapon == 'awp' and round <= 12 and
+    map_name == 'de_mirage'", then returns the selected columns or the
+    group_by/aggregates result. Metadata conditions skip whole demos and
+    tick/round bounds skip unread parts of the tick table.
+    
+    Returns rows (at most limit, capped at the server maximum), truncated,
+    the demos that could not be scanned and scan statistics.
+    """
+    try:
+        return await profiling.to_thread(
+            query.run_query,
+            request.table,
+            request.where,
+            request.select,
+            request.group_by,
+            request.aggregates,
+            request.order_by,
+            request.limit,
+            request.demo_ids,
+            request.resolution
+        )
+    except query.QueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except query.QueryTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_408_REQUEST_TIMEOUT,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error running query: {str(e)}"
         )
 
 
@@ -199,12 +1135,22 @@ async def delete_demo(demo_id: str):
                 detail=f"Demo not found: {demo_id}"
             )
         
-        # Delete from database
+        # Drop a queued ingest job; a running one stops once the demo is gone
+        ingest.cancel(demo_id)
+        
+        # Delete from database (subtracting the demo from the aggregates)
         db_deleted = database.delete_demo(demo_id)
+        artifacts.invalidate_win_tables()
+        lineups.invalidate()
         
-        # Delete JSON file
-        file_path = DEMOS_DIR / f"{demo_id}.json"
-        file_path.unlink(missing_ok=True)
+        # Delete JSON file, derived artifacts and ingest job
+        storage.delete_demo_files(demo_id)
+        density.evict_demo(demo_id)
+        tiles.evict_demo(demo_id)
+        spatial.evict_demo(demo_id)
+        analytics.evict_demo(demo_id)
+        roundstate.evict_demo(demo_id)
+        database.delete_job(demo_id)
         
         if not db_deleted:
             raise HTTPException(
@@ -0,0 +1,198 @@
+"""
+CS2 map registry
+
+World bounds, radar images, vertical levels and bombsites of every map
+with a radar in frontend/public/radar_images. This is the only copy: the
+heatmap scripts in utils/ import it through utils/maps.py.
+
+Bounds come from the radar overviews (pos_x, pos_y, scale: the radar is
+1024 px wide, so it covers 1024 * scale game units), except the heatmap
+bounds of de_ancient and de_mirage (see below). radarBounds always holds
+the overview bounds. Maps with stacked
+floors (baggage, nuke, train, vertigo) list their levels bottom-up; a
+position belongs to the first level whose maxZ is above its z.
+
+Usage:
+    python -m app.maps        # list registered maps
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+RADAR_SIZE = 1024  # Radar image width in pixels
+
+
+def _overview(pos_x: float, pos_y: float, scale: float, name: str,
+              lower_max_z: Optional[float] = None) -> Dict[str, Any]:
+    """Map config from radar overview parameters (the radar covers 1024 * scale game units)"""
+    bounds = {
+        "minX": pos_x,
+        "maxX": pos_x + RADAR_SIZE * scale,
+        "minY": pos_y - RADAR_SIZE * scale,
+        "maxY": pos_y,
+    }
+    config = {
+        **bounds,
+        "radarBounds": dict(bounds),  # World area the radar image shows
+        "radarImage": f"/radar_images/{name}_radar_psd.png",
+        "levels": [{"name": "default", "radarImage": f"/radar_images/{name}_radar_psd.png", "maxZ": None}],
+    }
+    if lower_max_z is not None:
+        config["levels"].insert(0, {
+            "name": "lower",
+            "radarImage": f"/radar_images/{name}_lower_radar_psd.png",
+            "maxZ": lower_max_z,
+        })
+    return config
+
+
+MAP_CONFIG = {
+    "ar_baggage": _overview(-1316, 1288, 2.539062, "ar_baggage", lower_max_z=-5),
+    "ar_shoots": _overview(-1368, 1952, 2.6875, "ar_shoots"),
+    "cs_italy": _overview(-2647, 2592, 4.6, "cs_italy"),
+    "cs_office": _overview(-1838, 1858, 4.1, "cs_office"),
+    "de_ancient": _overview(-2953, 2164, 5.0, "de_ancient"),
+    "de_anubis": _overview(-2796, 3328, 5.22, "de_anubis"),
+    "de_dust2": _overview(-2476, 3239, 4.4, "de_dust2"),
+    "de_inferno": _overview(-2087, 3870, 4.9, "de_inferno"),
+    "de_mirage": _overview(-3230, 1713, 5.0, "de_mirage"),
+    "de_nuke": _overview(-3453, 2887, 7.0, "de_nuke", lower_max_z=-495),
+    "de_overpass": _overview(-4831, 1781, 5.2, "de_overpass"),
+    "de_train": _overview(-2308, 2078, 4.082077, "de_train", lower_max_z=-50),
+    "de_vertigo": _overview(-3168, 1762, 4.0, "de_vertigo", lower_max_z=11700),
+}
+
+# de_ancient and de_mirage keep the heatmap bounds their heatmaps were always
+# binned with, so stored cubes and exported grids stay comparable. Only the
+# binning bounds (minX..maxY, used by world_to_grid) change: radarBounds keep
+# the overview, which is what the radar image shows and what the frontend
+# (clustering.config.ts) converts normalized points with. Anything that puts
+# a grid on the radar must map between the two (see tiles.grid_box, to_world).
+MAP_CONFIG["de_ancient"].update({"maxX": 2119, "minY": -2887, "maxY": 1983})
+MAP_CONFIG["de_mirage"].update({"maxX": 1890, "minY": -3407, "maxY": 1682})
+
+# Approximate bombsite polygons in normalized 0-1 map coordinates (y up),
+# matching frontend/config/clustering.regions.ts
+SITE_POLYGONS = {
+    "de_mirage": {
+        "A": [(0.68, 0.70), (0.92, 0.70), (0.92, 0.92), (0.68, 0.92)],
+        "B": [(0.08, 0.68), (0.36, 0.68), (0.36, 0.92), (0.08, 0.92)],
+    },
+    "de_ancient": {
+        "A": [(0.62, 0.60), (0.90, 0.60), (0.90, 0.88), (0.62, 0.88)],
+        "B": [(0.10, 0.60), (0.38, 0.60), (0.38, 0.88), (0.10, 0.88)],
+    },
+}
+
+
+def get_map_config(map_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Get the configuration for a map, or None if the map is unknown"""
+    return MAP_CONFIG.get(map_name) if map_name else None
+
+
+def to_world(points: List[Tuple[float, float]], map_config: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """
+    Convert normalized 0-1 radar coordinates (y up) into world coordinates
+
+    Uses the radar bounds, like the frontend (clustering.config.ts), not
+    the heatmap binning bounds.
+    """
+    bounds = map_config['radarBounds']
+    return [
+        (bounds['minX'] + x * (bounds['maxX'] - bounds['minX']),
+         bounds['minY'] + y * (bounds['maxY'] - bounds['minY']))
+        for x, y in points
+    ]
+
+
+def site_polygon(map_name: str, site: str) -> Optional[List[Tuple[float, float]]]:
+    """World-coordinate polygon of a bombsite, or None if the map or site is unknown"""
+    polygon = SITE_POLYGONS.get(map_name, {}).get(site)
+    if polygon is None:
+        return None
+    return to_world(polygon, MAP_CONFIG[map_name])
+
+
+def grid_transform(map_config: Dict[str, Any], grid_size: int) -> Tuple[float, float, float, float]:
+    """
+    World -> grid affine transform of a map's heatmap bounds
+
+    Returns:
+        (col_scale, col_offset, row_scale, row_offset) so that
+        x * col_scale + col_offset and y * row_scale + row_offset run from
+        0 to grid_size across the map bounds (y counted up from minY)
+    """
+    col_scale = grid_size / (map_config['maxX'] - map_config['minX'])
+    row_scale = grid_size / (map_config['maxY'] - map_config['minY'])
+    return col_scale, -map_config['minX'] * col_scale, row_scale, -map_config['minY'] * row_scale
+
+
+def world_to_grid(xs: np.ndarray, ys: np.ndarray, map_config: Dict[str, Any], grid_size: int):
+    """
+    Grid cell of every position, binned like np.histogram2d
+    (row 0 is the top of the radar, positions on the max edge fall in the last cell)
+
+    Every heatmap (backend cubes and histograms, the scripts' grids and
+    timelines) is binned through here.
+
+    Args:
+        xs, ys: Arrays of world coordinates
+        map_config: Map bounds (see MAP_CONFIG)
+        grid_size: Bins per dimension
+
+    Returns:
+        Tuple (rows, cols, in_bounds)
+    """
+    col_scale, col_offset, row_scale, row_offset = grid_transform(map_config, grid_size)
+    fx = np.asarray(xs, dtype=np.float64) * col_scale + col_offset
+    fy = np.asarray(ys, dtype=np.float64) * row_scale + row_offset
+    in_bounds = (fx >= 0) & (fx <= grid_size) & (fy >= 0) & (fy <= grid_size)
+    with np.errstate(invalid='ignore'):  # Missing (NaN) coordinates are out of bounds anyway
+        cols = np.minimum(np.floor(fx), grid_size - 1).astype(np.int64)
+        rows = grid_size - 1 - np.minimum(np.floor(fy), grid_size - 1).astype(np.int64)
+    return rows, cols, in_bounds
+
+
+def position_counts(xs: np.ndarray, ys: np.ndarray, map_config: Dict[str, Any], grid_size: int) -> np.ndarray:
+    """Positions per grid cell (grid_size x grid_size, rows top-down), positions off the map dropped"""
+    rows, cols, in_bounds = world_to_grid(xs, ys, map_config, grid_size)
+    flat = rows[in_bounds] * grid_size + cols[in_bounds]
+    return np.bincount(flat, minlength=grid_size * grid_size).reshape(grid_size, grid_size)
+
+
+def level_names(map_config: Dict[str, Any]) -> List[str]:
+    """Level names of a map, bottom-up"""
+    return [level['name'] for level in map_config['levels']]
+
+
+def level_splits(map_config: Dict[str, Any]) -> np.ndarray:
+    """Sorted z boundaries between a map's levels (empty for single-level maps)"""
+    return np.array([level['maxZ'] for level in map_config['levels'] if level['maxZ'] is not None])
+
+
+def level_index(zs: Optional[np.ndarray], map_config: Dict[str, Any]) -> np.ndarray:
+    """
+    Index into map_config['levels'] for each z
+
+    Missing heights (NaN, or no z column at all when zs is None) go to the
+    default level, which is always the top one.
+    """
+    splits = level_splits(map_config)
+    if zs is None:
+        return np.array(len(splits))
+    return np.searchsorted(splits, np.asarray(zs, dtype=np.float64), side='right')
+
+
+def main():
+    for name, config in MAP_CONFIG.items():
+        levels = ', '.join(
+            f"{level['name']} (z < {level['maxZ']})" if level['maxZ'] is not None else level['name']
+            for level in config['levels']
+        )
+        print(f"{name:12s} x [{config['minX']:g}, {config['maxX']:g}]  "
+              f"y [{config['minY']:g}, {config['maxY']:g}]  levels: {levels}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Lightweight Prometheus-style metrics
+
+Counters, gauges and fixed-bucket histograms kept in process memory and
+rendered in the Prometheus text exposition format by GET /metrics.
+Recording a sample is a dict lookup and a few additions under a lock,
+cheap enough to leave on in production. Metrics are per process: work
+done inside ingest worker processes is not included.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}"""
+    parts = [f'{k}="{str(v)}"' for k, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class holding name, help text and label names"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(k, "")) for k in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set explicitly or computed on scrape"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]):
+        """Compute values at scrape time; function returns {label values tuple: value}"""
+        self._function = function
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            values.update(self._function())
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative fixed-bucket histogram per label set"""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the wall time of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for key, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+HTTP_REQUEST_BYTES = Counter(
+    "http_request_bytes_total", "Request body bytes received", ("route",))
+HTTP_RESPONSE_BYTES = Counter(
+    "http_response_bytes_total", "Response body bytes sent", ("route",))
+
+# Storage and serialization
+STORAGE_SECONDS = Histogram(
+    "storage_io_duration_seconds", "Time spent reading/writing demo files", ("op",))
+STORAGE_BYTES_READ = Counter(
+    "storage_bytes_read_total", "Bytes read from demo storage", ("kind",))
+STORAGE_BYTES_WRITTEN = Counter(
+    "storage_bytes_written_total", "Bytes written to demo storage", ("kind",))
+JSON_SECONDS = Histogram(
+    "json_duration_seconds", "Time spent in JSON encoding/decoding", ("op",))
+
+# Database
+DB_SECONDS = Histogram(
+    "db_call_duration_seconds", "Time spent in app.database calls", ("function",))
+
+# Caches
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups", ("cache", "result"))
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio", "Fraction of cache lookups that were hits", ("cache",))
+
+# Ingest pipeline
+INGEST_QUEUE_DEPTH = Gauge(
+    "ingest_queue_depth", "Ingest jobs submitted to the worker pool and not finished")
+INGEST_JOBS = Counter(
+    "ingest_jobs_total", "Finished ingest job attempts", ("outcome",))
+
+_caches: List[str] = []
+
+
+def register_cache(name: str):
+    """Expose the hit ratio of a cache recorded through record_cache"""
+    if name not in _caches:
+        _caches.append(name)
+
+
+def record_cache(name: str, hit: bool):
+    """Record one cache lookup"""
+    CACHE_REQUESTS.inc(cache=name, result="hit" if hit else "miss")
+
+
+def _cache_hit_ratios() -> Dict[Tuple[str, ...], float]:
+    ratios = {}
+    for name in _caches:
+        hits = CACHE_REQUESTS.get(cache=name, result="hit")
+        total = hits + CACHE_REQUESTS.get(cache=name, result="miss")
+        ratios[(name,)] = hits / total if total else 0.0
+    return ratios
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
+
+
+def timed_db(function: Callable) -> Callable:
+    """Decorator recording the duration of a database function"""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with DB_SECONDS.time(function=function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and body sizes per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        received = 0
+        sent = 0
+        status_code = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""), route=route_path, status=str(status_code)
+            )
+            HTTP_REQUEST_BYTES.inc(received, route=route_path)
+            HTTP_RESPONSE_BYTES.inc(sent, route=route_path)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 
@@ -22,11 +22,21 @@ class DemoSaveRequest(BaseModel):
     data: Any  # The actual JSON data from parser
 
 
+class DemoBatchRequest(BaseModel):
+    """Request body for fetching several demos in one response"""
+    demo_ids: List[str]
+    tables: Optional[List[str]] = None  # Top-level keys to include, e.g. ["header", "rounds", "ticks"]
+    fields: Optional[Dict[str, List[str]]] = None  # Per-table fields, e.g. {"ticks": ["tick", "x", "y"]}
+    include_metadata: bool = True
+    resolution: str = "full"  # Ticks resolution: "full", "4", "16" (every Nth sampled tick) or "path"
+
+
 class DemoResponse(BaseModel):
     """Response after saving a demo"""
     demo_id: str
     message: str
     timestamp: str
+    ingest_status: Optional[str] = None  # Status of the background artifact build
 
 
 class DemoListItem(BaseModel):
@@ -51,4 +61,49 @@ class DemoListResponse(BaseModel):
 class DeleteResponse(BaseModel):
     """Response after deleting a demo"""
     message: str
-    demo_id: str
\ No newline at end of file
+    demo_id: str
+
+
+class IngestStatusResponse(BaseModel):
+    """Status of the background ingest job of a demo"""
+    demo_id: str
+    status: str  # queued, running, retrying, done, failed
+    step: Optional[str] = None  # Artifact currently being built
+    attempts: int = 0
+    error: Optional[str] = None
+    artifacts: Optional[Dict[str, Any]] = None  # Per-artifact build summary once done
+    created_at: str
+    updated_at: str
+
+class RegionQueryRequest(BaseModel):
+    """Request body for querying the rows of a table inside a map region"""
+    table: str = "ticks"  # ticks, kills (victim position), grenades or smokes
+    polygon: Optional[List[List[float]]] = None  # [[x, y], ...] in world coordinates
+    normalized: bool = False  # polygon given in 0-1 map coordinates (y up), like clustering.regions.ts
+    site: Optional[str] = None  # Bombsite polygon of the demo's map, e.g. "A"
+    center: Optional[List[float]] = None  # [x, y] circle center, used with radius
+    radius: Optional[float] = Field(None, ge=0)  # Buffer around the region in game units
+    rounds: Optional[List[int]] = None
+    side: Optional[str] = Field(None, pattern="^(CT|T)$")
+    tick_start: Optional[int] = None
+    tick_end: Optional[int] = None
+    limit: int = Field(1000, ge=0)  # Most event rows returned
+
+
+class StatsBatchRequest(BaseModel):
+    """Request body for player stats aggregated over several demos"""
+    demo_ids: List[str]
+    per_demo: bool = False  # Also return each demo's stat sheet (without per-round rows)
+
+
+class AnalyticsQueryRequest(BaseModel):
+    """Request body for an analytical query over the demo library (see app.query)"""
+    table: str  # Columnar table (kills, damages, ticks, ...) or "demos" for the metadata
+    where: Optional[str] = None  # Filter, e.g. "weapon == 'ak47' and round <= 12"
+    select: Optional[List[str]] = None  # Columns of the returned rows (default: all)
+    group_by: Optional[List[str]] = None
+    aggregates: Optional[Dict[str, str]] = None  # Output name -> "count()", "mean(damage)", ...
+    order_by: Optional[List[str]] = None  # Output columns, "-name" for descending
+    limit: Optional[int] = Field(None, ge=1)  # Capped at QUERY_MAX_ROWS
+    demo_ids: Optional[List[str]] = None  # Demos to scan (default: the whole library)
+    resolution: str = "full"  # Ticks resolution for table "ticks"
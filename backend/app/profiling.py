@@ -0,0 +1,177 @@
+"""
+Opt-in request profiling
+
+When CS2_PROFILE=1, a CS2_PROFILE_SAMPLE_RATE fraction of requests (and
+any request carrying "X-Profile: 1") runs under cProfile. With profiling
+disabled the header is ignored. Profiles of requests slower than
+CS2_PROFILE_THRESHOLD_MS (or any explicitly requested one) are written as
+pstats files to data/profiles/, keeping the newest PROFILE_MAX_FILES.
+Open them with `python -m pstats <file>` or snakeviz.
+
+cProfile hooks the event loop thread, so only one request is profiled at
+a time. Endpoints offload blocking work through to_thread below, which
+profiles the worker thread too and merges it into the request's profile.
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    PROFILES_DIR,
+    PROFILE_ENABLED,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_THRESHOLD_MS,
+    PROFILE_HEADER,
+    PROFILE_MAX_FILES
+)
+
+PROFILE_SUFFIX = ".prof"
+_NAME_PATTERN = re.compile(
+    r"^(?P<created>\d{8}T\d{6}\d*)_(?P<method>[A-Z]+)_(?P<route>.+)_(?P<ms>\d+)ms\.prof$"
+)
+
+_active = threading.Lock()
+
+# Profilers of the worker threads of the request being profiled (None when not profiling)
+_thread_profilers: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = contextvars.ContextVar(
+    "thread_profilers", default=None
+)
+
+
+def _slug(path: str) -> str:
+    """Filesystem-safe version of a route path"""
+    return re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+
+
+def _rotate(directory: Path, keep: int):
+    """Delete the oldest profiles beyond the retention limit"""
+    profiles = sorted(directory.glob(f"*{PROFILE_SUFFIX}"))
+    for old in profiles[:-keep] if keep > 0 else profiles:
+        old.unlink(missing_ok=True)
+
+
+def save_profile(profiler: cProfile.Profile, method: str, route: str, duration_ms: float,
+                 thread_profilers: Optional[List[cProfile.Profile]] = None) -> Path:
+    """Write a profile (merged with its worker threads' profiles) to the profiles directory and rotate old ones"""
+    created = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    path = PROFILES_DIR / f"{created}_{method}_{_slug(route)}_{int(duration_ms)}ms{PROFILE_SUFFIX}"
+    stats = pstats.Stats(profiler)
+    for thread_profiler in thread_profilers or []:
+        stats.add(thread_profiler)
+    stats.dump_stats(str(path))
+    _rotate(PROFILES_DIR, PROFILE_MAX_FILES)
+    return path
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles, newest first"""
+    profiles = []
+    for path in sorted(PROFILES_DIR.glob(f"*{PROFILE_SUFFIX}"), reverse=True):
+        match = _NAME_PATTERN.match(path.name)
+        if not match:
+            continue
+        profiles.append({
+            "name": path.name,
+            "created_at": datetime.strptime(match["created"], "%Y%m%dT%H%M%S%f").isoformat(),
+            "method": match["method"],
+            "route": match["route"],
+            "duration_ms": int(match["ms"]),
+            "size": path.stat().st_size,
+        })
+    return profiles
+
+
+def get_profile_path(name: str) -> Optional[Path]:
+    """Path of a stored profile, or None if the name is not a stored profile"""
+    if not _NAME_PATTERN.match(name):
+        return None
+    path = PROFILES_DIR / name
+    return path if path.is_file() else None
+
+
+def _run_profiled(profilers: List[cProfile.Profile], func, *args, **kwargs):
+    """Run func under a new profiler of the calling thread, collected into profilers"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows a single active profiler, which already sees every thread
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profilers.append(profiler)
+
+
+async def to_thread(func, *args, **kwargs):
+    """
+    asyncio.to_thread that profiles func when the current request is profiled
+
+    cProfile only sees the thread it was enabled on, so the worker thread
+    gets its own profiler, merged into the request's profile when saved.
+    """
+    profilers = _thread_profilers.get()
+    if profilers is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return await asyncio.to_thread(_run_profiled, profilers, func, *args, **kwargs)
+
+
+def _forced(scope) -> bool:
+    """Whether the client explicitly asked for a profile (only honoured with profiling enabled)"""
+    return PROFILE_ENABLED and any(
+        key.decode("latin-1") == PROFILE_HEADER and value.strip() not in (b"", b"0")
+        for key, value in scope.get("headers", [])
+    )
+
+
+def _wants_profile(scope) -> bool:
+    """Decide whether a request should run under the profiler"""
+    return PROFILE_ENABLED and (_forced(scope) or random.random() < PROFILE_SAMPLE_RATE)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled or explicitly requested requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _active.acquire(blocking=False):
+            # Another request is being profiled on this loop
+            await self.app(scope, receive, send)
+            return
+
+        profiler = cProfile.Profile()
+        thread_profilers: List[cProfile.Profile] = []
+        token = _thread_profilers.set(thread_profilers)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                profiler.disable()
+        finally:
+            _thread_profilers.reset(token)
+            _active.release()
+            duration_ms = (time.perf_counter() - start) * 1000
+            if _forced(scope) or duration_ms >= PROFILE_THRESHOLD_MS:
+                route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+                try:
+                    save_profile(profiler, scope.get("method", ""), route, duration_ms, thread_profilers)
+                except Exception as e:
+                    print(f"Error saving profile: {e}")
@@ -0,0 +1,555 @@
+"""
+Read-only analytical queries over the demo library
+
+A query names one table (a columnar demo table such as "kills" or "ticks",
+or "demos" for the metadata DB) and optionally a filter expression,
+selected columns, group-by columns, aggregates and an ordering. Filters use
+a small expression dialect parsed with Python's ast module; only the nodes
+listed in _check are accepted, so nothing is ever evaluated as code:
+
+    weapon == 'ak47' and isHeadshot and round in [1, 2, 3]
+    map_name == 'de_mirage' and abs(x - 100) < 50 and not isnull(z)
+
+Names are table columns, the demo's metadata columns (map_name, date,
+team_ct, ...), demo_id, and round (the round number of the row's tick).
+Aggregates are count(), count(expr), sum, mean, min and max.
+
+Every demo is scanned on its own, in parallel, and only as much as needed:
+- filter conjuncts on metadata columns prune whole demos before any table
+  is opened
+- tick and round bounds become a tick range, which the columnar reader
+  uses to skip whole blocks of the tick table
+- only the columns the query names are read
+Aggregates are reduced per demo (count, sum, min, max per group) and the
+partial results merged, so a scan holds at most one demo's columns.
+"""
+
+import ast
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app import analytics, artifacts, columnar, database
+from app.config import QUERY_MAX_ROWS, QUERY_TIMEOUT_S, QUERY_WORKERS
+
+METADATA_TABLE = "demos"
+METADATA_COLUMNS = (
+    "demo_id", "map_name", "date", "team_ct", "team_t", "player_count", "round_count",
+    "score_ct", "score_t", "demo_name", "created_at", "file_size",
+)
+METADATA_TEXT_COLUMNS = {"demo_id", "map_name", "date", "team_ct", "team_t", "demo_name", "created_at"}
+ROUND_COLUMN = "round"
+AGGREGATE_FUNCS = ("count", "sum", "mean", "min", "max")
+SCALAR_FUNCS = ("abs", "isnull")
+
+_COMPARE = {
+    ast.Eq: np.equal, ast.NotEq: np.not_equal, ast.Lt: np.less,
+    ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+}
+_ARITHMETIC = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+    ast.Div: np.true_divide, ast.FloorDiv: np.floor_divide, ast.Mod: np.mod,
+}
+
+
+class QueryError(ValueError):
+    """Invalid query (bad expression, unknown table or column)"""
+
+
+class QueryTimeout(Exception):
+    """The query ran longer than its time limit"""
+
+
+def parse_expression(text: str) -> ast.AST:
+    """Parse and validate a filter or aggregate argument expression"""
+    try:
+        tree = ast.parse(text, mode='eval').body
+    except SyntaxError as e:
+        raise QueryError(f"Invalid expression {text!r}: {e.msg}") from None
+    _check(tree, text)
+    return tree
+
+
+def _check(node: ast.AST, text: str):
+    """Reject every syntax outside the dialect"""
+    if isinstance(node, ast.BoolOp) or (isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub))):
+        children = node.values if isinstance(node, ast.BoolOp) else [node.operand]
+    elif isinstance(node, ast.Compare):
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(right, (ast.List, ast.Tuple)) or not all(isinstance(e, ast.Constant) for e in right.elts):
+                    raise QueryError(f"'in' needs a list of constants in {text!r}")
+            elif type(op) not in _COMPARE:
+                raise QueryError(f"Unsupported comparison in {text!r}")
+        children = [node.left] + [c for op, c in zip(node.ops, node.comparators) if type(op) in _COMPARE]
+    elif isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+        children = [node.left, node.right]
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in SCALAR_FUNCS:
+        if len(node.args) != 1 or node.keywords:
+            raise QueryError(f"{node.func.id}() takes one argument in {text!r}")
+        children = node.args
+    elif isinstance(node, ast.Name):
+        children = []
+    elif isinstance(node, ast.Constant) and isinstance(node.value, (str, int, float, bool)):
+        children = []
+    else:
+        raise QueryError(f"Unsupported syntax {type(node).__name__} in {text!r}")
+    for child in children:
+        _check(child, text)
+
+
+def names_in(node: Optional[ast.AST]) -> Set[str]:
+    """Column names an expression refers to"""
+    if node is None:
+        return set()
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)} - set(SCALAR_FUNCS)
+
+
+def evaluate(node: ast.AST, env: Dict[str, Any]) -> Any:
+    """Evaluate a checked expression over column arrays (vectorized)"""
+    if isinstance(node, ast.BoolOp):
+        values = [np.asarray(evaluate(v, env), dtype=bool) for v in node.values]
+        return np.logical_and.reduce(values) if isinstance(node.op, ast.And) else np.logical_or.reduce(values)
+    if isinstance(node, ast.UnaryOp):
+        value = evaluate(node.operand, env)
+        try:
+            return ~np.asarray(value, dtype=bool) if isinstance(node.op, ast.Not) else -value
+        except (TypeError, ValueError):
+            raise QueryError(f"Cannot evaluate {ast.unparse(node)} (mismatched types)") from None
+    if isinstance(node, ast.Compare):
+        result = True
+        left = evaluate(node.left, env)
+        for op, right_node in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                match = np.isin(left, [e.value for e in right_node.elts])
+                result = result & (match if isinstance(op, ast.In) else ~match)
+                continue
+            right = evaluate(right_node, env)
+            try:
+                result = result & _COMPARE[type(op)](left, right)
+            except TypeError:
+                raise QueryError(f"Cannot compare {ast.unparse(node)} (mismatched types)") from None
+            left = right
+        return result
+    if isinstance(node, ast.BinOp):
+        left, right = evaluate(node.left, env), evaluate(node.right, env)
+        try:
+            return _ARITHMETIC[type(node.op)](left, right)
+        except TypeError:
+            raise QueryError(f"Cannot evaluate {ast.unparse(node)} (mismatched types)") from None
+    if isinstance(node, ast.Call):
+        value = np.asarray(evaluate(node.args[0], env))
+        if node.func.id == "abs":
+            if value.dtype.kind not in 'biuf':
+                raise QueryError(f"Cannot evaluate {ast.unparse(node)} (not a number)")
+            return np.abs(value)
+        # isnull: NaN numbers and empty strings (how the columnar store keeps missing values)
+        return np.isnan(value) if value.dtype.kind == 'f' else value == '' if value.dtype.kind == 'U' else np.zeros(value.shape, dtype=bool)
+    if isinstance(node, ast.Name):
+        if node.id not in env:
+            raise QueryError(f"Unknown column: {node.id}")
+        return env[node.id]
+    return node.value
+
+
+def _conjuncts(node: Optional[ast.AST]) -> List[ast.AST]:
+    """Top-level 'and' terms of a filter"""
+    if node is None:
+        return []
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        return [term for value in node.values for term in _conjuncts(value)]
+    return [node]
+
+
+def _bounds(term: ast.AST, name: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """(low, high) inclusive bounds a term puts on one column, None if it is not a simple bound"""
+    if not isinstance(term, ast.Compare) or len(term.ops) != 1:
+        return None
+    left, op, right = term.left, term.ops[0], term.comparators[0]
+    if isinstance(op, ast.In) and isinstance(left, ast.Name) and left.id == name:
+        values = [e.value for e in right.elts if isinstance(e.value, (int, float)) and not isinstance(e.value, bool)]
+        return (min(values), max(values)) if values and len(values) == len(right.elts) else None
+    if isinstance(right, ast.Name) and right.id == name and isinstance(left, ast.Constant):
+        # Constant on the left: flip the comparison
+        left, right = right, left
+        op = {ast.Lt: ast.Gt(), ast.LtE: ast.GtE(), ast.Gt: ast.Lt(), ast.GtE: ast.LtE()}.get(type(op), op)
+    if not (isinstance(left, ast.Name) and left.id == name and isinstance(right, ast.Constant)):
+        return None
+    value = right.value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if isinstance(op, ast.Eq):
+        return value, value
+    if isinstance(op, (ast.Gt, ast.GtE)):
+        return value, None
+    if isinstance(op, (ast.Lt, ast.LtE)):
+        return None, value
+    return None
+
+
+def _intersect(terms: List[ast.AST], name: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """Bounds on a column implied by all conjuncts together, None if unbounded"""
+    low = high = None
+    for term in terms:
+        bounds = _bounds(term, name)
+        if bounds is None:
+            continue
+        if bounds[0] is not None:
+            low = bounds[0] if low is None else max(low, bounds[0])
+        if bounds[1] is not None:
+            high = bounds[1] if high is None else min(high, bounds[1])
+    return None if low is None and high is None else (low, high)
+
+
+def _metadata_value(name: str, value: Any) -> Any:
+    """Metadata cell as a column value (missing text as '', missing numbers as NaN)"""
+    if value is None:
+        return '' if name in METADATA_TEXT_COLUMNS else np.nan
+    return value
+
+
+def _aggregate_spec(text: str) -> Tuple[str, Optional[ast.AST]]:
+    """Parse 'fn(expr)' into (fn, argument expression or None for count())"""
+    try:
+        call = ast.parse(text, mode='eval').body
+    except SyntaxError as e:
+        raise QueryError(f"Invalid aggregate {text!r}: {e.msg}") from None
+    if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in AGGREGATE_FUNCS):
+        raise QueryError(f"Aggregates are one of {', '.join(f + '()' for f in AGGREGATE_FUNCS)}: {text!r}")
+    if len(call.args) > 1 or call.keywords or (not call.args and call.func.id != "count"):
+        raise QueryError(f"Invalid arguments in aggregate {text!r}")
+    if call.args:
+        _check(call.args[0], text)
+    return call.func.id, call.args[0] if call.args else None
+
+
+class _Plan:
+    """A validated query and what it needs from each demo"""
+
+    def __init__(self, table: str, where: Optional[str], select: Optional[List[str]],
+                 group_by: Optional[List[str]], aggregates: Optional[Dict[str, str]],
+                 order_by: Optional[List[str]], limit: Optional[int], resolution: str):
+        self.table = table
+        self.where = parse_expression(where) if where else None
+        self.group_by = list(group_by or [])
+        self.aggregates = {alias: _aggregate_spec(text) for alias, text in (aggregates or {}).items()}
+        self.select = list(select or [])
+        self.order_by = list(order_by or [])
+        self.limit = min(limit or QUERY_MAX_ROWS, QUERY_MAX_ROWS)
+        self.resolution = resolution
+        if self.select and (self.group_by or self.aggregates):
+            raise QueryError("Use either select, or group_by/aggregates")
+
+        self.names = names_in(self.where) | set(self.group_by) | set(self.select)
+        for _, arg in self.aggregates.values():
+            self.names |= names_in(arg)
+        outputs = self.group_by + list(self.aggregates)
+        for key in self.order_by:
+            if (self.group_by or self.aggregates) and key.lstrip('-') not in outputs:
+                raise QueryError(f"order_by must name an output column: {key}")
+        if not (self.group_by or self.aggregates):
+            self.names |= {key.lstrip('-') for key in self.order_by}
+            # Rows are merged across demos by their output values
+            extra = [k.lstrip('-') for k in self.order_by if self.select and k.lstrip('-') not in self.select]
+            if extra:
+                raise QueryError(f"order_by must name selected columns: {', '.join(extra)}")
+
+        # Pushdown: metadata-only conjuncts prune demos, tick/round bounds narrow the read
+        terms = _conjuncts(self.where)
+        meta = set(METADATA_COLUMNS)
+        self.demo_terms = [t for t in terms if names_in(t) and names_in(t) <= meta]
+        self.tick_bounds = _intersect(terms, 'tick')
+        self.round_bounds = _intersect(terms, ROUND_COLUMN)
+
+
+def _env(plan: _Plan, demo: Dict[str, Any], schema: Dict[str, str]) -> Tuple[Dict[str, Any], int]:
+    """Columns a query needs from one demo, read with pushdown; returns (env, rows)"""
+    wanted = sorted(n for n in plan.names if n in schema)
+    if not plan.select and not plan.group_by and not plan.aggregates:
+        wanted = list(schema)
+    needs_round = ROUND_COLUMN in plan.names and ROUND_COLUMN not in schema
+
+    tick_range = None
+    if 'tick' in schema:
+        low, high = plan.tick_bounds or (None, None)
+        round_data = None
+        if needs_round or plan.round_bounds:
+            round_data = analytics.round_ranges(columnar.load_table(demo['demo_id'], 'rounds', ['roundNum', 'startTick', 'endTick']))
+        if plan.round_bounds and ROUND_COLUMN not in schema:
+            round_nums, starts, ends = round_data
+            r_low, r_high = plan.round_bounds
+            keep = np.ones(len(round_nums), dtype=bool)
+            if r_low is not None:
+                keep &= round_nums >= r_low
+            if r_high is not None:
+                keep &= round_nums <= r_high
+            first, last = (int(starts[keep].min()), int(ends[keep].max())) if keep.any() else (1, 0)
+            low = first if low is None else max(low, first)
+            high = last if high is None else min(high, last)
+        if low is not None or high is not None:
+            tick_range = (None if low is None else int(np.ceil(low)), None if high is None else int(np.floor(high)))
+        if needs_round and 'tick' not in wanted:
+            wanted.append('tick')
+
+    env: Dict[str, Any] = dict(columnar.load_table(
+        demo['demo_id'], plan.table, wanted, plan.resolution if plan.table == 'ticks' else None, tick_range
+    ))
+    n_rows = columnar.table_length(env)
+    if needs_round and 'tick' in env:
+        round_nums, starts, ends = round_data
+        idx = artifacts.assign_rounds(env['tick'].astype(np.int64), starts, ends) if len(starts) else np.full(n_rows, -1)
+        env[ROUND_COLUMN] = np.where(idx >= 0, round_nums[np.maximum(idx, 0)] if len(round_nums) else 0, 0)
+    for name in plan.names & set(METADATA_COLUMNS):
+        if name not in env:
+            env[name] = np.full(n_rows, _metadata_value(name, demo.get(name)))
+    return env, n_rows
+
+
+def _metadata_env(demos: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], int]:
+    """The metadata DB as one table"""
+    env = {}
+    for name in METADATA_COLUMNS:
+        values = [demo.get(name) for demo in demos]
+        if name not in METADATA_TEXT_COLUMNS and all(v is None or isinstance(v, (int, float)) for v in values):
+            env[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            if not np.isnan(env[name]).any() and all(isinstance(v, int) for v in values):
+                env[name] = env[name].astype(np.int64)
+        else:
+            env[name] = np.array(['' if v is None else str(v) for v in values])
+    return env, len(demos)
+
+
+def _scan(plan: _Plan, env: Dict[str, Any], n_rows: int, columns: List[str]) -> Dict[str, Any]:
+    """Filter one partition, then either reduce it per group or keep its first/top rows"""
+    mask = np.ones(n_rows, dtype=bool)
+    if plan.where is not None:
+        mask = np.broadcast_to(np.asarray(evaluate(plan.where, env), dtype=bool), (n_rows,))
+    matched = int(mask.sum())
+
+    if plan.aggregates or plan.group_by:
+        return {"groups": _reduce(plan, env, mask, n_rows), "scanned": n_rows, "matched": matched}
+
+    rows = np.flatnonzero(mask)
+    if plan.order_by:
+        # Top rows of this demo only; the merged result keeps the overall top
+        keys = []
+        for key in reversed(plan.order_by):
+            values = np.asarray(env[key.lstrip('-')])[rows]
+            if key.startswith('-'):
+                if values.dtype.kind == 'f':
+                    values = -values
+                elif values.dtype.kind in 'biu':
+                    values = -values.astype(np.int64)
+                else:
+                    values = -np.unique(values, return_inverse=True)[1]
+            keys.append(values)
+        rows = rows[np.lexsort(keys)]
+    rows = rows[:plan.limit]
+    table = {name: np.asarray(env[name])[rows] for name in columns}
+    return {"rows": columnar.to_rows(table), "scanned": n_rows, "matched": matched}
+
+
+def _reduce(plan: _Plan, env: Dict[str, Any], mask: np.ndarray, n_rows: int) -> Dict[tuple, List[List[float]]]:
+    """Per-group partial aggregates [count, sum, min, max] of one partition"""
+    if not mask.any():
+        return {}
+    codes = np.zeros(int(mask.sum()), dtype=np.int64)
+    for name in plan.group_by:
+        values, inverse = np.unique(np.broadcast_to(np.asarray(env[name]), (n_rows,))[mask], return_inverse=True)
+        codes = codes * len(values) + inverse
+    groups, first, group_idx = np.unique(codes, return_index=True, return_inverse=True)
+    n_groups = len(groups)
+
+    states = []
+    for fn, arg in plan.aggregates.values():
+        if arg is None:
+            count = np.bincount(group_idx, minlength=n_groups).astype(np.float64)
+            states.append((count, count, np.zeros(n_groups), np.zeros(n_groups)))
+            continue
+        values = np.asarray(evaluate(arg, env))
+        if values.dtype.kind not in 'biuf':
+            raise QueryError(f"Cannot aggregate {fn}({ast.unparse(arg)}) (not a number)")
+        values = np.broadcast_to(values.astype(np.float64), (n_rows,))[mask]
+        present = ~np.isnan(values)
+        clean = np.where(present, values, 0.0)
+        count = np.bincount(group_idx, weights=present, minlength=n_groups)
+        total = np.bincount(group_idx, weights=clean, minlength=n_groups)
+        low = np.full(n_groups, np.inf)
+        high = np.full(n_groups, -np.inf)
+        np.minimum.at(low, group_idx[present], values[present])
+        np.maximum.at(high, group_idx[present], values[present])
+        states.append((count, total, low, high))
+
+    # Key values of each group, from the first row of the group
+    masked_keys = [np.broadcast_to(np.asarray(env[name]), (n_rows,))[mask][first].tolist() for name in plan.group_by]
+    result = {}
+    for g in range(n_groups):
+        key = tuple(column[g] for column in masked_keys)
+        result[key] = [[float(s[0][g]), float(s[1][g]), float(s[2][g]), float(s[3][g])] for s in states]
+    return result
+
+
+def _merge_groups(target: Dict[tuple, List[List[float]]], partial: Dict[tuple, List[List[float]]]):
+    """Fold one partition's group states into the running result"""
+    for key, states in partial.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = states
+            continue
+        for mine, theirs in zip(current, states):
+            mine[0] += theirs[0]
+            mine[1] += theirs[1]
+            mine[2] = min(mine[2], theirs[2])
+            mine[3] = max(mine[3], theirs[3])
+
+
+def _finish(fn: str, state: List[float]) -> Any:
+    count, total, low, high = state
+    if fn == "count":
+        return int(count)
+    if fn == "sum":
+        return total
+    if fn == "mean":
+        return total / count if count else None
+    if fn == "min":
+        return low if count else None
+    return high if count else None
+
+
+def _order(rows: List[Dict[str, Any]], order_by: List[str]) -> List[Dict[str, Any]]:
+    """Sort result rows by output columns ('-name' for descending), missing values last"""
+    for key in reversed(order_by):
+        name = key.lstrip('-')
+        present = [r for r in rows if r.get(name) is not None]
+        missing = [r for r in rows if r.get(name) is None]
+        rows = sorted(present, key=lambda r: r[name], reverse=key.startswith('-')) + missing
+    return rows
+
+
+def run_query(
+    table: str,
+    where: Optional[str] = None,
+    select: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    aggregates: Optional[Dict[str, str]] = None,
+    order_by: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    demo_ids: Optional[List[str]] = None,
+    resolution: str = "full",
+    timeout_s: float = QUERY_TIMEOUT_S
+) -> Dict[str, Any]:
+    """
+    Run an analytical query over every demo (or demo_ids)
+
+    Args:
+        table: Columnar table name (e.g. "kills", "ticks") or "demos" for the metadata DB
+        where: Optional filter expression
+        select: Columns of the returned rows (default: every table column)
+        group_by: Columns to group by
+        aggregates: Output name -> aggregate, e.g. {"kills": "count()", "adr": "mean(damage)"}
+        order_by: Output columns to sort by, "-name" for descending
+        limit: Most rows returned (capped at QUERY_MAX_ROWS)
+        demo_ids: Demos to scan, None for the whole library
+        resolution: Ticks resolution for table "ticks"
+        timeout_s: Time limit for the whole query
+
+    Returns:
+        Dict with rows, truncated, errors (demos that could not be scanned)
+        and stats (demos scanned/pruned, rows scanned/matched, elapsed ms)
+
+    Raises:
+        QueryError: Invalid query
+        QueryTimeout: The scan did not finish within timeout_s
+    """
+    started = time.perf_counter()
+    plan = _Plan(table, where, select, group_by, aggregates, order_by, limit, resolution)
+    demos = database.get_all_demos()
+    if demo_ids is not None:
+        wanted = set(demo_ids)
+        demos = [d for d in demos if d['demo_id'] in wanted]
+    stats = {"demosScanned": 0, "demosPruned": 0, "rowsScanned": 0, "rowsMatched": 0}
+    errors: List[Dict[str, str]] = []
+    partials: List[Dict[str, Any]] = []
+
+    if table == METADATA_TABLE:
+        env, n_rows = _metadata_env(demos)
+        columns = plan.select or list(METADATA_COLUMNS)
+        partials.append(_scan(plan, env, n_rows, columns))
+        stats["demosScanned"] = len(demos)
+    else:
+        # Demo pruning on metadata-only conjuncts
+        candidates = []
+        for demo in demos:
+            meta_env = {name: _metadata_value(name, demo.get(name)) for name in METADATA_COLUMNS}
+            if all(bool(np.all(evaluate(term, meta_env))) for term in plan.demo_terms):
+                candidates.append(demo)
+        stats["demosPruned"] = len(demos) - len(candidates)
+
+        cancelled = threading.Event()
+
+        def scan_demo(demo: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            if cancelled.is_set():
+                return None
+            demo_id = demo['demo_id']
+            if not columnar.has_columns(demo_id):
+                return {"error": {"demo_id": demo_id, "error": f"Demo artifacts are not built yet: {demo_id}"}}
+            if not columnar.table_path(demo_id, table).exists():
+                return {"error": {"demo_id": demo_id, "error": f"Demo has no table {table}"}}
+            schema = columnar.load_schema(demo_id, table)
+            virtual = set(METADATA_COLUMNS) | ({ROUND_COLUMN} if 'tick' in schema else set())
+            missing = sorted(plan.names - set(schema) - virtual)
+            if missing:
+                return {"error": {"demo_id": demo_id, "error": f"Table {table} has no column {', '.join(missing)}"}}
+            env, n_rows = _env(plan, demo, schema)
+            if cancelled.is_set():
+                return None
+            columns = plan.select or list(schema) + [k.lstrip('-') for k in plan.order_by if k.lstrip('-') not in schema]
+            return _scan(plan, env, n_rows, columns)
+
+        pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+        try:
+            futures = [pool.submit(scan_demo, demo) for demo in candidates]
+            remaining = timeout_s - (time.perf_counter() - started)
+            done, pending = wait(futures, timeout=max(remaining, 0), return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            if pending:
+                raise QueryTimeout(f"Query timed out after {timeout_s:g}s")
+        finally:
+            cancelled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        for future in futures:
+            result = future.result()
+            if result is None:
+                continue
+            if "error" in result:
+                errors.append(result["error"])
+                continue
+            stats["demosScanned"] += 1
+            partials.append(result)
+
+    for partial in partials:
+        stats["rowsScanned"] += partial["scanned"]
+        stats["rowsMatched"] += partial["matched"]
+
+    if plan.aggregates or plan.group_by:
+        groups: Dict[tuple, List[List[float]]] = {}
+        for partial in partials:
+            _merge_groups(groups, partial["groups"])
+        rows = [
+            {**dict(zip(plan.group_by, key)),
+             **{alias: _finish(fn, state) for (alias, (fn, _)), state in zip(plan.aggregates.items(), states)}}
+            for key, states in groups.items()
+        ]
+    else:
+        rows = [row for partial in partials for row in partial["rows"]]
+
+    rows = _order(rows, plan.order_by) if plan.order_by else rows
+    truncated = len(rows) > plan.limit
+    stats["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return {"rows": rows[:plan.limit], "truncated": truncated, "errors": errors, "stats": stats}
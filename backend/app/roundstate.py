@@ -0,0 +1,160 @@
+"""
+Round state queries
+
+Answers "what was the situation at tick t" (alive players per side, HP
+and equipment of the living, bomb state, time left) from the change-point
+timeline built at ingest (artifacts.build_round_state): the state at a
+tick is the last change-point at or before it, found by binary search,
+so advantage and clutch analyses never rescan the tick table.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app import artifacts, columnar, metrics
+from app.config import ROUND_STATE_CACHE_SIZE
+
+# LRU cache of loaded timelines: demo_id -> arrays
+_cache: "OrderedDict[str, Dict[str, np.ndarray]]" = OrderedDict()
+_cache_lock = threading.Lock()
+metrics.register_cache("round_state")
+
+
+def load_timeline(demo_id: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Round state timeline of a demo through the LRU cache
+
+    Demos ingested before the timeline existed get it built on first use.
+    Returns None if the demo has no rounds or ticks to derive it from.
+    """
+    with _cache_lock:
+        timeline = _cache.get(demo_id)
+        if timeline is not None:
+            _cache.move_to_end(demo_id)
+    metrics.record_cache("round_state", timeline is not None)
+    if timeline is not None:
+        return timeline
+
+    path = artifacts.round_state_path(demo_id)
+    if not path.exists():
+        artifacts.build_round_state(demo_id)
+        if not path.exists():
+            return None
+    with np.load(path, allow_pickle=False) as npz:
+        timeline = {name: npz[name] for name in npz.files}
+
+    if ROUND_STATE_CACHE_SIZE > 0:
+        with _cache_lock:
+            _cache[demo_id] = timeline
+            while len(_cache) > ROUND_STATE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return timeline
+
+
+def evict_demo(demo_id: str):
+    """Drop the cached timeline of a demo"""
+    with _cache_lock:
+        _cache.pop(demo_id, None)
+
+
+def _state(timeline: Dict[str, np.ndarray], i: int, tick: int) -> Dict[str, Any]:
+    """Change-point i of a timeline as the state at a tick"""
+    site = int(timeline['bombSite'][i])
+    ct_alive, t_alive = int(timeline['ctAlive'][i]), int(timeline['tAlive'][i])
+    return {
+        "tick": tick,
+        "roundNum": int(timeline['roundNum'][i]),
+        "alive": {"CT": ct_alive, "T": t_alive},
+        "hp": {"CT": int(timeline['ctHp'][i]), "T": int(timeline['tHp'][i])},
+        "equipmentValue": {"CT": int(timeline['ctEquipment'][i]), "T": int(timeline['tEquipment'][i])},
+        "advantage": ct_alive - t_alive,  # Positive: CT up players
+        "bomb": artifacts.BOMB_STATES[int(timeline['bomb'][i])],
+        "bombSite": (str(timeline['bombSites'][site]) or None) if site >= 0 else None,
+        "timeRemaining": round(max(int(timeline['deadline'][i]) - tick, 0) / float(timeline['tick_rate']), 2),
+    }
+
+
+def states_at(demo_id: str, ticks: List[int]) -> Optional[List[Optional[Dict[str, Any]]]]:
+    """
+    State of the round at each tick
+
+    Returns:
+        One state per tick (None for ticks outside every round), or None
+        if the demo has no timeline
+    """
+    timeline = load_timeline(demo_id)
+    if timeline is None:
+        return None
+    queried = np.asarray(ticks, dtype=np.int64)
+    points = np.searchsorted(timeline['tick'], queried, side='right') - 1
+    round_idx = np.searchsorted(timeline['rounds_startTick'], queried, side='right') - 1
+    states = []
+    for tick, i, r in zip(queried.tolist(), points.tolist(), round_idx.tolist()):
+        inside = (i >= 0 and r >= 0 and tick <= timeline['rounds_endTick'][r]
+                  and timeline['roundNum'][i] == timeline['rounds_roundNum'][r])
+        states.append(_state(timeline, i, tick) if inside else None)
+    return states
+
+
+def round_timeline(demo_id: str, round_num: int) -> Optional[List[Dict[str, Any]]]:
+    """Every change-point of a round (None if the round has no timeline)"""
+    timeline = load_timeline(demo_id)
+    if timeline is None:
+        return None
+    rows = np.flatnonzero(timeline['roundNum'] == round_num)
+    if not len(rows):
+        return None
+    return [_state(timeline, i, int(timeline['tick'][i])) for i in rows.tolist()]
+
+
+def round_summaries(demo_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Man-advantage time and clutch situation of every round
+
+    Advantage seconds count the time each side spent with more players
+    alive (and with even numbers) between change-points. A clutch is the
+    first moment one side is down to its last player with opponents still
+    alive; it is won if that side wins the round.
+    """
+    timeline = load_timeline(demo_id)
+    if timeline is None:
+        return None
+    rounds = columnar.load_table(demo_id, 'rounds', ['roundNum', 'winnerSide'])
+    winners = dict(zip(rounds['roundNum'].astype(np.int64).tolist(), rounds['winnerSide'].tolist())) \
+        if 'winnerSide' in rounds else {}
+    tick_rate = float(timeline['tick_rate'])
+
+    summaries = []
+    for round_num, end_tick in zip(timeline['rounds_roundNum'].tolist(), timeline['rounds_endTick'].tolist()):
+        rows = np.flatnonzero(timeline['roundNum'] == round_num)
+        if not len(rows):
+            continue
+        ticks = timeline['tick'][rows]
+        durations = np.diff(np.append(ticks, end_tick)) / tick_rate
+        advantage = timeline['ctAlive'][rows] - timeline['tAlive'][rows]
+
+        clutch = None
+        for side, own, other in (("CT", 'ctAlive', 'tAlive'), ("T", 'tAlive', 'ctAlive')):
+            last_one = np.flatnonzero((timeline[own][rows] == 1) & (timeline[other][rows] > 0))
+            if len(last_one) and (clutch is None or ticks[last_one[0]] < clutch["tick"]):
+                i = rows[last_one[0]]
+                clutch = {
+                    "side": side,
+                    "tick": int(timeline['tick'][i]),
+                    "opponents": int(timeline[other][i]),
+                    "won": winners.get(round_num) == side,
+                }
+        summaries.append({
+            "roundNum": round_num,
+            "winnerSide": winners.get(round_num) or None,
+            "advantageSeconds": {
+                "CT": round(float(durations[advantage > 0].sum()), 2),
+                "T": round(float(durations[advantage < 0].sum()), 2),
+                "even": round(float(durations[advantage == 0].sum()), 2),
+            },
+            "clutch": clutch,
+        })
+    return summaries
@@ -0,0 +1,231 @@
+"""
+Region queries over the spatial index
+
+Answers "which ticks/kills/grenades/smokes fall inside this area" from the
+grid-bucket index built at ingest (artifacts.build_spatial_index) instead
+of scanning whole tables: the bounding box of the region selects a few
+contiguous slices of the index, and only those candidates are tested
+exactly against the polygon or circle.
+
+A region is a polygon (3+ points), a segment (2 points) or a point, with
+an optional radius: a position matches if it lies inside the polygon or
+within radius of its outline.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import artifacts, columnar, metrics
+from app.config import SPATIAL_CACHE_SIZE
+
+# Side column of each indexed table (None: the table has no side)
+SIDE_FIELDS = artifacts.SPATIAL_SIDE_FIELDS
+
+# LRU cache of loaded indexes: (demo_id, table) -> arrays
+_cache: "OrderedDict[Tuple[str, str], Dict[str, np.ndarray]]" = OrderedDict()
+_cache_lock = threading.Lock()
+metrics.register_cache("spatial_index")
+
+
+def load_index(demo_id: str, table: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Spatial index of a table through the LRU cache
+
+    Demos ingested before the index existed (or with an older index
+    layout) get it built on first use. Returns None if the table has no
+    positions.
+    """
+    key = (demo_id, table)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+    metrics.record_cache("spatial_index", index is not None)
+    if index is not None:
+        return index
+
+    path = artifacts.spatial_index_path(demo_id, table)
+    index = _read_index(path)
+    if index is None or int(index.get('version', 1)) != artifacts.SPATIAL_INDEX_VERSION:
+        artifacts.build_spatial_index(demo_id)
+        index = _read_index(path)
+        if index is None:
+            return None
+
+    if SPATIAL_CACHE_SIZE > 0:
+        with _cache_lock:
+            _cache[key] = index
+            while len(_cache) > SPATIAL_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return index
+
+
+def _read_index(path) -> Optional[Dict[str, np.ndarray]]:
+    """Arrays of an index file, None if it does not exist"""
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def evict_demo(demo_id: str):
+    """Drop every cached index of a demo"""
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == demo_id]:
+            del _cache[key]
+
+
+def candidates(index: Dict[str, np.ndarray], min_x: float, min_y: float,
+               max_x: float, max_y: float) -> np.ndarray:
+    """Positions (into the sorted index arrays) of every row in the cells overlapping a box"""
+    cell_size = float(index['cell_size'])
+    origin_x, origin_y = index['origin']
+    n_cols, n_rows = (int(n) for n in index['shape'])
+    col_lo = max(int((min_x - origin_x) // cell_size), 0)
+    col_hi = min(int((max_x - origin_x) // cell_size), n_cols - 1)
+    row_lo = max(int((min_y - origin_y) // cell_size), 0)
+    row_hi = min(int((max_y - origin_y) // cell_size), n_rows - 1)
+    if col_lo > col_hi or row_lo > row_hi:
+        return np.array([], dtype=np.int64)
+
+    # Cells are row-major, so each grid row of the box is one contiguous slice
+    first_cells = np.arange(row_lo, row_hi + 1) * n_cols + col_lo
+    starts = index['cell_starts'][first_cells]
+    ends = index['cell_starts'][first_cells + (col_hi - col_lo + 1)]
+    lengths = ends - starts
+    if not lengths.sum():
+        return np.array([], dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def points_in_polygon(xs: np.ndarray, ys: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd rule point-in-polygon test, vectorized over the points"""
+    inside = np.zeros(len(xs), dtype=bool)
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        crosses = (y1 > ys) != (y2 > ys)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (xs < x_at)
+        x1, y1 = x2, y2
+    return inside
+
+
+def distance_to_outline(xs: np.ndarray, ys: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Distance of every position to a point, segment or closed polygon outline"""
+    if len(points) == 1:
+        return np.hypot(xs - points[0, 0], ys - points[0, 1])
+    segments = zip(points, points[1:]) if len(points) == 2 else zip(points, np.roll(points, -1, axis=0))
+    best = np.full(len(xs), np.inf)
+    for (ax, ay), (bx, by) in segments:
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        t = np.clip(((xs - ax) * dx + (ys - ay) * dy) / length_sq, 0, 1) if length_sq else 0.0
+        best = np.minimum(best, np.hypot(xs - (ax + t * dx), ys - (ay + t * dy)))
+    return best
+
+
+def region_mask(xs: np.ndarray, ys: np.ndarray, points: np.ndarray, radius: float) -> np.ndarray:
+    """Positions inside the polygon (3+ points) or within radius of its outline"""
+    match = points_in_polygon(xs, ys, points) if len(points) >= 3 else np.zeros(len(xs), dtype=bool)
+    if radius > 0:
+        match |= distance_to_outline(xs, ys, points) <= radius
+    return match
+
+
+def query_region(
+    demo_id: str,
+    table: str,
+    points: Sequence[Sequence[float]],
+    radius: float = 0.0,
+    rounds: Optional[List[int]] = None,
+    side: Optional[str] = None,
+    tick_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    limit: int = 1000
+) -> Dict[str, Any]:
+    """
+    Rows of a table whose position falls in a region
+
+    Args:
+        demo_id: Demo to query
+        table: "ticks", "kills" (victim position), "grenades" or "smokes"
+        points: Region outline in world coordinates [[x, y], ...]
+        radius: Buffer around the outline in game units (required for 1-2 points)
+        rounds: Round numbers to include (live time only), None for all
+        side: "CT" or "T" to keep one side, None for both
+        tick_range: Optional (first, last) tick bounds, either may be None
+        limit: Most event rows returned
+
+    Ticks only count samples of living players.
+
+    Returns:
+        Dict with count, bySide and byRound; ticks also get time spent in the
+        region per side and player, event tables the matching rows
+    """
+    result = {"table": table, "count": 0, "bySide": {}, "byRound": {}}
+    index = load_index(demo_id, table)
+    if index is None:
+        return result
+
+    outline = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    (min_x, min_y), (max_x, max_y) = outline.min(axis=0) - radius, outline.max(axis=0) + radius
+    found = candidates(index, min_x, min_y, max_x, max_y)
+    found = found[region_mask(index['x'][found], index['y'][found], outline, radius)]
+    ticks = index['tick'][found]
+
+    if tick_range is not None:
+        first, last = tick_range
+        keep = np.ones(len(found), dtype=bool)
+        if first is not None:
+            keep &= ticks >= first
+        if last is not None:
+            keep &= ticks <= last
+        found, ticks = found[keep], ticks[keep]
+
+    round_nums, starts, ends = artifacts.round_live_ranges(columnar.load_table(demo_id, 'rounds'))
+    round_idx = artifacts.assign_rounds(ticks, starts, ends) if len(starts) else np.full(len(ticks), -1)
+    if rounds:
+        keep = (round_idx >= 0) & np.isin(round_nums[np.maximum(round_idx, 0)], rounds)
+        found, ticks, round_idx = found[keep], ticks[keep], round_idx[keep]
+
+    sides = index['side_names'][index['side_codes'][found]] if 'side_codes' in index else None
+    if sides is not None and side:
+        keep = sides == side
+        found, ticks, round_idx, sides = found[keep], ticks[keep], round_idx[keep], sides[keep]
+
+    # Back to table rows, in tick order
+    order = np.argsort(ticks, kind='stable')
+    found, ticks, round_idx = found[order], ticks[order], round_idx[order]
+    sides = sides[order] if sides is not None else None
+    rows = index['rows'][found]
+
+    in_round = round_idx >= 0
+    round_values, round_counts = np.unique(round_nums[round_idx[in_round]], return_counts=True)
+    result["count"] = int(len(rows))
+    result["byRound"] = {str(r): int(c) for r, c in zip(round_values, round_counts)}
+    if sides is not None:
+        side_values, side_counts = np.unique(sides, return_counts=True)
+        result["bySide"] = {str(s): {"count": int(c)} for s, c in zip(side_values, side_counts)}
+
+    if table == "ticks":
+        # Every sample stands for one sampling interval of presence
+        tick_rate = columnar.load_header(demo_id).get('tickRate') or 64
+        sample_seconds = float(index['sample_interval']) / tick_rate
+        for data in result["bySide"].values():
+            data["seconds"] = round(data["count"] * sample_seconds, 2)
+        if 'player_codes' in index:
+            codes, counts = np.unique(index['player_codes'][found], return_counts=True)
+            result["byPlayer"] = {
+                str(index['player_names'][code]): round(int(c) * sample_seconds, 2) for code, c in zip(codes, counts)
+            }
+        result["sampleSeconds"] = sample_seconds
+    else:
+        selected = rows[:limit]
+        table_data = columnar.load_table(demo_id, table)
+        result["rows"] = columnar.to_rows({name: values[selected] for name, values in table_data.items()})
+        result["truncated"] = len(rows) > limit
+    return result
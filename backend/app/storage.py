@@ -0,0 +1,82 @@
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict
+
+from app import metrics
+from app.config import DEMOS_DIR, ARTIFACTS_DIR, DEMO_CACHE_SIZE
+
+# LRU cache of parsed demos, shared by all request threads
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+metrics.register_cache("demo_json")
+
+
+def demo_path(demo_id: str) -> Path:
+    """Path of the raw parser JSON for a demo"""
+    return DEMOS_DIR / f"{demo_id}.json"
+
+
+def artifact_dir(demo_id: str) -> Path:
+    """Directory holding the derived artifacts of a demo"""
+    return ARTIFACTS_DIR / demo_id
+
+
+def write_demo_json(demo_id: str, json_data: str) -> Path:
+    """Write the serialized parser JSON for a demo"""
+    file_path = demo_path(demo_id)
+    with metrics.STORAGE_SECONDS.time(op="write_demo"):
+        with open(file_path, 'w') as f:
+            written = f.write(json_data)
+    metrics.STORAGE_BYTES_WRITTEN.inc(written, kind="demo_json")
+    return file_path
+
+
+def read_demo(demo_id: str) -> Dict[str, Any]:
+    """Load the raw parser JSON for a demo"""
+    with metrics.STORAGE_SECONDS.time(op="read_demo"):
+        with open(demo_path(demo_id), 'rb') as f:
+            raw = f.read()
+    metrics.STORAGE_BYTES_READ.inc(len(raw), kind="demo_json")
+    with metrics.JSON_SECONDS.time(op="load"):
+        return json.loads(raw)
+
+
+def read_demo_cached(demo_id: str) -> Dict[str, Any]:
+    """
+    Load the raw parser JSON for a demo through the in-memory LRU cache
+    
+    The returned dict is shared between callers and must not be mutated.
+    """
+    with _cache_lock:
+        data = _cache.get(demo_id)
+        if data is not None:
+            _cache.move_to_end(demo_id)
+    metrics.record_cache("demo_json", data is not None)
+    if data is not None:
+        return data
+
+    data = read_demo(demo_id)
+
+    if DEMO_CACHE_SIZE > 0:
+        with _cache_lock:
+            _cache[demo_id] = data
+            _cache.move_to_end(demo_id)
+            while len(_cache) > DEMO_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return data
+
+
+def evict_cached(demo_id: str):
+    """Drop a demo from the in-memory cache"""
+    with _cache_lock:
+        _cache.pop(demo_id, None)
+
+
+def delete_demo_files(demo_id: str):
+    """Remove the raw JSON and every derived artifact of a demo"""
+    evict_cached(demo_id)
+    demo_path(demo_id).unlink(missing_ok=True)
+    shutil.rmtree(artifact_dir(demo_id), ignore_errors=True)
@@ -0,0 +1,305 @@
+"""
+Delta + zigzag varint codec for the ticks table
+
+Consecutive samples of one player barely change, so every column of the
+ticks table is stored as per-player deltas instead of full values:
+
+- rows are cut into blocks at round starts; each block decodes on its own,
+  so reading a round touches only that round's bytes
+- within a block, rows are grouped by player (stream order) and each
+  value is stored as the zigzag varint of its difference to the previous
+  sample of the same player; a player's first value in a block is stored
+  as is
+- tick and player are stored in row (tick) order, the tick as deltas and
+  the player as a slot into the table's list of steam ids, which is also
+  what restores the row order of every other column
+- floats are quantized to TICK_FLOAT_DECIMALS decimals (missing values
+  get a null bitmap) and booleans are bit-packed
+- tables are saved uncompressed, so decoding a block range reads only
+  those bytes of each array from the file (read_slice)
+
+Encoding and decoding are vectorized: varints are split into per-byte
+passes over all values, and per-player running sums are one cumsum.
+"""
+
+import json
+import struct
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import TICK_FLOAT_DECIMALS
+
+CODEC_KEY = "__codec__"
+BLOCK_ROWS_KEY = "__block_rows"
+BLOCK_TICKS_KEY = "__block_ticks"
+PLAYERS_SUFFIX = "__players"
+BYTES_SUFFIX = "__bytes"
+OFFSETS_SUFFIX = "__offsets"
+BITS_SUFFIX = "__bits"
+NULLS_SUFFIX = "__nulls"
+PLAYER_FIELD = "steamId"
+MAX_VARINT_BYTES = 10
+
+
+def read_slice(npz, name: str, start: int, stop: int) -> np.ndarray:
+    """
+    Elements [start, stop) of a 1-d array of an open .npz, read from the file
+
+    Stored (uncompressed) members are read in place: only the npy header
+    and the requested bytes, never the whole array. Compressed members fall
+    back to loading the array.
+    """
+    info = npz.zip.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return npz[name][start:stop]
+    fp = npz.zip.fp
+    fp.seek(info.header_offset)
+    name_length, extra_length = struct.unpack("<HH", fp.read(30)[26:30])
+    fp.seek(info.header_offset + 30 + name_length + extra_length)
+    version = np.lib.format.read_magic(fp)
+    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, _, dtype = read_header(fp)
+    start, stop = max(start, 0), max(min(stop, shape[0]), start)
+    fp.seek(fp.tell() + start * dtype.itemsize)
+    values = np.empty(stop - start, dtype=dtype)
+    fp.readinto(memoryview(values).cast("B"))
+    return values
+
+
+def zigzag_encode(values: np.ndarray) -> np.ndarray:
+    """Map signed integers to unsigned ones with small magnitudes first (0, -1, 1, -2, ...)"""
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def zigzag_decode(values: np.ndarray) -> np.ndarray:
+    """Inverse of zigzag_encode"""
+    values = values.astype(np.uint64)
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def varint_lengths(values: np.ndarray) -> np.ndarray:
+    """Encoded size in bytes of every unsigned value (7 bits per byte)"""
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, MAX_VARINT_BYTES):
+        lengths += values >= np.uint64(1) << np.uint64(7 * k)
+    return lengths
+
+
+def varint_encode(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    LEB128-encode unsigned integers
+
+    Returns:
+        Tuple (bytes as uint8, encoded length of every value)
+    """
+    values = values.astype(np.uint64)
+    lengths = varint_lengths(values)
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max()) if len(values) else 0):
+        has_byte = lengths > k
+        chunk = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (lengths[has_byte] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has_byte] + k] = (chunk | more).astype(np.uint8)
+    return out, lengths
+
+
+def varint_decode(data: np.ndarray) -> np.ndarray:
+    """Decode a buffer of LEB128 varints into uint64 values"""
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == len(data):
+        # Every value fits in one byte
+        return data.astype(np.uint64)
+    starts = np.empty(len(ends), dtype=np.int64)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    # The 7-bit groups of one value never overlap, so a segmented sum joins them
+    positions = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    groups = (data & 0x7F).astype(np.uint64) << (positions * 7).astype(np.uint64)
+    return np.add.reduceat(groups, starts)
+
+
+def _run_starts(*keys: np.ndarray) -> np.ndarray:
+    """Indices where any of the keys changes (always including 0)"""
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    change[:1] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _deltas(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Differences to the previous value, restarting (value kept as is) at every run start"""
+    deltas = values.copy()
+    deltas[1:] -= values[:-1]
+    deltas[starts] = values[starts]
+    return deltas
+
+
+def _undelta(deltas: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Inverse of _deltas: running sums restarting at every run start"""
+    if not len(deltas):
+        return deltas
+    totals = np.cumsum(deltas)
+    bases = totals[starts] - deltas[starts]
+    return totals - np.repeat(bases, np.diff(np.append(starts, len(deltas))))
+
+
+def _stream_order(slots: np.ndarray, blocks: np.ndarray) -> np.ndarray:
+    """Row permutation grouping rows by block, then player, keeping tick order (stable)"""
+    return np.lexsort((slots, blocks))
+
+
+def _quantize(values: np.ndarray, decimals: int) -> np.ndarray:
+    """Floats as integers in units of 10^-decimals (missing values become 0)"""
+    return np.rint(np.nan_to_num(values, nan=0.0) * 10 ** decimals).astype(np.int64)
+
+
+def can_encode(arrays: Dict[str, np.ndarray], schema: Dict[str, str]) -> bool:
+    """Whether a table has the integer tick and player columns the codec needs"""
+    return schema.get('tick') == "int" and schema.get(PLAYER_FIELD) == "int" and len(arrays['tick']) > 0
+
+
+def encode_table(arrays: Dict[str, np.ndarray], schema: Dict[str, str],
+                 block_ticks: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Encode the arrays of a tick-sorted table (as built by columnar.to_columns)
+
+    Args:
+        arrays: Field arrays, string fields as dictionary codes
+        schema: Field kinds
+        block_ticks: First tick of every block (e.g. round start ticks)
+
+    Returns:
+        Arrays to store in place of the plain ones (dictionaries kept as is)
+    """
+    ticks = arrays['tick']
+    n_rows = len(ticks)
+    block_ticks = np.unique(np.asarray(block_ticks, dtype=np.int64))
+    block_ticks = block_ticks[block_ticks > ticks[0]]
+    block_ticks = np.concatenate([[ticks[0]], block_ticks])
+    block_rows = np.append(np.searchsorted(ticks, block_ticks, side='left'), n_rows)
+    block_rows[0] = 0
+    blocks = np.repeat(np.arange(len(block_ticks)), np.diff(block_rows))
+
+    players, slots = np.unique(arrays[PLAYER_FIELD], return_inverse=True)
+    order = _stream_order(slots, blocks)
+    stream_starts = _run_starts(blocks[order], slots[order])
+
+    out = {
+        BLOCK_ROWS_KEY: block_rows,
+        BLOCK_TICKS_KEY: block_ticks,
+        PLAYER_FIELD + PLAYERS_SUFFIX: players,
+    }
+    codec = {"version": 1, "fields": {}, "decimals": TICK_FLOAT_DECIMALS}
+
+    def store_varints(field: str, values: np.ndarray):
+        data, lengths = varint_encode(zigzag_encode(values))
+        byte_ends = np.cumsum(lengths)
+        out[field + BYTES_SUFFIX] = data
+        out[field + OFFSETS_SUFFIX] = np.concatenate([[0], byte_ends])[block_rows]
+
+    # Row order columns: tick deltas restart at each block, players as slots
+    store_varints('tick', _deltas(ticks.astype(np.int64), block_rows[:-1][np.diff(block_rows) > 0]))
+    store_varints(PLAYER_FIELD, slots.astype(np.int64))
+    codec["fields"]['tick'] = codec["fields"][PLAYER_FIELD] = "rows"
+
+    for field, kind in schema.items():
+        if field in ('tick', PLAYER_FIELD):
+            continue
+        values = arrays[field]
+        if kind == "bool":
+            out[field + BITS_SUFFIX] = np.packbits(values)
+            codec["fields"][field] = "bits"
+            continue
+        if kind == "float":
+            missing = np.isnan(values)
+            if missing.any():
+                out[field + NULLS_SUFFIX] = np.packbits(missing)
+            values = _quantize(values, TICK_FLOAT_DECIMALS)
+        store_varints(field, _deltas(values.astype(np.int64)[order], stream_starts))
+        codec["fields"][field] = "delta"
+
+    out[CODEC_KEY] = np.array(json.dumps(codec))
+    return out
+
+
+def block_span(npz, tick_range: Optional[Tuple[Optional[int], Optional[int]]]) -> Tuple[int, int]:
+    """Blocks [first, last) covering a (first tick, last tick) range, all blocks for None"""
+    block_ticks = npz[BLOCK_TICKS_KEY]
+    if tick_range is None:
+        return 0, len(block_ticks)
+    first_tick, last_tick = tick_range
+    first = 0 if first_tick is None else max(int(np.searchsorted(block_ticks, first_tick, side='right')) - 1, 0)
+    last = len(block_ticks) if last_tick is None else int(np.searchsorted(block_ticks, last_tick, side='right'))
+    return first, max(last, first)
+
+
+def decode_table(npz, schema: Dict[str, str], fields: List[str],
+                 tick_range: Optional[Tuple[Optional[int], Optional[int]]] = None
+                 ) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Decode fields of an encoded table, optionally only the blocks of a tick range
+
+    Returns:
+        Tuple (field -> array with string fields as codes, bytes read from
+        the arrays: block indexes and offsets plus the slices decoded)
+    """
+    codec = json.loads(str(npz[CODEC_KEY]))
+    block_rows = npz[BLOCK_ROWS_KEY]
+    first, last = block_span(npz, tick_range)
+    row_lo, row_hi = int(block_rows[first]), int(block_rows[last])
+    block_lengths = np.diff(block_rows[first:last + 1])
+    read_bytes = block_rows.nbytes + npz[BLOCK_TICKS_KEY].nbytes
+
+    def read(name: str, start: int, stop: int) -> np.ndarray:
+        nonlocal read_bytes
+        values = read_slice(npz, name, start, stop)
+        read_bytes += values.nbytes
+        return values
+
+    def read_varints(field: str) -> np.ndarray:
+        offsets = read(field + OFFSETS_SUFFIX, first, last + 1)
+        return zigzag_decode(varint_decode(read(field + BYTES_SUFFIX, int(offsets[0]), int(offsets[-1]))))
+
+    block_starts = (block_rows[first:last] - row_lo)[block_lengths > 0]
+    ticks = _undelta(read_varints('tick'), block_starts)
+    slots = read_varints(PLAYER_FIELD)
+    blocks = np.repeat(np.arange(first, last), block_lengths)
+    order = _stream_order(slots, blocks)
+    stream_starts = _run_starts(blocks[order], slots[order]) if len(order) else np.array([], np.int64)
+
+    result = {}
+    for field in fields:
+        kind = schema[field]
+        if field == 'tick':
+            result[field] = ticks
+        elif field == PLAYER_FIELD:
+            players = npz[field + PLAYERS_SUFFIX]
+            read_bytes += players.nbytes
+            result[field] = players[slots]
+        elif codec["fields"].get(field) == "bits":
+            chunk = read(field + BITS_SUFFIX, row_lo // 8, (row_hi + 7) // 8)
+            result[field] = np.unpackbits(chunk)[row_lo % 8:row_lo % 8 + row_hi - row_lo].astype(bool)
+        else:
+            values = np.empty(row_hi - row_lo, dtype=np.int64)
+            values[order] = _undelta(read_varints(field), stream_starts)
+            if kind == "float":
+                values = values / 10 ** codec["decimals"]
+                if field + NULLS_SUFFIX in npz.files:
+                    nulls = read(field + NULLS_SUFFIX, row_lo // 8, (row_hi + 7) // 8)
+                    values[np.unpackbits(nulls)[row_lo % 8:row_lo % 8 + row_hi - row_lo].astype(bool)] = np.nan
+            elif kind in ("str", "json"):
+                values = values.astype(np.int32)
+            result[field] = values
+
+    if tick_range is not None:
+        first_tick, last_tick = tick_range
+        lo = 0 if first_tick is None else int(np.searchsorted(ticks, first_tick, side='left'))
+        hi = len(ticks) if last_tick is None else int(np.searchsorted(ticks, last_tick, side='right'))
+        result = {field: values[lo:hi] for field, values in result.items()}
+    return result, read_bytes
@@ -0,0 +1,257 @@
+"""
+Radar + heatmap tile pyramid
+
+Serves XYZ-style PNG tiles (TILE_SIZE px) of a map's radar image, with an
+optional CT/T heatmap of a demo blended on top. Zoom level z splits the
+radar into 2^z x 2^z tiles, so the full image is TILE_SIZE * 2^z px wide
+and x/y count from the top-left corner.
+
+Tiles are rendered on demand and cached on disk under
+TILES_DIR/{map}/{layer}/{z}/{x}/{y}.png. Cache hits refresh the file's
+mtime and the least recently used tiles are deleted once the cache grows
+past TILE_CACHE_MAX_MB. The smoothed density grid behind a heatmap layer
+is kept in memory, so the tiles of one zoom level share a single
+smoothing pass.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app import colormap, density, metrics
+from app.config import (
+    RADAR_DIR,
+    TILES_DIR,
+    TILE_SIZE,
+    TILE_CACHE_MAX_MB,
+    TILE_HEATMAP_ALPHA,
+    HEATMAP_MAX_GRID_SIZE
+)
+from app.maps import get_map_config, grid_transform
+
+RADAR_LAYER = "radar"
+BACKGROUND = (0x1a, 0x1a, 0x1a)
+PNG_COMPRESS_LEVEL = 1
+GRID_CACHE_SIZE = 8  # Smoothed heatmap layers kept in memory (LRU)
+CELL_PIXELS = 4  # Output pixels per density grid cell
+
+metrics.register_cache("tiles")
+
+# LRU cache of normalized smoothed grids: (demo_id, grid_size, side, rounds, bandwidth, level) -> {side: grid}
+_grids: "OrderedDict[Tuple, Dict[str, np.ndarray]]" = OrderedDict()
+_grids_lock = threading.Lock()
+
+# Total size of the disk cache in bytes (None until first scanned)
+_disk_bytes: Optional[int] = None
+_disk_lock = threading.Lock()
+
+
+def radar_path(map_name: str, level: Optional[str] = None) -> Optional[Path]:
+    """Radar image of a map level (None = default), or None if the map, level or image is unknown"""
+    map_config = get_map_config(map_name)
+    if map_config is None:
+        return None
+    levels = {l['name']: l for l in map_config['levels']}
+    if level is not None and level not in levels:
+        return None
+    radar_image = levels[level]['radarImage'] if level else map_config['radarImage']
+    path = RADAR_DIR / Path(radar_image).name
+    return path if path.exists() else None
+
+
+def layer_key(layer: str, side: str, rounds: Optional[List[int]], bandwidth: float,
+              level: Optional[str] = None) -> str:
+    """Cache directory of a layer: "radar[-level]" or "{demo_id}/{hash of the heatmap parameters}" """
+    if layer == RADAR_LAYER:
+        return f"{RADAR_LAYER}-{level}" if level else RADAR_LAYER
+    selected = ','.join(map(str, sorted(set(rounds)))) if rounds else 'all'
+    params = f"{side}|{selected}|{bandwidth:g}|{level or ''}"
+    return f"{layer}/{hashlib.sha1(params.encode()).hexdigest()[:12]}"
+
+
+def tile_path(map_name: str, key: str, z: int, x: int, y: int) -> Path:
+    """Disk cache path of a tile"""
+    return TILES_DIR / map_name / key / str(z) / str(x) / f"{y}.png"
+
+
+@lru_cache(maxsize=4)
+def _radar_zoom(map_name: str, level: Optional[str], z: int) -> np.ndarray:
+    """Radar image scaled to zoom level z, flattened onto the background (RGB floats)"""
+    size = TILE_SIZE * 2 ** z
+    with Image.open(radar_path(map_name, level)) as img:
+        background = Image.new('RGBA', img.size, BACKGROUND + (255,))
+        background.alpha_composite(img.convert('RGBA'))
+        resample = Image.LANCZOS if size < img.size[0] else Image.BICUBIC
+        rgb = background.convert('RGB').resize((size, size), resample)
+    pixels = np.asarray(rgb, dtype=np.float32) / 255
+    pixels.setflags(write=False)
+    return pixels
+
+
+def _heatmap_grids(map_name: str, demo_id: str, z: int, side: str, rounds: Optional[List[int]],
+                   bandwidth: float, level: Optional[str]) -> Dict[str, np.ndarray]:
+    """Normalized smoothed grids of a heatmap layer at zoom level z, through the LRU cache"""
+    grid_size = min(TILE_SIZE * 2 ** z // CELL_PIXELS, HEATMAP_MAX_GRID_SIZE)
+    sides = ["CT", "T"] if side == "both" else [side]
+    key = (demo_id, grid_size, side, tuple(sorted(set(rounds))) if rounds else None, bandwidth, level)
+    with _grids_lock:
+        grids = _grids.get(key)
+        if grids is not None:
+            _grids.move_to_end(key)
+            return grids
+
+    layers = density.density_grids(
+        demo_id, get_map_config(map_name), grid_size, bandwidth, sides, rounds, normalize=True, level=level
+    )
+    grids = {s: layers[s.lower()]["grid"].astype(np.float32) for s in sides}
+
+    with _grids_lock:
+        _grids[key] = grids
+        while len(_grids) > GRID_CACHE_SIZE:
+            _grids.popitem(last=False)
+    return grids
+
+
+def grid_box(map_config: Dict, grid_size: int, z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Area of tile (z, x, y) in density grid cells (left, top, right, bottom)
+
+    Tiles cut up the radar image, which shows the map's radarBounds, while
+    the grid spans the heatmap bounds; the two differ on some maps.
+    """
+    radar = map_config['radarBounds']
+    span = 2 ** z
+    left, right = (radar['minX'] + f * (radar['maxX'] - radar['minX']) for f in (x / span, (x + 1) / span))
+    top, bottom = (radar['maxY'] - f * (radar['maxY'] - radar['minY']) for f in (y / span, (y + 1) / span))
+    col_scale, col_offset, row_scale, row_offset = grid_transform(map_config, grid_size)
+    # Grid rows count down from the top
+    return (left * col_scale + col_offset, grid_size - (top * row_scale + row_offset),
+            right * col_scale + col_offset, grid_size - (bottom * row_scale + row_offset))
+
+
+def _blend(canvas: np.ndarray, grid: np.ndarray, side: str, box: Tuple[float, float, float, float]):
+    """Alpha-blend the part of a density grid inside box (grid cells, see grid_box) into the canvas (in place)"""
+    # Resample from the whole grid so neighbouring tiles line up without seams
+    pixels = np.asarray(Image.fromarray(grid).transform(
+        (TILE_SIZE, TILE_SIZE), Image.EXTENT, box, Image.BICUBIC
+    ))
+    colormap.blend(canvas, pixels, side, TILE_HEATMAP_ALPHA)
+
+
+def render_tile(map_name: str, layer: str, z: int, x: int, y: int, side: str = "both",
+                rounds: Optional[List[int]] = None, bandwidth: float = 0.0,
+                level: Optional[str] = None) -> bytes:
+    """
+    Render one tile as PNG bytes
+
+    Args:
+        map_name: Map whose radar is the background
+        layer: "radar", or a demo id to blend that demo's heatmap on top
+        z, x, y: Tile coordinates (0 <= x, y < 2^z)
+        side: "CT", "T" or "both" (heatmap layers, T drawn on top)
+        rounds: Round numbers to include, None for all
+        bandwidth: Smoothing sigma in game units
+        level: Map level (None = default), selects the radar and the heatmap plane
+    """
+    radar = _radar_zoom(map_name, level, z)
+    canvas = radar[y * TILE_SIZE:(y + 1) * TILE_SIZE, x * TILE_SIZE:(x + 1) * TILE_SIZE].copy()
+
+    if layer != RADAR_LAYER:
+        grids = _heatmap_grids(map_name, layer, z, side, rounds, bandwidth, level)
+        map_config = get_map_config(map_name)
+        for s in ("CT", "T"):
+            if s in grids:
+                _blend(canvas, grids[s], s, grid_box(map_config, grids[s].shape[0], z, x, y))
+
+    buffer = BytesIO()
+    Image.fromarray((canvas * 255 + 0.5).astype(np.uint8), mode='RGB').save(
+        buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL
+    )
+    return buffer.getvalue()
+
+
+def _scan_disk() -> int:
+    """Total size of the tiles on disk"""
+    return sum(p.stat().st_size for p in TILES_DIR.rglob("*.png"))
+
+
+def _evict_lru(limit: int):
+    """Delete the least recently used tiles until the cache is below 90% of the limit"""
+    global _disk_bytes
+    tiles = []
+    for path in TILES_DIR.rglob("*.png"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        tiles.append((stat.st_mtime, stat.st_size, path))
+    tiles.sort(key=lambda t: t[0])
+
+    total = sum(size for _, size, _ in tiles)
+    target = int(limit * 0.9)
+    for _, size, path in tiles:
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    _disk_bytes = total
+
+
+def _account(written: int):
+    """Add a newly written tile to the disk cache size and evict if over the limit"""
+    global _disk_bytes
+    limit = int(TILE_CACHE_MAX_MB * 1024 * 1024)
+    with _disk_lock:
+        if _disk_bytes is None:
+            _disk_bytes = _scan_disk()
+        else:
+            _disk_bytes += written
+        if limit > 0 and _disk_bytes > limit:
+            _evict_lru(limit)
+
+
+def get_tile(map_name: str, layer: str, z: int, x: int, y: int, side: str = "both",
+             rounds: Optional[List[int]] = None, bandwidth: float = 0.0,
+             level: Optional[str] = None) -> bytes:
+    """
+    PNG bytes of a tile from the disk cache, rendering and storing it on a miss
+    """
+    path = tile_path(map_name, layer_key(layer, side, rounds, bandwidth, level), z, x, y)
+    try:
+        data = path.read_bytes()
+        os.utime(path)  # Mark as recently used
+        metrics.record_cache("tiles", True)
+        return data
+    except FileNotFoundError:
+        metrics.record_cache("tiles", False)
+
+    data = render_tile(map_name, layer, z, x, y, side, rounds, bandwidth, level)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so concurrent readers never see a partial PNG
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    _account(len(data))
+    return data
+
+
+def evict_demo(demo_id: str):
+    """Drop every cached tile and smoothed grid of a demo"""
+    global _disk_bytes
+    with _grids_lock:
+        for key in [k for k in _grids if k[0] == demo_id]:
+            del _grids[key]
+    for demo_dir in TILES_DIR.glob(f"*/{demo_id}"):
+        shutil.rmtree(demo_dir, ignore_errors=True)
+    with _disk_lock:
+        _disk_bytes = None  # Rescanned on the next write
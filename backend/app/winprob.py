@@ -0,0 +1,229 @@
+"""
+Round win probability tables
+
+P(CT wins the round) per map, looked up by both teams' buy class, players
+alive per side and whether the bomb is planted. The counts behind the
+tables (agg_winprob) grow incrementally: every ingested demo adds the
+states its rounds passed through (artifacts.build_win_observations) and
+deleting a demo subtracts them again.
+
+Sparse cells are smoothed by shrinking them towards a coarser estimate,
+each level weighted by WINPROB_PRIOR_STRENGTH pseudo-observations:
+
+    logistic prior on the alive difference and the plant
+      -> all maps, any economy
+        -> this map, any economy
+          -> this map and economy
+
+Fitted tables are saved under WINPROB_DIR and held in memory; they are
+refitted only when the counts change, so a lookup is a few array indexes.
+
+    python -m app.winprob --rebuild   # recount every stored demo and refit
+"""
+
+import argparse
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app import artifacts, columnar, database, roundstate
+from app.config import WINPROB_ALIVE_WEIGHT, WINPROB_DIR, WINPROB_PLANT_WEIGHT, WINPROB_PRIOR_STRENGTH
+
+ALL_MAPS = "all"
+BUYS = artifacts.WINPROB_BUYS
+MAX_ALIVE = artifacts.WINPROB_MAX_ALIVE
+
+# Table axes: CT buy, T buy, bomb planted, CT alive, T alive
+SHAPE = (len(BUYS), len(BUYS), 2, MAX_ALIVE + 1, MAX_ALIVE + 1)
+
+_tables: Dict[str, Dict[str, np.ndarray]] = {}
+_tables_stamp: Optional[int] = None
+_tables_lock = threading.Lock()
+
+
+def prior() -> np.ndarray:
+    """P(CT win) of every (planted, CT alive, T alive) state before any data"""
+    planted, ct_alive, t_alive = np.meshgrid(
+        np.arange(2), np.arange(MAX_ALIVE + 1), np.arange(MAX_ALIVE + 1), indexing='ij'
+    )
+    logit = WINPROB_ALIVE_WEIGHT * (ct_alive - t_alive) - WINPROB_PLANT_WEIGHT * planted
+    probability = 1.0 / (1.0 + np.exp(-logit))
+    # Decided states: CT eliminated, or T eliminated with no bomb to defuse
+    probability[ct_alive == 0] = 0.0
+    probability[(t_alive == 0) & (planted == 0) & (ct_alive > 0)] = 1.0
+    return probability
+
+
+def _shrink(wins: np.ndarray, observations: np.ndarray, parent: np.ndarray) -> np.ndarray:
+    """Observed win rate pulled towards parent by WINPROB_PRIOR_STRENGTH pseudo-observations"""
+    return (wins + WINPROB_PRIOR_STRENGTH * parent) / (observations + WINPROB_PRIOR_STRENGTH)
+
+
+def fit_tables() -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Fit the smoothed table of every map (and ALL_MAPS) from agg_winprob
+
+    Returns:
+        Dict of map name -> {"probability", "observations"} arrays of SHAPE
+    """
+    counts: Dict[str, np.ndarray] = {}
+    buy_index = {buy: i for i, buy in enumerate(BUYS)}
+    for row in database.get_aggregates("agg_winprob"):
+        if row["ct_buy"] not in buy_index or row["t_buy"] not in buy_index:
+            continue
+        cell = (buy_index[row["ct_buy"]], buy_index[row["t_buy"]], row["bomb_planted"],
+                min(row["ct_alive"], MAX_ALIVE), min(row["t_alive"], MAX_ALIVE))
+        table = counts.setdefault(row["map_name"], np.zeros((2,) + SHAPE))
+        table[(0,) + cell] += row["observations"]
+        table[(1,) + cell] += row["ct_wins"]
+
+    base = prior()
+    decided = (base == 0.0) | (base == 1.0)
+    pooled = sum(counts.values()) if counts else np.zeros((2,) + SHAPE)
+    # Economy-free estimate over every map, then per map
+    all_states = _shrink(pooled[1].sum(axis=(0, 1)), pooled[0].sum(axis=(0, 1)), base)
+
+    tables = {}
+    for map_name, (observations, wins) in [(ALL_MAPS, pooled)] + [(m, c) for m, c in counts.items()]:
+        map_states = all_states if map_name == ALL_MAPS else \
+            _shrink(wins.sum(axis=(0, 1)), observations.sum(axis=(0, 1)), all_states)
+        probability = _shrink(wins, observations, map_states)
+        probability[:, :, decided] = base[decided]
+        tables[map_name] = {"probability": probability, "observations": observations.astype(np.int64)}
+    return tables
+
+
+def table_path(map_name: str) -> Path:
+    """Path of a map's fitted table"""
+    return WINPROB_DIR / f"{map_name}.npz"
+
+
+def save_tables(tables: Dict[str, Dict[str, np.ndarray]]):
+    """Write every fitted table, removing those of maps without data"""
+    for path in WINPROB_DIR.glob("*.npz"):
+        if path.stem not in tables:
+            path.unlink()
+    for map_name, table in tables.items():
+        tmp = WINPROB_DIR / f".{map_name}.tmp.npz"
+        np.savez(tmp, buys=np.array(BUYS), **table)
+        os.replace(tmp, table_path(map_name))
+
+
+def load_tables() -> Dict[str, Dict[str, np.ndarray]]:
+    """Fitted tables, refitted and saved first if the counts changed since the last fit"""
+    global _tables, _tables_stamp
+    stamp_path = artifacts.win_tables_stamp_path()
+    stamp = stamp_path.stat().st_mtime_ns if stamp_path.exists() else 0
+    if stamp == _tables_stamp:
+        return _tables
+    with _tables_lock:
+        if stamp != _tables_stamp:
+            tables = fit_tables()
+            save_tables(tables)
+            _tables, _tables_stamp = tables, stamp
+    return _tables
+
+
+def lookup(ct_alive: int, t_alive: int, bomb_planted: bool = False, ct_buy: Optional[str] = None,
+           t_buy: Optional[str] = None, map_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Win probability of one round state
+
+    Args:
+        ct_alive: CT players alive (0-5)
+        t_alive: T players alive (0-5)
+        bomb_planted: Whether the bomb is planted (or being defused)
+        ct_buy: CT buy class (see BUYS); None averages over the economy
+        t_buy: T buy class; None averages over the economy
+        map_name: Map table to use; maps without data use every map's table
+
+    Returns:
+        Dict with ctWin, tWin, the table used and its observations of the cell
+    """
+    tables = load_tables()
+    table_name = map_name if map_name in tables else ALL_MAPS
+    table = tables[table_name]
+    buys = tuple(slice(None) if buy is None else BUYS.index(buy) for buy in (ct_buy, t_buy))
+    cell = buys + (int(bool(bomb_planted)), min(max(ct_alive, 0), MAX_ALIVE), min(max(t_alive, 0), MAX_ALIVE))
+    observations = table["observations"][cell]
+    probability = table["probability"][cell]
+    if np.ndim(probability):
+        # Economy left open: weight the economy cells by how often they occur
+        weights = observations + 1e-9
+        probability = float((probability * weights).sum() / weights.sum())
+    ct_win = round(float(probability), 4)
+    return {
+        "ctWin": ct_win,
+        "tWin": round(1.0 - ct_win, 4),
+        "table": table_name,
+        "observations": int(np.sum(observations)),
+    }
+
+
+def demo_win_probability(demo_id: str, ticks: List[int]) -> Optional[List[Optional[Dict[str, Any]]]]:
+    """
+    Win probability at ticks of a stored demo, from its round state and round buys
+
+    Returns:
+        One entry per tick (None outside rounds), or None if the demo has no round state
+    """
+    states = roundstate.states_at(demo_id, ticks)
+    if states is None:
+        return None
+    metadata = database.get_demo_metadata(demo_id) or {}
+    rounds = columnar.load_table(demo_id, 'rounds', ['roundNum', 'ctEquipmentValue', 'tEquipmentValue'])
+    buys = {}
+    for i in range(columnar.table_length(rounds)):
+        round_num = int(rounds['roundNum'][i])
+        buys[round_num] = tuple(
+            artifacts.classify_buy(round_num, int(rounds[column][i])) if column in rounds else None
+            for column in ('ctEquipmentValue', 'tEquipmentValue')
+        )
+    result = []
+    for state in states:
+        if state is None:
+            result.append(None)
+            continue
+        ct_buy, t_buy = buys.get(state["roundNum"], (None, None))
+        result.append({
+            "tick": state["tick"],
+            "roundNum": state["roundNum"],
+            "alive": state["alive"],
+            "bombPlanted": state["bomb"] in ("planted", "defusing"),
+            "buys": {"CT": ct_buy, "T": t_buy},
+            **lookup(state["alive"]["CT"], state["alive"]["T"], state["bomb"] in ("planted", "defusing"),
+                     ct_buy, t_buy, metadata.get('map_name')),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the round win probability tables')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='Recount the round state observations of every stored demo first')
+    args = parser.parse_args()
+
+    database.create_tables()
+    if args.rebuild:
+        for demo in database.get_all_demos():
+            demo_id = demo['demo_id']
+            if not columnar.has_columns(demo_id):
+                print(f"✗ {demo_id}: artifacts not built")
+                continue
+            try:
+                summary = artifacts.build_win_observations(demo_id)
+                print(f"✓ {demo_id}: {summary['observations']} observations")
+            except Exception as e:
+                print(f"✗ {demo_id}: {type(e).__name__}: {e}")
+
+    artifacts.invalidate_win_tables()
+    tables = load_tables()
+    for map_name, table in sorted(tables.items()):
+        print(f"✓ {map_name}: {int(table['observations'].sum())} observations")
+
+
+if __name__ == '__main__':
+    main()
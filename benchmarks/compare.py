@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files
+Prints the change of every benchmark between a baseline and a candidate run
+and exits with status 1 if any benchmark regressed beyond the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """Load a results JSON written by run_benchmarks.py"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compare(base, new, stat='median_s', threshold=0.10):
+    """
+    Compare benchmark results
+
+    Args:
+        base: Baseline results dict
+        new: Candidate results dict
+        stat: Statistic to compare (min_s, median_s or mean_s)
+        threshold: Relative slowdown counted as a regression (0.10 = 10%)
+
+    Returns:
+        List of rows (name, base seconds, new seconds, relative change, status)
+    """
+    rows = []
+    names = list(dict.fromkeys([*base['results'], *new['results']]))
+    for name in names:
+        old = base['results'].get(name, {}).get(stat)
+        cur = new['results'].get(name, {}).get(stat)
+        if old is None or cur is None:
+            rows.append((name, old, cur, None, "missing"))
+            continue
+        change = (cur - old) / old if old > 0 else 0.0
+        if change > threshold:
+            status = "REGRESSED"
+        elif change < -threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, old, cur, change, status))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('base', help='Baseline results JSON')
+    parser.add_argument('new', help='Candidate results JSON')
+    parser.add_argument('--stat', choices=['min_s', 'median_s', 'mean_s'], default='median_s',
+                       help='Statistic to compare (default: median_s)')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                       help='Relative slowdown counted as a regression (default: 0.10)')
+    args = parser.parse_args()
+
+    base = load_results(args.base)
+    new = load_results(args.new)
+    if base.get('params') != new.get('params'):
+        print("Warning: runs used different parameters, timings may not be comparable")
+
+    print(f"Base: {(base['meta'].get('commit') or '?')[:12]}   "
+          f"New: {(new['meta'].get('commit') or '?')[:12]}   ({args.stat})")
+    print(f"{'benchmark':<34}{'base ms':>12}{'new ms':>12}{'change':>10}  status")
+
+    regressed = False
+    for name, old, cur, change, status in compare(base, new, args.stat, args.threshold):
+        old_ms = f"{old * 1000:.2f}" if old is not None else "-"
+        cur_ms = f"{cur * 1000:.2f}" if cur is not None else "-"
+        change_pct = f"{change * 100:+.1f}%" if change is not None else "-"
+        print(f"{name:<34}{old_ms:>12}{cur_ms:>12}{change_pct:>10}  {status}")
+        regressed = regressed or status == "REGRESSED"
+
+    base_rss = base.get('peak_rss_kb')
+    new_rss = new.get('peak_rss_kb')
+    if base_rss and new_rss:
+        print(f"\nPeak RSS: {base_rss / 1024:.1f} MiB -> {new_rss / 1024:.1f} MiB")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+CS2 API Load Test
+Starts the backend (app.main:app) under uvicorn on a scratch data directory,
+seeds it with synthetic demos and drives a weighted mix of GET /demos,
+GET /demo/{id}, POST /demo/save and DELETE /demo/{id} from N concurrent
+keep-alive clients. Reports p50/p95/p99 latency, throughput and error rate
+per route for each concurrency level.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 1,8,32 --duration 20
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --mix demos=70,demo=30
+
+Deletes only target demos created by the load test itself, so the seeded
+demos stay available for reads.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from synthetic_demo import generate_match
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+
+ROUTES = {
+    "demos": "GET /demos",
+    "demo": "GET /demo/{id}",
+    "save": "POST /demo/save",
+    "delete": "DELETE /demo/{id}",
+}
+DEFAULT_MIX = "demos=45,demo=45,save=5,delete=5"
+
+
+class HttpConnection:
+    """Minimal HTTP/1.1 keep-alive client connection on asyncio streams"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Send a request and read the full response, returns (status, body bytes)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            if body is not None:
+                head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            self.writer.write((head + "\r\n").encode('latin-1'))
+            if body is not None:
+                self.writer.write(body)
+            await self.writer.drain()
+
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("Connection closed by server")
+            status = int(status_line.split()[1])
+            headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode('latin-1').partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                chunks = []
+                while True:
+                    size = int((await self.reader.readline()).split(b";")[0], 16)
+                    if size == 0:
+                        await self.reader.readline()
+                        break
+                    chunks.append(await self.reader.readexactly(size))
+                    await self.reader.readline()
+                payload = b"".join(chunks)
+            else:
+                payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+            if headers.get("connection", "").lower() == "close":
+                await self.close()
+            return status, payload
+        except BaseException:
+            await self.close()
+            raise
+
+
+def parse_mix(mix):
+    """Parse "demos=45,demo=45,..." into route weights"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Unknown route '{name}' in mix (choose from {', '.join(ROUTES)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def free_port():
+    """Pick an unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, data_dir, workers, ingest, log_path):
+    """Start uvicorn serving app.main:app, returns the process"""
+    env = dict(os.environ, CS2_DATA_DIR=str(data_dir), CS2_INGEST="1" if ingest else "0")
+    log = open(log_path, 'w')
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def wait_ready(host, port, timeout=30.0):
+    """Poll the health endpoint until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = HttpConnection(host, port)
+        try:
+            status, _ = await conn.request("GET", "/")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await conn.close()
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"Server on {host}:{port} did not start within {timeout:.0f}s")
+
+
+def make_bodies(count, args):
+    """Serialized /demo/save request bodies of synthetic matches"""
+    bodies = []
+    for i in range(count):
+        match_data = generate_match(
+            rounds=args.rounds,
+            players_per_team=args.players,
+            tick_interval=args.tick_interval,
+            seed=args.seed + i
+        )
+        last_round = match_data['rounds'][-1]
+        metadata = {
+            "map_name": match_data['header']['mapName'],
+            "date": "2025-01-01T00:00:00",
+            "team_ct": "Team Bravo",
+            "team_t": "Team Alpha",
+            "player_count": len(match_data['players']),
+            "round_count": len(match_data['rounds']),
+            "score_ct": last_round['ctScore'],
+            "score_t": last_round['tScore'],
+            "demo_name": f"synthetic_{i}.dem",
+        }
+        bodies.append(json.dumps({"metadata": metadata, "data": match_data}).encode('utf-8'))
+    return bodies
+
+
+async def seed_demos(host, port, bodies, count):
+    """Save the demos every read targets, returns their ids"""
+    conn = HttpConnection(host, port)
+    demo_ids = []
+    try:
+        for i in range(count):
+            status, payload = await conn.request("POST", "/demo/save", bodies[i % len(bodies)])
+            if status != 200:
+                raise RuntimeError(f"Seeding failed with HTTP {status}: {payload[:200]!r}")
+            demo_ids.append(json.loads(payload)["demo_id"])
+    finally:
+        await conn.close()
+    return demo_ids
+
+
+async def run_stage(host, port, concurrency, duration, weights, seeded_ids, bodies, think_ms, rng):
+    """
+    Drive the request mix with `concurrency` clients for `duration` seconds
+
+    Returns:
+        (samples, elapsed seconds); samples maps route label -> list of
+        (latency seconds, status or None on connection error)
+    """
+    samples = defaultdict(list)
+    owned_ids = []  # demos created during the stage, the only ones we delete
+    names = list(weights)
+    cumulative = np.cumsum([weights[n] for n in names])
+    deadline = time.monotonic() + duration
+
+    def pick():
+        choice = names[int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))]
+        if choice == "delete" and not owned_ids:
+            return "save"
+        return choice
+
+    async def client():
+        conn = HttpConnection(host, port)
+        try:
+            while time.monotonic() < deadline:
+                route = pick()
+                body = None
+                if route == "demos":
+                    method, path = "GET", "/demos"
+                elif route == "demo":
+                    method, path = "GET", f"/demo/{rng.choice(seeded_ids)}"
+                elif route == "save":
+                    method, path, body = "POST", "/demo/save", rng.choice(bodies)
+                else:
+                    method, path = "DELETE", f"/demo/{owned_ids.pop(rng.randrange(len(owned_ids)))}"
+
+                start = time.perf_counter()
+                try:
+                    status, payload = await conn.request(method, path, body)
+                except (OSError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    status, payload = None, b""
+                samples[ROUTES[route]].append((time.perf_counter() - start, status))
+
+                if route == "save" and status == 200:
+                    owned_ids.append(json.loads(payload)["demo_id"])
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000.0 / think_ms))
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Leave the server as we found it
+    cleanup = HttpConnection(host, port)
+    try:
+        for demo_id in owned_ids:
+            await cleanup.request("DELETE", f"/demo/{demo_id}")
+    finally:
+        await cleanup.close()
+    return samples, elapsed
+
+
+def summarize_route(samples, elapsed):
+    """Latency percentiles, throughput and error rate of one route"""
+    latencies = np.array([s[0] for s in samples]) * 1000
+    errors = sum(1 for _, status in samples if status is None or status >= 400)
+    statuses = defaultdict(int)
+    for _, status in samples:
+        statuses[str(status) if status is not None else "error"] += 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_ms": round(float(latencies.max()), 2),
+        "statuses": dict(statuses),
+    }
+
+
+def print_stage(concurrency, stage):
+    """Print the per-route table of one stage"""
+    print(f"\nConcurrency {concurrency} ({stage['duration_s']:.1f}s)")
+    print(f"{'route':<22}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for label, route in [*stage['routes'].items(), ("all", stage['total'])]:
+        print(f"{label:<22}{route['requests']:>8}{route['throughput_rps']:>9.1f}"
+              f"{route['p50_ms']:>10.1f}{route['p95_ms']:>10.1f}{route['p99_ms']:>10.1f}"
+              f"{route['error_rate'] * 100:>8.1f}%")
+
+
+async def run_load_test(args, host, port):
+    """Seed the server and run one stage per concurrency level"""
+    weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    print(f"Generating {args.bodies} synthetic demos ({args.rounds} rounds each)...")
+    bodies = make_bodies(args.bodies, args)
+    print(f"Seeding {args.seed_demos} demos...")
+    seeded_ids = await seed_demos(host, port, bodies, args.seed_demos)
+
+    stages = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            samples, elapsed = await run_stage(
+                host, port, concurrency, args.duration, weights,
+                seeded_ids, bodies, args.think_ms, rng
+            )
+            all_samples = [s for route in samples.values() for s in route]
+            stage = {
+                "concurrency": concurrency,
+                "duration_s": round(elapsed, 3),
+                "routes": {
+                    label: summarize_route(samples[label], elapsed)
+                    for label in ROUTES.values() if samples.get(label)
+                },
+                "total": summarize_route(all_samples, elapsed),
+            }
+            stages.append(stage)
+            print_stage(concurrency, stage)
+    finally:
+        cleanup = HttpConnection(host, port)
+        try:
+            for demo_id in seeded_ids:
+                await cleanup.request("DELETE", f"/demo/{demo_id}")
+        finally:
+            await cleanup.close()
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the CS2 demo API')
+    parser.add_argument('--url', type=str, default=None,
+                       help='Target an already running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes (default: 1)')
+    parser.add_argument('--no-ingest', action='store_true',
+                       help='Disable the background ingest pipeline on the started server')
+    parser.add_argument('--concurrency', type=str, default='1,8,32',
+                       help='Comma-separated client counts, one stage each (default: 1,8,32)')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds per stage (default: 20)')
+    parser.add_argument('--mix', type=str, default=DEFAULT_MIX,
+                       help=f'Route weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--think-ms', type=float, default=0.0,
+                       help='Mean think time between a client\'s requests in ms (default: 0)')
+    parser.add_argument('--seed-demos', type=int, default=10, help='Demos saved before the run (default: 10)')
+    parser.add_argument('--bodies', type=int, default=3, help='Distinct synthetic demos (default: 3)')
+    parser.add_argument('--rounds', type=int, default=4, help='Rounds per synthetic demo (default: 4)')
+    parser.add_argument('--players', type=int, default=5, help='Players per team (default: 5)')
+    parser.add_argument('--tick-interval', type=int, default=10,
+                       help='Ticks between position samples (default: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', '-o', type=str, default=None, help='Write the report as JSON')
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="cs2-load-") as data_dir:
+        if args.url:
+            target = urlsplit(args.url)
+            host, port = target.hostname, target.port or 80
+        else:
+            host, port = "127.0.0.1", free_port()
+            log_path = Path(data_dir) / "server.log"
+            server = start_server(port, data_dir, args.workers, not args.no_ingest, log_path)
+            print(f"Started uvicorn on {host}:{port} (workers: {args.workers}, log: {log_path})")
+
+        try:
+            asyncio.run(wait_ready(host, port))
+            stages = asyncio.run(run_load_test(args, host, port))
+        except Exception:
+            if server is not None:
+                print(f"Server log:\n{log_path.read_text()[-4000:]}")
+            raise
+        finally:
+            if server is not None:
+                server.terminate()
+                try:
+                    server.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    if args.output:
+        report = {
+            "target": args.url or "local",
+            "params": {k: v for k, v in vars(args).items() if k != 'output'},
+            "stages": stages,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+CS2 Benchmark Suite
+Times the backend ingest/retrieval/listing paths and the utils heatmap and
+aggregation paths on synthetic matches, records peak RSS and writes the
+results as JSON so runs can be compared across commits (see compare.py).
+
+Usage:
+    python benchmarks/run_benchmarks.py --rounds 24 --repeat 5
+    python benchmarks/compare.py results/base.json results/new.json
+
+The backend runs against a temporary data directory with the background
+ingest pipeline disabled (CS2_INGEST=0); artifact builds are timed
+separately in-process.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from synthetic_demo import generate_match
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+SCHEMA_VERSION = 1
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def git_info():
+    """Current commit and whether the tree has local changes"""
+    def run(*args):
+        try:
+            return subprocess.run(
+                ['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = run('status', '--porcelain', '--untracked-files=no')
+    return {"commit": run('rev-parse', 'HEAD'), "dirty": bool(status) if status is not None else None}
+
+
+def setup_environment(data_dir):
+    """Point the backend at a scratch data directory and make app/ and utils/ importable"""
+    os.environ["CS2_DATA_DIR"] = str(data_dir)
+    os.environ["CS2_INGEST"] = "0"
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    sys.path.insert(0, str(REPO_DIR / "backend"))
+    sys.path.insert(0, str(REPO_DIR / "utils"))
+
+
+def time_call(fn, repeat, warmup):
+    """
+    Time a callable
+
+    Args:
+        fn: Callable to time
+        repeat: Timed runs
+        warmup: Untimed runs before timing
+
+    Returns:
+        List of durations in seconds
+    """
+    times = []
+    for i in range(warmup + repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+
+def summarize(times, items=None, unit=None):
+    """Summary statistics of a benchmark run"""
+    median = statistics.median(times)
+    result = {
+        "repeat": len(times),
+        "times_s": [round(t, 6) for t in times],
+        "min_s": round(min(times), 6),
+        "median_s": round(median, 6),
+        "mean_s": round(statistics.fmean(times), 6),
+        "max_s": round(max(times), 6),
+        "stdev_s": round(statistics.stdev(times), 6) if len(times) > 1 else 0.0,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    if items:
+        result["items"] = items
+        result["unit"] = unit
+        result["items_per_s"] = round(items / median, 1) if median > 0 else None
+    return result
+
+
+def run_suite(args):
+    """Run every selected benchmark, returns (dataset info, results)"""
+    from app import analytics, artifacts, columnar, loader, main as api, storage
+    from app.bulk_import import derive_metadata
+    from app.maps import get_map_config
+    from app.models import DemoSaveRequest
+    import generate_heatmap
+    import generate_heatmap_per_round
+    import aggregate_team_side_heatmaps
+
+    selected = set(args.only.split(',')) if args.only else None
+    results = {}
+    loop = asyncio.new_event_loop()
+
+    def bench(name, fn, items=None, unit=None, repeat=None):
+        if selected and name not in selected:
+            return
+        rss_before = peak_rss_kb()
+        times = time_call(fn, repeat or args.repeat, args.warmup)
+        results[name] = summarize(times, items, unit)
+        results[name]["rss_growth_kb"] = results[name]["peak_rss_kb"] - rss_before
+        print(f"  {name:<32} median {results[name]['median_s'] * 1000:10.2f} ms"
+              f"   min {results[name]['min_s'] * 1000:10.2f} ms"
+              f"   peak RSS {results[name]['peak_rss_kb'] / 1024:8.1f} MiB")
+
+    # Dataset
+    gen_start = time.perf_counter()
+    match_data = generate_match(
+        rounds=args.rounds,
+        players_per_team=args.players,
+        tick_rate=args.tick_rate,
+        tick_interval=args.tick_interval,
+        map_name=args.map,
+        seed=args.seed
+    )
+    gen_seconds = time.perf_counter() - gen_start
+    body = json.dumps({"metadata": derive_metadata(match_data, "synthetic.dem"), "data": match_data})
+    n_ticks = len(match_data['ticks'])
+    dataset = {
+        "generate_s": round(gen_seconds, 6),
+        "json_bytes": len(body.encode('utf-8')),
+        "tables": {k: len(v) for k, v in match_data.items() if isinstance(v, list)},
+    }
+    print(f"Dataset: {n_ticks} ticks, {len(match_data['rounds'])} rounds, "
+          f"{dataset['json_bytes'] / 1024 / 1024:.1f} MiB JSON")
+
+    # Backend: ingest (request body parse + validation + handler)
+    saved_ids = []
+
+    def save_demo():
+        request = DemoSaveRequest.model_validate(json.loads(body))
+        response = loop.run_until_complete(api.save_demo(request))
+        saved_ids.append(response.demo_id)
+
+    bench("save_demo", save_demo, items=n_ticks, unit="ticks")
+    if not saved_ids:
+        save_demo()
+    while len(saved_ids) < args.demos:
+        save_demo()
+    demo_id = saved_ids[0]
+
+    # Backend: retrieval
+    def get_demo_cold():
+        storage.evict_cached(demo_id)
+        loop.run_until_complete(api.get_demo(demo_id))
+
+    bench("get_demo_cold", get_demo_cold, items=n_ticks, unit="ticks")
+    bench("get_demo_warm", lambda: loop.run_until_complete(api.get_demo(demo_id)),
+          items=n_ticks, unit="ticks")
+    bench("list_demos", lambda: loop.run_until_complete(api.get_demos()),
+          items=len(saved_ids), unit="demos")
+
+    # Backend: derived artifacts (what the ingest workers run)
+    bench("build_artifacts", lambda: artifacts.build_all(demo_id), items=n_ticks, unit="ticks")
+    if "build_artifacts" not in results:
+        artifacts.build_all(demo_id)
+    bench("load_projected_ticks",
+          lambda: loader.load_demo_data(demo_id, ["ticks"], {"ticks": ["tick", "x", "y", "side"]}),
+          items=n_ticks, unit="ticks")
+
+    def read_round_ticks():
+        for round_info in match_data['rounds']:
+            columnar.load_table(demo_id, 'ticks', tick_range=(round_info['startTick'], round_info['endTick']))
+
+    bench("read_round_ticks", read_round_ticks, items=n_ticks, unit="ticks")
+
+    # Backend: player analytics over every stored demo (cold stat sheet cache)
+    def stats_batch():
+        for saved_id in saved_ids:
+            analytics.evict_demo(saved_id)
+        analytics.aggregate_sheets([analytics.stat_sheet(saved_id) for saved_id in saved_ids])
+
+    if not selected or "stats_batch" in selected:
+        for saved_id in saved_ids[1:]:
+            artifacts.build_columns(saved_id)
+    bench("stats_batch", stats_batch, items=len(saved_ids), unit="demos")
+
+    # utils: heatmaps
+    map_config = get_map_config(args.map)
+    positions = generate_heatmap.filter_positions(match_data, side="CT")
+    bench("filter_positions", lambda: generate_heatmap.filter_positions(match_data, side="CT"),
+          items=n_ticks, unit="ticks")
+    bench("create_density_grid",
+          lambda: generate_heatmap.create_density_grid(positions, map_config, args.grid_size),
+          items=len(positions), unit="positions")
+    bench("build_level_counts",
+          lambda: generate_heatmap.build_level_counts(match_data, args.map, args.grid_size),
+          items=n_ticks, unit="ticks")
+
+    def round_heatmaps():
+        heatmaps = {}
+        for round_info in match_data['rounds']:
+            round_data = {}
+            for side, key in (("CT", "ct"), ("T", "t")):
+                round_positions = generate_heatmap_per_round.filter_positions(
+                    match_data, round_info, side=side
+                )
+                grid, samples = generate_heatmap_per_round.create_density_grid(
+                    round_positions, map_config, args.grid_size
+                )
+                round_data[key] = {"grid": grid.tolist(), "samples": samples}
+            heatmaps[str(round_info['roundNum'])] = round_data
+        return heatmaps
+
+    bench("round_heatmaps", round_heatmaps, items=len(match_data['rounds']), unit="rounds",
+          repeat=min(args.repeat, 3))
+
+    # utils: team+side aggregation
+    per_round = round_heatmaps()
+    team_a, team_b = aggregate_team_side_heatmaps.get_team_names_from_match(match_data)
+    bench("determine_team_sides",
+          lambda: aggregate_team_side_heatmaps.determine_team_sides_per_round(match_data),
+          items=len(match_data['rounds']), unit="rounds")
+    team_sides = aggregate_team_side_heatmaps.determine_team_sides_per_round(match_data)
+    bench("aggregate_heatmaps_by_team_side",
+          lambda: aggregate_team_side_heatmaps.aggregate_heatmaps_by_team_side(
+              per_round, team_sides, team_a, team_b, args.grid_size
+          ),
+          items=len(per_round), unit="rounds")
+
+    loop.close()
+    return dataset, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the CS2 benchmark suite')
+    parser.add_argument('--rounds', type=int, default=24, help='Rounds per match (default: 24)')
+    parser.add_argument('--players', type=int, default=5, help='Players per team (default: 5)')
+    parser.add_argument('--tick-rate', type=int, default=64, help='Tick rate (default: 64)')
+    parser.add_argument('--tick-interval', type=int, default=10,
+                       help='Ticks between position samples (default: 10)')
+    parser.add_argument('--map', type=str, default='de_mirage', help='Map name (default: de_mirage)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--demos', type=int, default=20,
+                       help='Demos stored before the listing benchmark (default: 20)')
+    parser.add_argument('--grid-size', type=int, default=50, help='Heatmap grid size (default: 50)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (default: 5)')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per benchmark (default: 1)')
+    parser.add_argument('--only', type=str, default=None,
+                       help='Comma-separated benchmark names to run (default: all)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                       help='Results JSON path (default: benchmarks/results/<commit>.json)')
+    args = parser.parse_args()
+
+    params = {k: v for k, v in vars(args).items() if k != 'output'}
+    git = git_info()
+
+    with tempfile.TemporaryDirectory(prefix="cs2-bench-") as data_dir:
+        setup_environment(data_dir)
+        dataset, results = run_suite(args)
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            **git,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": params,
+        "dataset": dataset,
+        "results": results,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        name = (git["commit"] or "nogit")[:12] + ("-dirty" if git["dirty"] else "")
+        output_path = RESULTS_DIR / f"{name}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nPeak RSS: {report['peak_rss_kb'] / 1024:.1f} MiB")
+    print(f"✓ Results saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Synthetic CS2 Match Generator
+Builds parser-shaped match data (header, ticks, kills, damages, weaponFires,
+flashes, grenades, smokes, bombs, rounds, players) for benchmarks and load
+tests. Output is deterministic for a given seed.
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+# de_mirage bounds (same as utils/generate_heatmap.py MAP_CONFIG)
+DEFAULT_BOUNDS = {"minX": -3230, "maxX": 1890, "minY": -3407, "maxY": 1682}
+
+TEAM_NAMES = ("Team Alpha", "Team Bravo")
+WEAPONS = [
+    ("AK-47", "Rifle"), ("M4A1-S", "Rifle"), ("AWP", "Rifle"),
+    ("Galil AR", "Rifle"), ("MP9", "SMG"), ("Desert Eagle", "Pistol"),
+    ("USP-S", "Pistol"), ("Glock-18", "Pistol")
+]
+HITGROUPS = ["Head", "Chest", "Stomach", "LeftArm", "RightArm", "LeftLeg", "RightLeg"]
+GRENADES = ["Smoke Grenade", "Flashbang", "HE Grenade", "Molotov", "Incendiary Grenade"]
+FREEZE_TIME_S = 15
+ROUND_TIME_S = (35, 115)
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _make_players(players_per_team, rng):
+    """Create the roster, team A starts as T"""
+    roster = []
+    for team_index, team in enumerate(TEAM_NAMES):
+        for i in range(players_per_team):
+            roster.append({
+                "name": f"{team.split()[-1].lower()}{i + 1}",
+                "steamId": 76561198000000000 + team_index * 1000 + i,
+                "team": team,
+                "side": "T" if team_index == 0 else "CT",
+                "kills": 0,
+                "deaths": 0,
+                "assists": 0,
+                "mvps": 0,
+                "score": 0
+            })
+    rng.shuffle(roster)
+    return roster
+
+
+def _side_of(player, round_num, halftime):
+    """Side of a player in a round (teams swap at halftime)"""
+    starts_t = player["team"] == TEAM_NAMES[0]
+    first_half = round_num <= halftime
+    return "T" if starts_t == first_half else "CT"
+
+
+def generate_match(rounds=24, players_per_team=5, tick_rate=64, tick_interval=10,
+                   map_name="de_mirage", bounds=None, z_levels=(0.0,), seed=0):
+    """
+    Generate a synthetic parsed match
+
+    Args:
+        rounds: Number of rounds
+        players_per_team: Players on each team
+        tick_rate: Server tick rate (ticks per second)
+        tick_interval: Ticks between recorded position samples (parser default: 10)
+        map_name: Map name written to the header
+        bounds: Map bounds dict (minX, maxX, minY, maxY), defaults to de_mirage
+        z_levels: Floor heights; each player stays on a random one per round
+        seed: Random seed
+
+    Returns:
+        Match data dict in the demo parser's output format
+    """
+    rng = random.Random(seed)
+    bounds = bounds or DEFAULT_BOUNDS
+    width = bounds["maxX"] - bounds["minX"]
+    height = bounds["maxY"] - bounds["minY"]
+    spawns = {
+        "T": (bounds["minX"] + width * 0.8, bounds["minY"] + height * 0.2),
+        "CT": (bounds["minX"] + width * 0.25, bounds["minY"] + height * 0.75),
+    }
+    halftime = max(1, min(12, rounds // 2))
+
+    roster = _make_players(players_per_team, rng)
+    stats = {p["steamId"]: p for p in roster}
+    money = {p["steamId"]: 800 for p in roster}
+
+    data = {
+        "header": {
+            "clientName": "",
+            "mapName": map_name,
+            "networkProtocol": 14000,
+            "serverName": "synthetic",
+            "tickRate": tick_rate
+        },
+        "ticks": [], "kills": [], "damages": [], "weaponFires": [], "flashes": [],
+        "grenades": [], "smokes": [], "bombs": [], "rounds": [], "players": roster
+    }
+    score = {"CT": 0, "T": 0}
+    tick = 100
+
+    for round_num in range(1, rounds + 1):
+        start_tick = tick
+        freeze_end = start_tick + FREEZE_TIME_S * tick_rate
+        end_tick = freeze_end + rng.randint(*ROUND_TIME_S) * tick_rate
+        sides = {p["steamId"]: _side_of(p, round_num, halftime) for p in roster}
+        if round_num in (1, halftime + 1):
+            money = {sid: 800 for sid in money}
+
+        # Decide who dies when; the side that loses everyone loses the round
+        by_side = {"T": [], "CT": []}
+        for p in roster:
+            by_side[sides[p["steamId"]]].append(p)
+        loser = rng.choice(["T", "CT"])
+        winner = "CT" if loser == "T" else "T"
+        victims = list(by_side[loser])
+        victims += rng.sample(by_side[winner], rng.randint(0, len(by_side[winner]) - 1))
+        rng.shuffle(victims)
+        kill_span = max(1, end_tick - freeze_end - tick_rate)
+        death_ticks = {}
+        for victim in victims:
+            death_ticks[victim["steamId"]] = freeze_end + rng.randint(tick_rate, kill_span)
+        last_death = max(death_ticks.values())
+        end_tick = min(end_tick, last_death + 5 * tick_rate)
+
+        bomb_plant_tick = 0
+        reason = "TerroristsWin" if winner == "T" else "CTWin"
+        if winner == "T" and rng.random() < 0.4:
+            bomb_plant_tick = freeze_end + (last_death - freeze_end) // 2
+            reason = "TargetBombed"
+        elif winner == "CT" and rng.random() < 0.2:
+            bomb_plant_tick = freeze_end + (last_death - freeze_end) // 2
+            reason = "BombDefused"
+
+        # Position samples: a bounded random walk from each side's spawn
+        position = {}
+        floor_z = {}
+        for p in roster:
+            sx, sy = spawns[sides[p["steamId"]]]
+            position[p["steamId"]] = [sx + rng.uniform(-150, 150), sy + rng.uniform(-150, 150)]
+            floor_z[p["steamId"]] = z_levels[0] if len(z_levels) == 1 else rng.choice(z_levels)
+        equipment = {sid: min(money[sid], rng.choice([200, 1000, 3700, 5700])) for sid in money}
+        for sample_tick in range(start_tick, end_tick + 1, tick_interval):
+            moving = sample_tick >= freeze_end
+            for p in roster:
+                sid = p["steamId"]
+                alive = sample_tick < death_ticks.get(sid, end_tick + 1)
+                pos = position[sid]
+                vx = vy = 0.0
+                if moving and alive:
+                    vx = rng.uniform(-250, 250)
+                    vy = rng.uniform(-250, 250)
+                    pos[0] = _clamp(pos[0] + vx * tick_interval / tick_rate, bounds["minX"], bounds["maxX"])
+                    pos[1] = _clamp(pos[1] + vy * tick_interval / tick_rate, bounds["minY"], bounds["maxY"])
+                weapon = WEAPONS[sid % len(WEAPONS)][0]
+                data["ticks"].append({
+                    "tick": sample_tick,
+                    "steamId": sid,
+                    "name": p["name"],
+                    "team": p["team"],
+                    "side": sides[sid],
+                    "x": pos[0],
+                    "y": pos[1],
+                    "z": floor_z[sid],
+                    "viewX": rng.uniform(-180, 180),
+                    "viewY": rng.uniform(-20, 20),
+                    "velocityX": vx,
+                    "velocityY": vy,
+                    "isAlive": alive,
+                    "health": 100 if alive else 0,
+                    "armor": 100 if alive and equipment[sid] > 1000 else 0,
+                    "hasHelmet": equipment[sid] > 3000,
+                    "hasDefuseKit": sides[sid] == "CT" and equipment[sid] > 4000,
+                    "money": money[sid] - equipment[sid] if moving else money[sid],
+                    "equipmentValue": equipment[sid],
+                    "activeWeapon": weapon,
+                    "isScoped": weapon == "AWP" and rng.random() < 0.3,
+                    "isDucking": rng.random() < 0.05,
+                    "isWalking": rng.random() < 0.1
+                })
+
+        # Kills, with the damage and shots that led to them
+        attackers = {"T": [p for p in by_side["T"]], "CT": [p for p in by_side["CT"]]}
+        for victim in sorted(victims, key=lambda v: death_ticks[v["steamId"]]):
+            vid = victim["steamId"]
+            kill_tick = death_ticks[vid]
+            enemy_side = "CT" if sides[vid] == "T" else "T"
+            alive_enemies = [a for a in attackers[enemy_side]
+                             if death_ticks.get(a["steamId"], end_tick + 1) > kill_tick]
+            if not alive_enemies:
+                continue
+            attacker = rng.choice(alive_enemies)
+            aid = attacker["steamId"]
+            weapon, weapon_class = WEAPONS[aid % len(WEAPONS)]
+            headshot = rng.random() < 0.45
+            teammates = [a for a in alive_enemies if a["steamId"] != aid]
+            assister = rng.choice(teammates) if teammates and rng.random() < 0.3 else None
+            ax, ay = position[aid]
+            vx, vy = position[vid]
+
+            health = 100
+            hit_tick = kill_tick - rng.randint(2, 3) * 8
+            while health > 0:
+                damage = health if hit_tick >= kill_tick - 8 or health <= 10 else rng.randint(10, health - 1)
+                health -= damage
+                data["damages"].append({
+                    "tick": hit_tick,
+                    "attackerId": aid,
+                    "victimId": vid,
+                    "weapon": weapon,
+                    "weaponClass": weapon_class,
+                    "damage": damage,
+                    "damageArmor": rng.randint(0, 10),
+                    "health": health,
+                    "armor": rng.randint(0, 100),
+                    "hitgroup": "Head" if headshot and health == 0 else rng.choice(HITGROUPS)
+                })
+                hit_tick += 8
+            for shot in range(rng.randint(2, 8)):
+                data["weaponFires"].append({
+                    "tick": kill_tick - shot * 6,
+                    "shooterId": aid,
+                    "shooterName": attacker["name"],
+                    "weapon": weapon,
+                    "x": ax,
+                    "y": ay
+                })
+
+            data["kills"].append({
+                "tick": kill_tick,
+                "attackerId": aid,
+                "attackerName": attacker["name"],
+                "attackerTeam": attacker["team"],
+                "attackerSide": enemy_side,
+                "victimId": vid,
+                "victimName": victim["name"],
+                "victimTeam": victim["team"],
+                "victimSide": sides[vid],
+                "assisterId": assister["steamId"] if assister else 0,
+                "assisterName": assister["name"] if assister else "",
+                "weapon": weapon,
+                "weaponClass": weapon_class,
+                "isHeadshot": headshot,
+                "isWallbang": rng.random() < 0.03,
+                "penetratedObjects": 0,
+                "isFlashAssist": rng.random() < 0.1,
+                "isThroughSmoke": rng.random() < 0.05,
+                "attackerX": ax,
+                "attackerY": ay,
+                "victimX": vx,
+                "victimY": vy
+            })
+            stats[aid]["kills"] += 1
+            stats[aid]["score"] += 2
+            stats[vid]["deaths"] += 1
+            if assister:
+                stats[assister["steamId"]]["assists"] += 1
+                stats[assister["steamId"]]["score"] += 1
+
+        # Utility: every player throws a couple of grenades per round
+        for p in roster:
+            sid = p["steamId"]
+            for _ in range(rng.randint(0, 3)):
+                throw_tick = freeze_end + rng.randint(0, max(1, end_tick - freeze_end - 3 * tick_rate))
+                if throw_tick >= death_ticks.get(sid, end_tick + 1):
+                    continue
+                grenade = rng.choice(GRENADES)
+                tx, ty = position[sid]
+                lx = _clamp(tx + rng.uniform(-800, 800), bounds["minX"], bounds["maxX"])
+                ly = _clamp(ty + rng.uniform(-800, 800), bounds["minY"], bounds["maxY"])
+                detonate_tick = throw_tick + rng.randint(1, 2) * tick_rate
+                for event_type, event_tick, gx, gy in (("thrown", throw_tick, tx, ty),
+                                                       ("detonate", detonate_tick, lx, ly)):
+                    data["grenades"].append({
+                        "tick": event_tick,
+                        "throwerId": sid,
+                        "throwerName": p["name"],
+                        "throwerTeam": p["team"],
+                        "throwerSide": sides[sid],
+                        "grenadeType": grenade,
+                        "x": gx,
+                        "y": gy,
+                        "eventType": event_type
+                    })
+                if grenade == "Smoke Grenade":
+                    for event_type, event_tick in (("start", detonate_tick),
+                                                   ("expire", detonate_tick + 18 * tick_rate)):
+                        data["smokes"].append({
+                            "tick": event_tick,
+                            "throwerId": sid,
+                            "throwerName": p["name"],
+                            "x": lx,
+                            "y": ly,
+                            "eventType": event_type
+                        })
+                elif grenade == "Flashbang":
+                    for target in rng.sample(roster, rng.randint(0, 3)):
+                        data["flashes"].append({
+                            "tick": detonate_tick,
+                            "attackerId": sid,
+                            "attackerName": p["name"],
+                            "victimId": target["steamId"],
+                            "victimName": target["name"],
+                            "flashDuration": rng.uniform(0.2, 4.5)
+                        })
+
+        if bomb_plant_tick:
+            planter = rng.choice(by_side["T"])
+            site = rng.choice(["A", "B"])
+            px, py = position[planter["steamId"]]
+            data["bombs"].append({
+                "tick": bomb_plant_tick,
+                "event": "planted",
+                "playerId": planter["steamId"],
+                "playerName": planter["name"],
+                "site": site,
+                "x": px,
+                "y": py
+            })
+            if reason == "BombDefused":
+                defuser = rng.choice(by_side["CT"])
+                dx, dy = position[defuser["steamId"]]
+                for event, event_tick in (("defuse_start", last_death + tick_rate),
+                                          ("defused", last_death + 6 * tick_rate)):
+                    data["bombs"].append({
+                        "tick": event_tick,
+                        "event": event,
+                        "playerId": defuser["steamId"],
+                        "playerName": defuser["name"],
+                        "site": site,
+                        "x": dx,
+                        "y": dy
+                    })
+                end_tick = max(end_tick, last_death + 6 * tick_rate)
+            elif reason == "TargetBombed":
+                explode_tick = bomb_plant_tick + 40 * tick_rate
+                data["bombs"].append({
+                    "tick": explode_tick,
+                    "event": "exploded",
+                    "playerId": planter["steamId"],
+                    "playerName": planter["name"],
+                    "site": site,
+                    "x": px,
+                    "y": py
+                })
+                end_tick = max(end_tick, explode_tick)
+
+        score[winner] += 1
+        ct_ids = [p["steamId"] for p in by_side["CT"]]
+        t_ids = [p["steamId"] for p in by_side["T"]]
+        data["rounds"].append({
+            "roundNum": round_num,
+            "startTick": start_tick,
+            "endTick": end_tick,
+            "freezeTimeEndTick": freeze_end,
+            "winner": winner,
+            "reason": reason,
+            "ctScore": score["CT"],
+            "tScore": score["T"],
+            "winnerSide": winner,
+            "ctStartMoney": sum(money[s] for s in ct_ids),
+            "tStartMoney": sum(money[s] for s in t_ids),
+            "ctEquipmentValue": sum(equipment[s] for s in ct_ids),
+            "tEquipmentValue": sum(equipment[s] for s in t_ids),
+            "bombPlantTick": bomb_plant_tick
+        })
+        mvp = max(by_side[winner], key=lambda p: p["kills"])
+        stats[mvp["steamId"]]["mvps"] += 1
+
+        for sid in money:
+            reward = 3250 if sides[sid] == winner else 1900
+            money[sid] = min(16000, money[sid] - equipment[sid] + reward)
+        tick = end_tick + 7 * tick_rate
+
+    for p in roster:
+        p["side"] = _side_of(p, rounds, halftime)
+    for table in ("kills", "damages", "weaponFires", "flashes", "grenades", "smokes", "bombs"):
+        data[table].sort(key=lambda row: row["tick"])
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic parsed CS2 match JSON')
+    parser.add_argument('output', help='Output JSON path')
+    parser.add_argument('--rounds', type=int, default=24, help='Number of rounds (default: 24)')
+    parser.add_argument('--players', type=int, default=5, help='Players per team (default: 5)')
+    parser.add_argument('--tick-rate', type=int, default=64, help='Tick rate (default: 64)')
+    parser.add_argument('--tick-interval', type=int, default=10,
+                       help='Ticks between position samples (default: 10)')
+    parser.add_argument('--map', type=str, default='de_mirage', help='Map name (default: de_mirage)')
+    parser.add_argument('--z-levels', type=str, default='0',
+                       help='Comma-separated floor heights, e.g. "-700,0" for two levels (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    match_data = generate_match(
+        rounds=args.rounds,
+        players_per_team=args.players,
+        tick_rate=args.tick_rate,
+        tick_interval=args.tick_interval,
+        map_name=args.map,
+        z_levels=tuple(float(z) for z in args.z_levels.split(',')),
+        seed=args.seed
+    )
+    output_path = Path(args.output)
+    with open(output_path, 'w') as f:
+        json.dump(match_data, f)
+
+    print(f"✓ {len(match_data['ticks'])} ticks, {len(match_data['kills'])} kills, "
+          f"{len(match_data['rounds'])} rounds saved to: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -60,6 +60,7 @@ type PlayerPosition struct {
 	Side           string  `json:"side"`
 	X              float64 `json:"x"`
 	Y              float64 `json:"y"`
+	Z              float64 `json:"z"`
 	ViewX          float32 `json:"viewX"`
 	ViewY          float32 `json:"viewY"`
 	VelocityX      float64 `json:"velocityX"`
@@ -705,6 +706,7 @@ func parseDemoInternal(data js.Value, callback js.Value, optionsArgs []js.Value)
 					Side:           teamToString(player.Team),
 					X:              float64(pos.X),
 					Y:              float64(pos.Y),
+					Z:              float64(pos.Z),
 					ViewX:          player.ViewDirectionX(),
 					ViewY:          player.ViewDirectionY(),
 					VelocityX:      float64(vel.X),
@@ -7,7 +7,8 @@ import DimensionScatter from "@/components/clustering/DimensionScatter";
 import ClusteringMapPreview from "@/components/clustering/ClusteringMapPreview";
 import { DEFAULT_TIMEPOINTS } from "@/config/clustering.config";
 import type { ScatterPoint, Team, Representative } from "@/types/clustering";
-import { extractSnapshots } from "@/lib/clustering/extractSnapshots";
+import { extractSnapshots, SNAPSHOT_FIELDS, SNAPSHOT_TABLES } from "@/lib/clustering/extractSnapshots";
+import { fetchDemosBatch } from "@/lib/demoBatch";
 // Use the extended feature builder that imputes missing timepoints
 // and appends region (A/B) occupancy features.
 import { buildFeatureMatrixWithRegions } from "@/lib/clustering/features_plus";
@@ -24,8 +25,6 @@ import {
 } from "@/lib/clustering/autoTune";
 import { Loader2 } from "lucide-react";
 
-const API_URL = "http://localhost:8000";
-
 export default function ClustringPage() {
   const [selectedDemoIds, setSelectedDemoIds] = useState<string[]>([]);
   const [matchDataList, setMatchDataList] = useState<any[]>([]);
@@ -43,17 +42,11 @@ export default function ClustringPage() {
       setLoading(true);
       setError(null);
       try {
-        const promises = selectedDemoIds.map(async (id) => {
-          const response = await fetch(`${API_URL}/demo/${id}`);
-          if (!response.ok) {
-            throw new Error(`Failed to fetch demo ${id}`);
-          }
-          const result = await response.json();
-          return result.data;
+        const results = await fetchDemosBatch(selectedDemoIds, {
+          tables: SNAPSHOT_TABLES,
+          fields: SNAPSHOT_FIELDS,
         });
-
-        const results = await Promise.all(promises);
-        setMatchDataList(results);
+        setMatchDataList(results.map((result) => result.data));
       } catch (err) {
         console.error("Error fetching demos:", err);
         setError(err instanceof Error ? err.message : "Unknown error");
@@ -20,7 +20,12 @@ import ClusteringMapPreview from "@/components/clustering/ClusteringMapPreview";
 import MultiMatchPlayerPerformance from "@/components/player/MultiMatchPlayerPerformance";
 import { InfoTooltip } from "@/components/InfoTooltip";
 import { DEFAULT_TIMEPOINTS } from "@/config/clustering.config";
-import { extractSnapshots } from "@/lib/clustering/extractSnapshots";
+import {
+  extractSnapshots,
+  SNAPSHOT_FIELDS,
+  SNAPSHOT_TABLES,
+} from "@/lib/clustering/extractSnapshots";
+import { fetchDemosBatch } from "@/lib/demoBatch";
 import { buildFeatureMatrixWithRegions } from "@/lib/clustering/features_plus";
 import { createDimensionWorker } from "@/lib/clustering/dimensionWorkerClient";
 import { runUMAP } from "@/lib/clustering/umapClient";
@@ -328,17 +333,12 @@ const CS2Dashboard = () => {
         setDemoNamesMap(namesMapping);
 
         // Then fetch the actual demo data
-        const promises = clusteringDemoIds.map(async (id) => {
-          const response = await fetch(`${API_URL}/demo/${id}`);
-          if (!response.ok) {
-            throw new Error(`Failed to fetch demo ${id}`);
-          }
-          const result = await response.json();
-          return result.data;
+        // Snapshot data plus what the player performance view reads
+        const results = await fetchDemosBatch(clusteringDemoIds, {
+          tables: [...SNAPSHOT_TABLES, "kills", "players"],
+          fields: { ...SNAPSHOT_FIELDS, kills: ["tick", "attackerName"] },
         });
-
-        const results = await Promise.all(promises);
-        setMatchDataList(results);
+        setMatchDataList(results.map((result) => result.data));
       } catch (err) {
         console.error("Error fetching clustering demos:", err);
         setMatchDataList([]);
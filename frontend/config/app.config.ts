@@ -30,6 +30,7 @@ export const APP_CONFIG = {
     ENDPOINTS: {
       DEMOS: "/demos",
       DEMO: "/demo",
+      DEMOS_BATCH: "/demos/batch",
     },
   },
 
@@ -29,6 +29,22 @@ type MatchData = {
   }>;
 };
 
+/** fetchDemosBatch projection covering every table and field extractSnapshots reads */
+export const SNAPSHOT_TABLES = ["header", "rounds", "ticks"];
+export const SNAPSHOT_FIELDS: Record<string, string[]> = {
+  rounds: [
+    "roundNum",
+    "startTick",
+    "endTick",
+    "freezeTimeEndTick",
+    "ctStartMoney",
+    "tStartMoney",
+    "ctEquipmentValue",
+    "tEquipmentValue",
+  ],
+  ticks: ["tick", "x", "y", "side", "team", "steamId", "name", "isAlive"],
+};
+
 export interface ExtractOptions {
   timepoints: number[]; // seconds after freeze end
   desiredPlayers?: number; // default 5
@@ -0,0 +1,79 @@
+"use client";
+
+import { APP_CONFIG } from "@/config/app.config";
+
+export type DemoBatchOptions = {
+  /** Top-level keys to include, e.g. ["header", "rounds", "ticks"] */
+  tables?: string[];
+  /** Per-table field lists, e.g. { ticks: ["tick", "x", "y"] } */
+  fields?: Record<string, string[]>;
+  includeMetadata?: boolean;
+};
+
+type BatchItem = {
+  demo_id: string;
+  data?: any;
+  metadata?: any;
+  error?: string;
+};
+
+/**
+ * Fetch several demos with one POST /demos/batch request.
+ *
+ * The backend streams newline-delimited JSON (one demo per line, in the
+ * order they finish loading); lines are parsed as they arrive and the
+ * result is returned in the order of `demoIds`. Throws if any demo fails.
+ */
+export async function fetchDemosBatch(
+  demoIds: string[],
+  options: DemoBatchOptions = {}
+): Promise<BatchItem[]> {
+  const { API } = APP_CONFIG;
+  const response = await fetch(`${API.BASE_URL}${API.ENDPOINTS.DEMOS_BATCH}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      demo_ids: demoIds,
+      tables: options.tables ?? null,
+      fields: options.fields ?? null,
+      include_metadata: options.includeMetadata ?? false,
+    }),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Failed to fetch demos: ${response.status} ${response.statusText}`);
+  }
+
+  const items = new Map<string, BatchItem>();
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const item: BatchItem = JSON.parse(line);
+    if (item.error) {
+      throw new Error(`Failed to fetch demo ${item.demo_id}: ${item.error}`);
+    }
+    items.set(item.demo_id, item);
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline = buffer.indexOf("\n");
+    while (newline !== -1) {
+      handleLine(buffer.slice(0, newline));
+      buffer = buffer.slice(newline + 1);
+      newline = buffer.indexOf("\n");
+    }
+  }
+  handleLine(buffer + decoder.decode());
+
+  return demoIds.map((id) => {
+    const item = items.get(id);
+    if (!item) throw new Error(`Failed to fetch demo ${id}`);
+    return item;
+  });
+}
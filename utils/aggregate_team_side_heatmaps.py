@@ -10,6 +10,8 @@ import argparse
 from pathlib import Path
 from collections import defaultdict
 
+from profiling import add_profile_arguments, enable_profiling
+
 
 def load_json(json_path):
     """Load JSON file"""
@@ -177,7 +179,10 @@ def main():
     parser.add_argument('--output', '-o', type=str, default='heatmaps_by_team_side.json',
                        help='Output JSON filename (default: heatmaps_by_team_side.json)')
     
+    add_profile_arguments(parser)
+    
     args = parser.parse_args()
+    enable_profiling(args, 'aggregate_team_side_heatmaps')
     
     print(f"Loading match data from {args.match_json}...")
     match_data = load_json(args.match_json)
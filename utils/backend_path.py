@@ -0,0 +1,11 @@
+"""
+Makes the backend's app package importable from the utils scripts, which
+share its map registry (maps.py) and heatmap colormaps.
+"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
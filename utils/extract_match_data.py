@@ -1,24 +1,66 @@
 #!/usr/bin/env python3
 """
-Script to extract match data from the backend API and save different fields into separate JSON files.
+Export the demo library from the backend API into per-demo, per-table files.
+
+Every demo (or a filtered subset) is fetched over one pooled keep-alive
+session by a bounded number of worker threads. Responses are streamed and
+parsed row by row, so a demo's tables are written to disk without holding
+the whole body in memory:
+
+    sampledata/<demo_id>/metadata.json
+    sampledata/<demo_id>/<table>.json    (or .jsonl with --format jsonl)
+    sampledata/<demo_id>/manifest.json   (row counts; marks the demo complete)
+
+Demos are written under sampledata/.partial/ and moved into place once
+complete, so an interrupted run resumes where it stopped: demos with a
+manifest of the same format, resolution and tables are skipped.
 """
 
-import requests
+import argparse
+import contextlib
+import io
 import json
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List
-from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from json_header_extractor import JsonStream
+from profiling import add_profile_arguments, enable_profiling
 
 
 # Configuration
 API_BASE_URL = "http://0.0.0.0:8000"
 OUTPUT_DIR = Path(__file__).parent.parent / "sampledata"
-
-
-def fetch_demo_list() -> List[Dict[str, Any]]:
+PARTIAL_DIR_NAME = ".partial"
+MANIFEST_NAME = "manifest.json"
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT_S = (10, 300)  # (connect, read) seconds
+MAX_RETRIES = 3
+FORMATS = ("json", "jsonl")  # Indented JSON arrays, or one compact row per line
+
+
+def create_session(workers: int) -> requests.Session:
+    """Keep-alive session with a connection pool sized for the workers and retries on transient errors"""
+    session = requests.Session()
+    retry = Retry(total=MAX_RETRIES, backoff_factor=0.5,
+                  status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_demo_list(session: requests.Session, api_url: str = API_BASE_URL) -> List[Dict[str, Any]]:
     """Fetch list of all available demos from the API."""
     try:
-        response = requests.get(f"{API_BASE_URL}/demos")
+        response = session.get(f"{api_url}/demos", timeout=REQUEST_TIMEOUT_S)
         response.raise_for_status()
         data = response.json()
         return data.get('demos', [])
@@ -27,142 +69,302 @@ def fetch_demo_list() -> List[Dict[str, Any]]:
         return []
 
 
-def fetch_demo_data(demo_id: str) -> Dict[str, Any]:
-    """Fetch full data for a specific demo."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/demo/{demo_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching demo {demo_id}: {e}")
-        return {}
-
-
-def save_json(data: Any, filename: str):
-    """Save data to a JSON file in the output directory."""
-    filepath = OUTPUT_DIR / filename
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(f"✓ Saved: {filename}")
-
+def filter_demos(
+    demos: List[Dict[str, Any]],
+    demo_ids: Optional[List[str]] = None,
+    map_name: Optional[str] = None,
+    team: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Subset of the demo list
 
-def extract_and_save_demo(demo_id: str):
-    """Extract and save different fields from a demo into separate JSON files."""
-    print(f"\n{'='*60}")
-    print(f"Processing Demo: {demo_id}")
-    print(f"{'='*60}")
+    Dates are compared as ISO strings against each demo's date, so
+    since="2024-01" keeps everything from January 2024 on. Team names match
+    either side, case-insensitively.
+    """
+    selected = []
+    for demo in demos:
+        if demo_ids and demo.get('demo_id') not in demo_ids:
+            continue
+        if map_name and demo.get('map_name') != map_name:
+            continue
+        if team and team.lower() not in {(demo.get('team_ct') or '').lower(), (demo.get('team_t') or '').lower()}:
+            continue
+        date = str(demo.get('date') or '')
+        if since and date < since:
+            continue
+        if until and date[:len(until)] > until:
+            continue
+        selected.append(demo)
+    return selected[:limit] if limit else selected
 
-    demo_data = fetch_demo_data(demo_id)
 
-    if not demo_data:
-        print(f"✗ Failed to fetch data for demo {demo_id}")
+def is_exported(demo_dir: Path, fmt: str, resolution: str, tables: Optional[List[str]] = None) -> bool:
+    """Whether a demo was completely exported with the same format, resolution and table selection"""
+    manifest_path = demo_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return False
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    return (manifest.get('format') == fmt and manifest.get('resolution') == resolution
+            and manifest.get('selection') == (sorted(tables) if tables else None))
+
+
+def _iter_keys(stream: JsonStream):
+    """Keys of the object at the stream position; the caller consumes each value before the next key"""
+    stream.take('{')
+    if stream.peek() == '}':
+        stream.take('}')
         return
+    while True:
+        key = stream.value()
+        stream.take(':')
+        yield key
+        if stream.take(',}') == '}':
+            return
 
-    # Extract and save metadata
-    if 'metadata' in demo_data:
-        metadata_file = OUTPUT_DIR / "metadata.json"
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(demo_data['metadata'], f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved: metadata.json")
-
-    # Extract and save all first-level data fields
-    data = demo_data.get('data', {})
-
-    # Iterate through all first-level keys and save each to a separate file
-    for field_name, field_data in data.items():
-        field_file = OUTPUT_DIR / f"{field_name}.json"
-        with open(field_file, 'w', encoding='utf-8') as f:
-            json.dump(field_data, f, indent=2, ensure_ascii=False)
-
-        # Get count/size info
-        if isinstance(field_data, list):
-            info = f"({len(field_data)} items)"
-        elif isinstance(field_data, dict):
-            info = f"({len(field_data)} keys)"
-        else:
-            info = ""
-
-        print(f"✓ Saved: {field_name}.json {info}")
-
-    print(f"\n✓ Demo processing complete")
-
-
-def print_players_summary(demo_data: Dict[str, Any]):
-    """Print a quick summary of players to verify extraction."""
-    players = get_players(demo_data)
-    print("\nPlayers (derived):")
-    for p in players:
-        name = p.get("name", "")
-        team = p.get("team", "")
-        side = p.get("side", "")
-        steam_id = p.get("steamId", "")
-        print(f" - {name} | {team} | {side} | steamId={steam_id}")
-    print(f"Total players: {len(players)}")
 
+def _write_rows(stream: JsonStream, path: Optional[Path], fmt: str) -> int:
+    """
+    Copy the array at the stream position into a file one row at a time
 
-def get_players(demo_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    With path None the rows are only skipped. Returns the row count.
     """
-    Return list of player entries.
-    - Prefer the players list under demo_data['data'] if present and complete (10 players).
-    - Otherwise derive players from ticks with an early-exit once 10 uniques are found to avoid a full scan.
+    rows = 0
+    stream.take('[')
+    with open(path, 'w', encoding='utf-8') if path else contextlib.nullcontext() as f:
+        if f and fmt == "json":
+            f.write("[")
+        if stream.peek() == ']':
+            stream.take(']')
+        else:
+            while True:
+                row = stream.value()
+                if f and fmt == "jsonl":
+                    f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+                    f.write("\n")
+                elif f:
+                    # Same layout as json.dump(rows, indent=2)
+                    f.write(",\n  " if rows else "\n  ")
+                    f.write(json.dumps(row, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+                rows += 1
+                if stream.take(',]') == ']':
+                    break
+        if f and fmt == "json":
+            f.write("\n]" if rows else "]")
+    return rows
+
+
+def _write_value(value: Any, path: Path, fmt: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == "jsonl":
+            json.dump(value, f, ensure_ascii=False, separators=(',', ':'))
+        else:
+            json.dump(value, f, indent=2, ensure_ascii=False)
+
+
+def _export_tables(stream: JsonStream, out_dir: Path, fmt: str,
+                   tables: Optional[List[str]], written: Dict[str, Any]):
+    """Write every table of the data object at the stream position, recording them in written"""
+    extension = "jsonl" if fmt == "jsonl" else "json"
+    for table in _iter_keys(stream):
+        wanted = tables is None or table in tables
+        if table == 'game' and stream.peek() == '{':
+            # Parser output that nests its tables under "game"
+            _export_tables(stream, out_dir, fmt, tables, written)
+        elif stream.peek() == '[':
+            path = out_dir / f"{table}.{extension}"
+            rows = _write_rows(stream, path if wanted else None, fmt)
+            if wanted:
+                written[table] = {"rows": rows, "bytes": path.stat().st_size}
+        else:
+            value = stream.value()
+            if wanted:
+                path = out_dir / f"{table}.json"
+                _write_value(value, path, fmt)
+                written[table] = {"bytes": path.stat().st_size}
+
+
+def export_demo(
+    session: requests.Session,
+    demo_id: str,
+    output_dir: Path,
+    fmt: str = "json",
+    resolution: str = "full",
+    tables: Optional[List[str]] = None,
+    api_url: str = API_BASE_URL
+) -> Dict[str, Any]:
     """
-    data = demo_data.get("data", {})
-    players = data.get("players")
-    if isinstance(players, list) and len(players) == 10:
-        return players
-
-    ticks = data.get("ticks", [])
-    seen = OrderedDict()
-    for tick in ticks:
-        player_id = tick.get("steamId")
-        if not player_id or player_id in seen:
-            continue
-        seen[player_id] = {
-            "steamId": player_id,
-            "name": tick.get("name", ""),
-            "team": tick.get("team"),
-            "side": tick.get("side"),
-        }
-        if len(seen) == 10:
-            break
+    Stream one demo from the API into output_dir/<demo_id>/
+
+    Args:
+        session: Pooled session from create_session
+        demo_id: Demo to export
+        output_dir: Export root
+        fmt: "json" (indented arrays) or "jsonl" (compact, one row per line)
+        resolution: Ticks resolution passed to the API ("full", "4", "16" or "path")
+        tables: Top-level data keys to write, None for all
+
+    Returns:
+        The demo's manifest (tables with row counts and bytes)
+    """
+    partial_dir = output_dir / PARTIAL_DIR_NAME / demo_id
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    partial_dir.mkdir(parents=True)
+    manifest = {"demo_id": demo_id, "format": fmt, "resolution": resolution,
+                "selection": sorted(tables) if tables else None, "tables": {}}
+
+    with session.get(f"{api_url}/demo/{demo_id}", params={"resolution": resolution},
+                     stream=True, timeout=REQUEST_TIMEOUT_S) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        stream = JsonStream(io.TextIOWrapper(response.raw, encoding='utf-8'))
+
+        # {"demo_id": ..., "metadata": {...}, "data": {table: [...], ...}}
+        for key in _iter_keys(stream):
+            if key == 'data' and stream.peek() == '{':
+                _export_tables(stream, partial_dir, fmt, tables, manifest["tables"])
+            elif key == 'metadata':
+                _write_value(stream.value(), partial_dir / "metadata.json", fmt)
+            else:
+                stream.value()
+
+    manifest["exported_at"] = datetime.now().isoformat()
+    with open(partial_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Move the finished demo into place (replacing an export in another format)
+    demo_dir = output_dir / demo_id
+    shutil.rmtree(demo_dir, ignore_errors=True)
+    partial_dir.rename(demo_dir)
+    return manifest
+
+
+def export_library(
+    output_dir: Path = OUTPUT_DIR,
+    api_url: str = API_BASE_URL,
+    workers: int = DEFAULT_WORKERS,
+    fmt: str = "json",
+    resolution: str = "full",
+    tables: Optional[List[str]] = None,
+    force: bool = False,
+    **filters
+) -> Dict[str, Any]:
+    """
+    Export every demo of the library (or the subset matching filters, see filter_demos)
 
-    return list(seen.values())
+    Returns:
+        Summary with exported, skipped and failed demos and throughput
+    """
+    started = time.perf_counter()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    session = create_session(workers)
+
+    demos = filter_demos(fetch_demo_list(session, api_url), **filters)
+    demo_ids = [d['demo_id'] for d in demos if d.get('demo_id')]
+    pending = [d for d in demo_ids if force or not is_exported(output_dir / d, fmt, resolution, tables)]
+    exported: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(export_demo, session, demo_id, output_dir, fmt, resolution, tables, api_url): demo_id
+            for demo_id in pending
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            demo_id = futures[future]
+            try:
+                exported.append(future.result())
+            except Exception as e:
+                failed.append({"demo_id": demo_id, "error": f"{type(e).__name__}: {e}"})
+            print(f"\r  Exported {i}/{len(pending)} demos", end="", flush=True)
+    if pending:
+        print()
+
+    session.close()
+    with contextlib.suppress(OSError):
+        (output_dir / PARTIAL_DIR_NAME).rmdir()  # Left only if a demo failed
+    elapsed = time.perf_counter() - started
+    total_mb = sum(t["bytes"] for m in exported for t in m["tables"].values()) / (1024 * 1024)
+    return {
+        "matched": len(demo_ids),
+        "exported": len(exported),
+        "skipped": len(demo_ids) - len(pending),
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "demos_per_s": len(exported) / elapsed if elapsed > 0 else 0.0,
+        "mb_per_s": total_mb / elapsed if elapsed > 0 else 0.0,
+        "total_mb": total_mb,
+    }
 
 
 def main():
-    """Main function to extract match data from first available demo."""
+    """Export the demo library from the backend API."""
+    parser = argparse.ArgumentParser(description='Export demos from the backend API into per-demo table files')
+    parser.add_argument('--api-url', type=str, default=API_BASE_URL,
+                        help=f'Backend base URL (default: {API_BASE_URL})')
+    parser.add_argument('--output-dir', type=str, default=str(OUTPUT_DIR),
+                        help=f'Export root (default: {OUTPUT_DIR})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Demos downloaded in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--format', type=str, choices=FORMATS, default="json",
+                        help='json: indented arrays; jsonl: compact, one row per line (default: json)')
+    parser.add_argument('--resolution', type=str, default="full",
+                        help='Ticks resolution: full, 4, 16 or path (default: full)')
+    parser.add_argument('--tables', type=str, default=None,
+                        help='Comma-separated tables to write (default: all)')
+    parser.add_argument('--demo-id', action='append', default=None,
+                        help='Export only this demo (repeatable)')
+    parser.add_argument('--map', type=str, default=None, help='Only demos on this map')
+    parser.add_argument('--team', type=str, default=None, help='Only demos with this team on either side')
+    parser.add_argument('--since', type=str, default=None, help='Only demos dated on or after (ISO date)')
+    parser.add_argument('--until', type=str, default=None, help='Only demos dated on or before (ISO date)')
+    parser.add_argument('--limit', type=int, default=None, help='Export at most this many demos')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-export demos that are already complete')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    enable_profiling(args, 'extract_match_data')
+
     print("="*60)
-    print("CS2 Match Data Extractor")
+    print("CS2 Match Data Exporter")
     print("="*60)
-
-    # Create output directory
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"\nOutput directory: {OUTPUT_DIR}")
-
-    # Fetch list of demos
-    print("\nFetching demo list from API...")
-    demos = fetch_demo_list()
-
-    if not demos:
+    print(f"\nOutput directory: {args.output_dir}")
+
+    summary = export_library(
+        Path(args.output_dir),
+        api_url=args.api_url,
+        workers=args.workers,
+        fmt=args.format,
+        resolution=args.resolution,
+        tables=args.tables.split(',') if args.tables else None,
+        force=args.force,
+        demo_ids=args.demo_id,
+        map_name=args.map,
+        team=args.team,
+        since=args.since,
+        until=args.until,
+        limit=args.limit
+    )
+
+    if not summary["matched"]:
         print("\n✗ No demos found or unable to connect to API")
-        print(f"  Make sure the backend is running at {API_BASE_URL}")
+        print(f"  Make sure the backend is running at {args.api_url}")
         return
 
-    print(f"✓ Found {len(demos)} demo(s)")
+    for failure in summary["failed"]:
+        print(f"✗ {failure['demo_id']}: {failure['error']}")
 
-    # Process only the first demo
-    if demos:
-        demo_id = demos[0].get('demo_id')
-        if demo_id:
-            demo_data = fetch_demo_data(demo_id)
-            if demo_data:
-                print_players_summary(demo_data)
-                extract_and_save_demo(demo_id)
-
-    print("\n" + "="*60)
-    print("Extraction Complete!")
-    print("="*60)
-    print(f"All data saved to: {OUTPUT_DIR}")
+    print(f"\n✓ Exported {summary['exported']}/{summary['matched']} demos "
+          f"({summary['skipped']} already complete, {len(summary['failed'])} failed)")
+    print(f"  {summary['total_mb']:.1f} MB in {summary['elapsed_s']:.2f}s "
+          f"({summary['demos_per_s']:.1f} demos/s, {summary['mb_per_s']:.1f} MB/s)")
+    print(f"All data saved to: {args.output_dir}")
 
 
 if __name__ == "__main__":
@@ -6,29 +6,15 @@ Generates position density heatmaps overlaid on radar images
 
 import json
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-from PIL import Image
 import argparse
 from pathlib import Path
 
-# Map configurations (matching your React MAP_CONFIG)
-MAP_CONFIG = {
-    "de_ancient": {
-        "minX": -2953,
-        "maxX": 2119,
-        "minY": -2887,
-        "maxY": 1983,
-        "radarImage": "/radar_images/de_ancient_radar_psd.png",
-    },
-    "de_mirage": {
-        "minX": -3230,
-        "maxX": 1890,
-        "minY": -3407,
-        "maxY": 1682,
-        "radarImage": "/radar_images/de_mirage_radar_psd.png",
-    },
-}
+from heatmap_render import render_heatmap, render_combined_heatmap, render_batch
+from maps import get_map_config, level_index, position_counts, world_to_grid
+from profiling import add_profile_arguments, enable_profiling
+
+# Side order of the timeline count arrays
+SIDES = ("CT", "T")
 
 
 def load_match_data(json_path):
@@ -130,18 +116,10 @@ def create_density_grid(positions, map_config, grid_size=50):
     if not positions:
         return np.zeros((grid_size, grid_size))
     
-    xs = [p[0] for p in positions]
-    ys = [p[1] for p in positions]
-    
-    # Create 2D histogram
-    x_edges = np.linspace(map_config['minX'], map_config['maxX'], grid_size + 1)
-    y_edges = np.linspace(map_config['minY'], map_config['maxY'], grid_size + 1)
-    
-    # hist[i, j] corresponds to x in [x_edges[i], x_edges[i+1]] and y in [y_edges[j], y_edges[j+1]]
-    hist, _, _ = np.histogram2d(xs, ys, bins=[x_edges, y_edges])
-    
-    # Transpose to get [y, x] indexing (row, col) and flip Y to match canvas top-down
-    hist = np.flipud(hist.T)
+    # Rows top-down to match the canvas
+    hist = position_counts(
+        [p[0] for p in positions], [p[1] for p in positions], map_config, grid_size
+    ).astype(np.float64)
     
     # Normalize to 0-1
     if hist.max() > 0:
@@ -150,6 +128,325 @@ def create_density_grid(positions, map_config, grid_size=50):
     return hist
 
 
+def live_tick_columns(match_data, rounds=None, alive_only=True, time_window=None):
+    """
+    Positions of every tick inside a round's live time, as NumPy columns
+
+    Seconds are counted from each round's freezeTimeEndTick (startTick if
+    missing), the same round start filter_positions uses.
+
+    Args:
+        match_data: Parsed JSON match data
+        rounds: List of round numbers, or None for all
+        alive_only: Only include alive players
+        time_window: Optional (start_seconds, end_seconds) range to keep
+
+    Returns:
+        Dict of arrays x, y, z (NaN when missing), side (index into SIDES)
+        and seconds since round start
+    """
+    game_data = match_data.get('game', match_data)
+    rounds_data = game_data.get('rounds', [])
+    ticks_data = game_data.get('ticks', match_data.get('ticks', []))
+    tick_rate = match_data.get('header', {}).get('tickRate', 64) or 64
+
+    # Live tick range of every selected round, sorted by start
+    ranges = sorted(
+        (r.get('freezeTimeEndTick', r['startTick']), r['endTick'])
+        for r in rounds_data
+        if 'roundNum' in r and (not rounds or r['roundNum'] in rounds)
+    )
+    if not ranges or not ticks_data:
+        empty = np.zeros(0)
+        return {"x": empty, "y": empty, "z": empty, "side": empty.astype(np.int64), "seconds": empty}
+    starts = np.array([r[0] for r in ranges], dtype=np.int64)
+    ends = np.array([r[1] for r in ranges], dtype=np.int64)
+
+    side_codes = {side: i for i, side in enumerate(SIDES)}
+    count = len(ticks_data)
+    tick = np.fromiter((t.get('tick', 0) for t in ticks_data), dtype=np.int64, count=count)
+    xs = np.fromiter((np.nan if t.get('x') is None else t['x'] for t in ticks_data), dtype=np.float64, count=count)
+    ys = np.fromiter((np.nan if t.get('y') is None else t['y'] for t in ticks_data), dtype=np.float64, count=count)
+    zs = np.fromiter((np.nan if t.get('z') is None else t['z'] for t in ticks_data), dtype=np.float64, count=count)
+    side = np.fromiter((side_codes.get(t.get('side'), -1) for t in ticks_data), dtype=np.int64, count=count)
+    alive = np.fromiter((bool(t.get('isAlive', True)) for t in ticks_data), dtype=bool, count=count)
+
+    # Round each tick belongs to (the last round starting at or before it)
+    round_idx = np.searchsorted(starts, tick, side='right') - 1
+    in_round = round_idx >= 0
+    in_round[in_round] = tick[in_round] <= ends[round_idx[in_round]]
+
+    seconds = np.zeros(count)
+    seconds[in_round] = (tick[in_round] - starts[round_idx[in_round]]) / tick_rate
+
+    keep = in_round & (side >= 0)
+    if alive_only:
+        keep &= alive
+    if time_window:
+        keep &= (seconds >= time_window[0]) & (seconds <= time_window[1])
+    return {"x": xs[keep], "y": ys[keep], "z": zs[keep], "side": side[keep], "seconds": seconds[keep]}
+
+
+def build_timeline_counts(match_data, map_config, grid_size=50, bucket_seconds=10,
+                          rounds=None, alive_only=True, time_window=None):
+    """
+    Bin every position by (seconds since round start, side) in one pass
+
+    Args:
+        match_data: Parsed JSON match data
+        map_config: Map configuration dict
+        grid_size: Number of bins per dimension
+        bucket_seconds: Width of a time bucket in seconds
+        rounds: List of round numbers, or None for all
+        alive_only: Only include alive players
+        time_window: Optional (start_seconds, end_seconds) range to keep
+
+    Returns:
+        uint32 array of raw counts shaped (buckets, len(SIDES), grid_size, grid_size),
+        rows top-down like create_density_grid
+    """
+    columns = live_tick_columns(match_data, rounds, alive_only, time_window)
+    rows, cols, keep = world_to_grid(columns['x'], columns['y'], map_config, grid_size)
+
+    bucket = (columns['seconds'][keep] // bucket_seconds).astype(np.int64)
+    n_buckets = int(bucket.max()) + 1 if len(bucket) else 0
+    cell = rows[keep] * grid_size + cols[keep]
+    flat = (bucket * len(SIDES) + columns['side'][keep]) * grid_size * grid_size + cell
+    counts = np.bincount(flat, minlength=n_buckets * len(SIDES) * grid_size * grid_size)
+    return counts.astype(np.uint32).reshape(n_buckets, len(SIDES), grid_size, grid_size)
+
+
+def build_level_counts(match_data, map_name, grid_size=50, rounds=None, alive_only=True, time_window=None):
+    """
+    Raw position counts per (level, side) of a match in one pass over the ticks
+
+    Positions are split by the map's level z thresholds (see maps.py);
+    ticks without z count towards the default level.
+
+    Args:
+        match_data: Parsed JSON match data
+        map_name: Registered map name
+        grid_size: Number of bins per dimension
+        rounds: List of round numbers, or None for all
+        alive_only: Only include alive players
+        time_window: Optional (start_seconds, end_seconds) range to keep
+
+    Returns:
+        Array shaped (levels, len(SIDES), grid_size, grid_size), rows top-down
+        like create_density_grid
+    """
+    map_config = get_map_config(map_name)
+    n_levels = len(map_config['levels'])
+    columns = live_tick_columns(match_data, rounds, alive_only, time_window)
+    rows, cols, in_bounds = world_to_grid(columns['x'], columns['y'], map_config, grid_size)
+    levels = level_index(columns['z'], map_config)
+
+    group = levels[in_bounds] * len(SIDES) + columns['side'][in_bounds]
+    flat = (group * grid_size + rows[in_bounds]) * grid_size + cols[in_bounds]
+    counts = np.bincount(flat, minlength=n_levels * len(SIDES) * grid_size * grid_size)
+    return counts.reshape(n_levels, len(SIDES), grid_size, grid_size)
+
+
+def timeline_prefix_sums(counts):
+    """
+    Prefix sums over time buckets: prefix[k] = sum of buckets [0, k)
+
+    Any bucket range [a, b) is then prefix[b] - prefix[a], one subtraction per grid.
+    """
+    prefix = np.zeros((counts.shape[0] + 1,) + counts.shape[1:], dtype=np.uint64)
+    np.cumsum(counts, axis=0, out=prefix[1:])
+    return prefix
+
+
+def timeline_view(counts, view='buckets', window_buckets=3):
+    """
+    Derive a timeline view from per-bucket counts
+
+    Args:
+        counts: Output of build_timeline_counts
+        view: "buckets" (each bucket alone), "cumulative" (round start up to the
+              end of each bucket) or "sliding" (the last window_buckets buckets)
+        window_buckets: Width of the sliding window in buckets
+
+    Returns:
+        Count array with the same shape as counts
+    """
+    if view == 'buckets':
+        return counts
+    prefix = timeline_prefix_sums(counts)
+    ends = np.arange(1, counts.shape[0] + 1)
+    if view == 'cumulative':
+        return prefix[1:]
+    if view == 'sliding':
+        starts = np.maximum(ends - window_buckets, 0)
+        return prefix[ends] - prefix[starts]
+    raise ValueError(f"Unknown timeline view: {view}")
+
+
+def export_timeline_json(counts, map_config, filters, output_path, bucket_seconds,
+                         normalize='frame', sides=SIDES):
+    """
+    Export a timeline of combined CT/T heatmaps as JSON for frontend consumption
+
+    Args:
+        counts: Timeline counts (buckets, sides, grid, grid), e.g. from timeline_view
+        map_config: Map configuration
+        filters: Dictionary of applied filters
+        output_path: Output JSON path
+        bucket_seconds: Width of a time bucket in seconds
+        normalize: "frame" (each grid scaled to 0-1) or "global" (shared max per side)
+        sides: Sides to include
+    """
+    global_max = counts.max(axis=(0, 2, 3)) if counts.size else np.zeros(len(SIDES))
+    frames = []
+    for b in range(counts.shape[0]):
+        frame = {"start": b * bucket_seconds, "end": (b + 1) * bucket_seconds}
+        for side in sides:
+            s = SIDES.index(side)
+            grid = counts[b, s].astype(np.float64)
+            peak = grid.max() if normalize == 'frame' else global_max[s]
+            frame[side.lower()] = {
+                "grid": (grid / peak if peak > 0 else grid).tolist(),
+                "samples": int(counts[b, s].sum())
+            }
+        frames.append(frame)
+
+    data = {
+        "timeline": {
+            "frames": frames,
+            "bucketSeconds": bucket_seconds,
+            "gridSize": filters.get('gridSize', 50),
+            "bounds": {
+                "minX": map_config['minX'],
+                "maxX": map_config['maxX'],
+                "minY": map_config['minY'],
+                "maxY": map_config['maxY']
+            },
+            "filters": filters
+        }
+    }
+
+    with open(output_path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+    print(f"✓ Timeline JSON saved to: {output_path}")
+
+
+def find_match_files(paths):
+    """Expand match JSON files and directories of them into a sorted file list"""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob('*.json')) if path.is_dir() else [path])
+    return files
+
+
+def build_library_counts(match_paths, grid_size=50, rounds=None, alive_only=True, time_window=None):
+    """
+    Raw position counts of a library of matches, summed per map in one run
+
+    Every file is loaded once and binned with its map's precomputed grid
+    transform and level thresholds, so matches on different maps can be
+    mixed freely. Matches on unknown maps are skipped.
+
+    Returns:
+        Tuple (counts, matches): map name -> uint64 array shaped
+        (levels, len(SIDES), grid_size, grid_size) and map name -> matches binned
+    """
+    counts = {}
+    matches = {}
+    for path in match_paths:
+        match_data = load_match_data(path)
+        map_name = match_data.get('header', {}).get('mapName')
+        if get_map_config(map_name) is None:
+            print(f"  Warning: Skipping {path}: no map configuration for map: {map_name}")
+            continue
+
+        match_counts = build_level_counts(match_data, map_name, grid_size, rounds, alive_only, time_window)
+        if map_name not in counts:
+            counts[map_name] = np.zeros(match_counts.shape, dtype=np.uint64)
+            matches[map_name] = 0
+        counts[map_name] += match_counts.astype(np.uint64)
+        matches[map_name] += 1
+        print(f"  {Path(path).name}: {map_name}, {int(match_counts.sum())} samples")
+    return counts, matches
+
+
+def level_heatmaps(level_counts, map_config, sides):
+    """
+    Normalized grids per map level and side
+
+    Args:
+        level_counts: Counts shaped (levels, len(SIDES), G, G)
+        map_config: Map configuration (for the level names)
+        sides: Sides to include ("CT", "T")
+
+    Returns:
+        Dict of level name -> {side_lower: {"grid": nested list (0-1), "samples": int}}
+    """
+    result = {}
+    for level, counts in zip(map_config['levels'], level_counts):
+        result[level['name']] = {}
+        for side in sides:
+            side_counts = counts[SIDES.index(side)]
+            grid = side_counts.astype(np.float64)
+            if grid.max() > 0:
+                grid /= grid.max()
+            result[level['name']][side.lower()] = {"grid": grid.tolist(), "samples": int(side_counts.sum())}
+    return result
+
+
+def level_render_jobs(level_data, map_config, radar_dir, output_dir, prefix, suffix, alpha):
+    """
+    render_batch jobs drawing every map level over its own radar image
+
+    The default level is written to {prefix}_{suffix}.png, other levels to
+    {prefix}_{level}_{suffix}.png.
+    """
+    jobs = []
+    for level in map_config['levels']:
+        data = level_data[level['name']]
+        layers = [(side, data[side.lower()]['grid']) for side in SIDES if side.lower() in data]
+        radar_path = Path(radar_dir) / level['radarImage'].split('/')[-1]
+        name = prefix if level['name'] == 'default' else f"{prefix}_{level['name']}"
+        jobs.append((layers, str(radar_path), str(Path(output_dir) / f"{name}_{suffix}.png"), 1024, alpha))
+    return jobs
+
+
+def generate_library_heatmaps(match_paths, args, sides, rounds_filter, time_window):
+    """Write one combined heatmap JSON (and PNGs) per map for a library of matches"""
+    print(f"Binning {len(match_paths)} matches...")
+    counts, matches = build_library_counts(
+        match_paths, args.grid_size, rounds_filter, args.alive_only, time_window
+    )
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for map_name, map_counts in sorted(counts.items()):
+        map_config = get_map_config(map_name)
+        level_data = level_heatmaps(map_counts, map_config, sides)
+
+        print(f"\n{map_name}: {matches[map_name]} matches")
+        filters_info = {
+            "side": args.side,
+            "rounds": rounds_filter or "all",
+            "aliveOnly": args.alive_only,
+            "timeWindow": time_window,
+            "gridSize": args.grid_size,
+            "matches": matches[map_name]
+        }
+        export_combined_json(level_data['default'], map_config, filters_info,
+                             output_dir / f"heatmap_{map_name}_library.json", level_data)
+
+        if not args.skip_png:
+            jobs += level_render_jobs(level_data, map_config, args.radar_dir, output_dir,
+                                      f"heatmap_{map_name}", "library", args.alpha)
+
+    # Jobs are grouped by radar, so each radar image is decoded once per worker
+    for png_path in render_batch(jobs, args.workers):
+        print(f"✓ Heatmap saved to: {png_path}")
+
+
 def generate_heatmap_overlay(density_grid, map_config, radar_image_path, 
                              output_path, side='T', alpha=0.6):
     """
@@ -163,38 +460,7 @@ def generate_heatmap_overlay(density_grid, map_config, radar_image_path,
         side: "CT" or "T" for color scheme
         alpha: Transparency of heatmap overlay
     """
-    fig, ax = plt.subplots(figsize=(10, 10), dpi=150)
-    
-    # Load and display radar image if available
-    if Path(radar_image_path).exists():
-        radar_img = Image.open(radar_image_path)
-        ax.imshow(radar_img, extent=[0, density_grid.shape[1], 0, density_grid.shape[0]], 
-                 aspect='auto', zorder=1)
-    else:
-        print(f"Warning: Radar image not found at {radar_image_path}")
-        ax.set_facecolor('#1a1a1a')
-    
-    # Create color map (red for T, blue for CT)
-    if side == 'T':
-        colors = ['#00000000', '#ef444420', '#ef444460', '#ef4444aa', '#ef4444']
-        cmap_name = 'red_heat'
-    else:
-        colors = ['#00000000', '#3b82f620', '#3b82f660', '#3b82f6aa', '#3b82f6']
-        cmap_name = 'blue_heat'
-    
-    cmap = LinearSegmentedColormap.from_list(cmap_name, colors)
-    
-    # Overlay heatmap
-    im = ax.imshow(density_grid, cmap=cmap, alpha=alpha, 
-                   extent=[0, density_grid.shape[1], 0, density_grid.shape[0]],
-                   aspect='auto', zorder=2, interpolation='gaussian')
-    
-    ax.axis('off')
-    plt.tight_layout(pad=0)
-    
-    plt.savefig(output_path, bbox_inches='tight', pad_inches=0, 
-                facecolor='#1a1a1a', transparent=False)
-    plt.close()
+    render_heatmap(density_grid, radar_image_path, output_path, side=side, alpha=alpha)
     
     print(f"✓ Heatmap saved to: {output_path}")
 
@@ -212,51 +478,12 @@ def generate_combined_heatmap(ct_grid, t_grid, map_config, radar_image_path,
         output_path: Output PNG path
         alpha: Transparency of heatmap overlay
     """
-    # Convert to numpy if needed
-    if not isinstance(ct_grid, np.ndarray):
-        ct_grid = np.array(ct_grid)
-    if not isinstance(t_grid, np.ndarray):
-        t_grid = np.array(t_grid)
-    
-    fig, ax = plt.subplots(figsize=(10, 10), dpi=150)
-    
-    # Load and display radar image if available
-    if Path(radar_image_path).exists():
-        radar_img = Image.open(radar_image_path)
-        ax.imshow(radar_img, extent=[0, ct_grid.shape[1], 0, ct_grid.shape[0]], 
-                 aspect='auto', zorder=1)
-    else:
-        print(f"Warning: Radar image not found at {radar_image_path}")
-        ax.set_facecolor('#1a1a1a')
-    
-    # Create color maps
-    ct_colors = ['#00000000', '#3b82f620', '#3b82f660', '#3b82f6aa', '#3b82f6']
-    t_colors = ['#00000000', '#ef444420', '#ef444460', '#ef4444aa', '#ef4444']
-    
-    ct_cmap = LinearSegmentedColormap.from_list('blue_heat', ct_colors)
-    t_cmap = LinearSegmentedColormap.from_list('red_heat', t_colors)
-    
-    # Overlay CT heatmap (blue)
-    ax.imshow(ct_grid, cmap=ct_cmap, alpha=alpha, 
-              extent=[0, ct_grid.shape[1], 0, ct_grid.shape[0]],
-              aspect='auto', zorder=2, interpolation='gaussian')
-    
-    # Overlay T heatmap (red)
-    ax.imshow(t_grid, cmap=t_cmap, alpha=alpha, 
-              extent=[0, t_grid.shape[1], 0, t_grid.shape[0]],
-              aspect='auto', zorder=3, interpolation='gaussian')
-    
-    ax.axis('off')
-    plt.tight_layout(pad=0)
-    
-    plt.savefig(output_path, bbox_inches='tight', pad_inches=0, 
-                facecolor='#1a1a1a', transparent=False)
-    plt.close()
+    render_combined_heatmap(ct_grid, t_grid, radar_image_path, output_path, alpha=alpha)
     
     print(f"✓ Combined heatmap saved to: {output_path}")
 
 
-def export_combined_json(heatmap_data, map_config, filters, output_path):
+def export_combined_json(heatmap_data, map_config, filters, output_path, level_data=None):
     """
     Export combined heatmap data as JSON for frontend consumption
     
@@ -265,6 +492,8 @@ def export_combined_json(heatmap_data, map_config, filters, output_path):
         map_config: Map configuration
         filters: Dictionary of applied filters
         output_path: Output JSON path
+        level_data: Optional per-level grids (level_heatmaps output), exported
+                    as "levels" on multi-level maps
     """
     data = {
         "heatmapData": {
@@ -286,6 +515,8 @@ def export_combined_json(heatmap_data, map_config, filters, output_path):
             "filters": filters
         }
     }
+    if level_data and len(level_data) > 1:
+        data["heatmapData"]["levels"] = level_data
     
     with open(output_path, 'w') as f:
         json.dump(data, f, indent=2)
@@ -325,7 +556,8 @@ def export_json_data(density_grid, map_config, filters, output_path):
 
 def main():
     parser = argparse.ArgumentParser(description='Generate CS2 position heatmaps')
-    parser.add_argument('json_file', help='Path to match JSON file')
+    parser.add_argument('json_files', nargs='+',
+                       help='Match JSON file, or several files/directories to aggregate per map')
     parser.add_argument('--grid-size', type=int, default=50, 
                        help='Grid resolution (default: 50)')
     parser.add_argument('--side', choices=['CT', 'T', 'both'], default='both',
@@ -344,17 +576,26 @@ def main():
                        help='Heatmap transparency (default: 0.6)')
     parser.add_argument('--skip-png', action='store_true',
                        help='Skip PNG generation (only generate JSON)')
+    parser.add_argument('--timeline', action='store_true',
+                       help='Export a timeline of heatmaps by seconds into the round (JSON only)')
+    parser.add_argument('--bucket-seconds', type=float, default=10,
+                       help='Timeline bucket width in seconds (default: 10)')
+    parser.add_argument('--timeline-view', choices=['buckets', 'cumulative', 'sliding'],
+                       default='buckets',
+                       help='Per-bucket, cumulative or sliding-window frames (default: buckets)')
+    parser.add_argument('--window-buckets', type=int, default=3,
+                       help='Sliding window width in buckets (default: 3)')
+    parser.add_argument('--normalize', choices=['frame', 'global'], default='frame',
+                       help='Scale timeline grids per frame or by the timeline max (default: frame)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Render processes for multi-level maps and libraries (default: CPU count)')
+    
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    enable_profiling(args, 'generate_heatmap')
     
-    # Load match data
-    print(f"Loading match data from {args.json_file}...")
-    match_data = load_match_data(args.json_file)
-    
-    # Get map name
-    map_name = match_data.get('header', {}).get('mapName', 'de_ancient')
-    map_config = MAP_CONFIG.get(map_name, MAP_CONFIG['de_ancient'])
-    print(f"Map: {map_name}")
+    match_files = find_match_files(args.json_files)
     
     # Parse filters
     rounds_filter = None
@@ -369,36 +610,75 @@ def main():
     # Process both sides
     sides_to_process = ['CT', 'T'] if args.side == 'both' else [args.side]
     
-    heatmap_data = {}
+    # Several files or a directory: one heatmap per map
+    if len(match_files) != 1 or Path(args.json_files[0]).is_dir():
+        if args.timeline:
+            print("Error: --timeline takes a single match JSON file")
+            return
+        generate_library_heatmaps(match_files, args, sides_to_process, rounds_filter, time_window)
+        print("\n✓ Library heatmaps generated successfully!")
+        return
     
-    for side in sides_to_process:
-        print(f"\nProcessing {side} side...")
-        
-        # Filter positions
-        positions = filter_positions(
+    # Load match data
+    print(f"Loading match data from {match_files[0]}...")
+    match_data = load_match_data(match_files[0])
+    
+    # Get map name
+    map_name = match_data.get('header', {}).get('mapName')
+    map_config = get_map_config(map_name)
+    if map_config is None:
+        print(f"Error: No map configuration for map: {map_name}")
+        return
+    print(f"Map: {map_name}")
+    
+    if args.timeline:
+        print(f"\nBinning positions into {args.bucket_seconds:g}s buckets...")
+        counts = build_timeline_counts(
             match_data,
-            side=side,
+            map_config,
+            grid_size=args.grid_size,
+            bucket_seconds=args.bucket_seconds,
             rounds=rounds_filter,
             alive_only=args.alive_only,
             time_window=time_window
         )
+        frames = timeline_view(counts, args.timeline_view, args.window_buckets)
+        print(f"  {counts.shape[0]} buckets, {int(counts.sum())} position samples")
         
-        print(f"  Found {len(positions)} position samples")
-        
-        if not positions:
-            print(f"  Warning: No positions found for {side} side")
-            heatmap_data[side.lower()] = {
-                "grid": [[0] * args.grid_size for _ in range(args.grid_size)],
-                "samples": 0
-            }
-            continue
-        
-        # Create density grid
-        density_grid = create_density_grid(positions, map_config, args.grid_size)
-        heatmap_data[side.lower()] = {
-            "grid": density_grid.tolist(),
-            "samples": len(positions)
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        filters_info = {
+            "side": args.side,
+            "rounds": rounds_filter or "all",
+            "aliveOnly": args.alive_only,
+            "timeWindow": time_window,
+            "gridSize": args.grid_size,
+            "view": args.timeline_view,
+            "windowBuckets": args.window_buckets if args.timeline_view == 'sliding' else None,
+            "normalize": args.normalize
         }
+        export_timeline_json(
+            frames, map_config, filters_info,
+            output_dir / f"heatmap_{map_name}_timeline.json",
+            args.bucket_seconds, normalize=args.normalize, sides=sides_to_process
+        )
+        return
+    
+    # Bin the selected sides on every map level in one pass
+    level_counts = build_level_counts(
+        match_data, map_name, args.grid_size, rounds_filter, args.alive_only, time_window
+    )
+    level_data = level_heatmaps(level_counts, map_config, sides_to_process)
+    heatmap_data = level_data['default']
+    
+    for side in sides_to_process:
+        samples = heatmap_data[side.lower()]['samples']
+        print(f"\n{side} side: {samples} position samples")
+        for level, data in level_data.items():
+            if level != 'default':
+                print(f"  {level} level: {data[side.lower()]['samples']}")
+        if not samples:
+            print(f"  Warning: No positions found for {side} side")
     
     # Generate output paths
     output_dir = Path(args.output_dir)
@@ -406,35 +686,12 @@ def main():
     
     json_path = output_dir / f"heatmap_{map_name}_combined.json"
     
-    # Generate PNG only if not skipped
+    # Generate PNGs only if not skipped (one per map level)
     if not args.skip_png:
-        png_path = output_dir / f"heatmap_{map_name}_combined.png"
-        
-        # Find radar image
-        radar_path = Path(args.radar_dir) / map_config['radarImage'].split('/')[-1]
-        
-        # Generate combined heatmap overlay
-        if args.side == 'both':
-            generate_combined_heatmap(
-                heatmap_data.get('ct', {}).get('grid', np.zeros((args.grid_size, args.grid_size))),
-                heatmap_data.get('t', {}).get('grid', np.zeros((args.grid_size, args.grid_size))),
-                map_config,
-                radar_path,
-                png_path,
-                alpha=args.alpha
-            )
-        else:
-            # Single side
-            side_key = args.side.lower()
-            grid = heatmap_data.get(side_key, {}).get('grid', np.zeros((args.grid_size, args.grid_size)))
-            generate_heatmap_overlay(
-                np.array(grid),
-                map_config,
-                radar_path,
-                png_path,
-                side=args.side,
-                alpha=args.alpha
-            )
+        jobs = level_render_jobs(level_data, map_config, args.radar_dir, output_dir,
+                                 f"heatmap_{map_name}", "combined", args.alpha)
+        for png_path in render_batch(jobs, args.workers):
+            print(f"✓ Heatmap saved to: {png_path}")
     
     # Export combined JSON data
     filters_info = {
@@ -444,7 +701,7 @@ def main():
         "timeWindow": time_window,
         "gridSize": args.grid_size
     }
-    export_combined_json(heatmap_data, map_config, filters_info, json_path)
+    export_combined_json(heatmap_data, map_config, filters_info, json_path, level_data)
     
     print("\n✓ Heatmap generated successfully!")
 
@@ -7,29 +7,11 @@ Generates position density heatmaps overlaid on radar images
 
 import json
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
-from PIL import Image
 import argparse
 from pathlib import Path
 
-# Map configurations (matching your React MAP_CONFIG)
-MAP_CONFIG = {
-    "de_ancient": {
-        "minX": -2953,
-        "maxX": 2119,
-        "minY": -2887,
-        "maxY": 1983,
-        "radarImage": "/radar_images/de_ancient_radar_psd.png",
-    },
-    "de_mirage": {
-        "minX": -3230,
-        "maxX": 1890,
-        "minY": -3407,
-        "maxY": 1682,
-        "radarImage": "/radar_images/de_mirage_radar_psd.png",
-    },
-}
+from maps import get_map_config, position_counts
+from profiling import add_profile_arguments, enable_profiling
 
 
 def load_match_data(json_path):
@@ -98,15 +80,9 @@ def create_density_grid(positions, map_config, grid_size=50):
     if not positions:
         return np.zeros((grid_size, grid_size)), 0
     
-    xs = [p[0] for p in positions]
-    ys = [p[1] for p in positions]
-    
-    x_edges = np.linspace(map_config['minX'], map_config['maxX'], grid_size + 1)
-    y_edges = np.linspace(map_config['minY'], map_config['maxY'], grid_size + 1)
-    
-    hist, _, _ = np.histogram2d(xs, ys, bins=[x_edges, y_edges])
-    
-    hist = np.flipud(hist.T)
+    hist = position_counts(
+        [p[0] for p in positions], [p[1] for p in positions], map_config, grid_size
+    ).astype(np.float64)
     
     # Normalize to 0-1
     if hist.max() > 0:
@@ -149,13 +125,19 @@ def main():
     parser.add_argument('--output-dir', type=str, default='.',
                        help='Output directory (default: current)')
     
+    add_profile_arguments(parser)
+    
     args = parser.parse_args()
+    enable_profiling(args, 'generate_heatmap_per_round')
     
     print(f"Loading match data from {args.json_file}...")
     match_data = load_match_data(args.json_file)
     
-    map_name = match_data.get('header', {}).get('mapName', 'de_ancient')
-    map_config = MAP_CONFIG.get(map_name, MAP_CONFIG['de_ancient'])
+    map_name = match_data.get('header', {}).get('mapName')
+    map_config = get_map_config(map_name)
+    if map_config is None:
+        print(f"Error: No map configuration for map: {map_name}")
+        return
     print(f"Map: {map_name}")
     
     rounds_data = match_data.get('rounds', [])
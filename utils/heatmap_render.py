@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+CS2 Heatmap Renderer
+Composites density grids onto radar images with NumPy and Pillow only:
+radar images are decoded once per map and size, the red/blue colormaps are
+precomputed 256-entry lookup tables (shared with the backend tiles, see
+backend/app/colormap.py) and CT/T layers are alpha-blended directly into
+the radar pixels. Per-round PNGs can be rendered in a
+process pool.
+
+Usage:
+    python heatmap_render.py round_heatmaps_de_mirage.json --radar-dir ../frontend/public/radar_images
+"""
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import backend_path  # noqa: F401  (puts the backend's app package on sys.path)
+from app.colormap import blend
+from profiling import add_profile_arguments, enable_profiling
+
+BACKGROUND = (0x1a, 0x1a, 0x1a)
+DEFAULT_SIZE = 1024
+PNG_COMPRESS_LEVEL = 1  # Fast zlib level; radar PNGs barely shrink at higher levels
+
+
+@lru_cache(maxsize=16)
+def load_radar(radar_image_path, size):
+    """
+    Radar image as an RGB float array (size x size x 3), flattened onto the background
+
+    Cached per path and size; a missing image gives a plain background.
+    """
+    path = Path(radar_image_path)
+    if not path.exists():
+        print(f"Warning: Radar image not found at {radar_image_path}")
+        radar = np.empty((size, size, 3))
+        radar[:] = np.array(BACKGROUND) / 255
+    else:
+        with Image.open(path) as img:
+            background = Image.new('RGBA', img.size, BACKGROUND + (255,))
+            background.alpha_composite(img.convert('RGBA'))
+            rgb = background.convert('RGB').resize((size, size), Image.BILINEAR)
+        radar = np.asarray(rgb, dtype=np.float64) / 255
+    radar.setflags(write=False)
+    return radar
+
+
+def upsample_grid(grid, size):
+    """Resize a density grid to size x size pixels with bicubic interpolation"""
+    grid = np.asarray(grid, dtype=np.float32)
+    if grid.shape != (size, size):
+        grid = np.asarray(Image.fromarray(grid).resize((size, size), Image.BICUBIC))
+    return np.clip(grid, 0.0, 1.0)
+
+
+def blend_layer(canvas, grid, side, alpha=0.6):
+    """
+    Alpha-blend one colorized density layer into an RGB float canvas (in place)
+
+    Args:
+        canvas: size x size x 3 float array
+        grid: Density grid normalized 0-1 (any resolution)
+        side: "CT" or "T" (selects the colormap)
+        alpha: Layer transparency
+    """
+    return blend(canvas, upsample_grid(grid, canvas.shape[0]), side, alpha)
+
+
+def render(layers, radar_image_path, output_path, size=DEFAULT_SIZE, alpha=0.6):
+    """
+    Render density layers over a radar image and save a PNG
+
+    Args:
+        layers: List of (side, grid) drawn in order (later layers on top)
+        radar_image_path: Path to the radar background image
+        output_path: Output PNG path
+        size: Output width and height in pixels
+        alpha: Layer transparency
+    """
+    canvas = load_radar(str(radar_image_path), size).copy()
+    for side, grid in layers:
+        blend_layer(canvas, grid, side, alpha)
+    Image.fromarray((canvas * 255 + 0.5).astype(np.uint8)).save(
+        output_path, compress_level=PNG_COMPRESS_LEVEL
+    )
+    return output_path
+
+
+def render_heatmap(density_grid, radar_image_path, output_path, side='T', alpha=0.6, size=DEFAULT_SIZE):
+    """Render a single-side heatmap PNG"""
+    return render([(side, density_grid)], radar_image_path, output_path, size, alpha)
+
+
+def render_combined_heatmap(ct_grid, t_grid, radar_image_path, output_path, alpha=0.6, size=DEFAULT_SIZE):
+    """Render a combined CT (blue) + T (red, on top) heatmap PNG"""
+    return render([('CT', ct_grid), ('T', t_grid)], radar_image_path, output_path, size, alpha)
+
+
+def _render_job(job):
+    """Pool worker: render one (layers, radar, output, size, alpha) job"""
+    return str(render(*job))
+
+
+def render_batch(jobs, workers=None):
+    """
+    Render many heatmaps in a process pool
+
+    Args:
+        jobs: List of (layers, radar_image_path, output_path, size, alpha) tuples
+        workers: Worker processes (None = CPU count, 1 = render in this process)
+
+    Returns:
+        List of written output paths
+    """
+    if workers == 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (4 * (workers or 4)))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render per-round heatmap PNGs')
+    parser.add_argument('round_heatmaps_json',
+                       help='Per-round heatmaps JSON (from generate_heatmap_per_round.py)')
+    parser.add_argument('--map', type=str, default=None,
+                       help='Map name (default: taken from the file name, e.g. round_heatmaps_de_mirage.json)')
+    parser.add_argument('--radar-dir', type=str, default='./radar_images',
+                       help='Radar images directory (default: ./radar_images)')
+    parser.add_argument('--output-dir', type=str, default='.',
+                       help='Output directory (default: current)')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                       help=f'Image width and height in pixels (default: {DEFAULT_SIZE})')
+    parser.add_argument('--alpha', type=float, default=0.6,
+                       help='Heatmap transparency (default: 0.6)')
+    parser.add_argument('--side', choices=['CT', 'T', 'both'], default='both',
+                       help='Sides to draw (default: both)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: CPU count)')
+
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    enable_profiling(args, 'heatmap_render')
+
+    input_path = Path(args.round_heatmaps_json)
+    with open(input_path, 'r') as f:
+        round_heatmaps = json.load(f)['roundHeatmaps']
+
+    map_name = args.map or input_path.stem.replace('round_heatmaps_', '')
+    radar_path = Path(args.radar_dir) / f"{map_name}_radar_psd.png"
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sides = ['CT', 'T'] if args.side == 'both' else [args.side]
+    jobs = []
+    for round_num, round_data in sorted(round_heatmaps.items(), key=lambda item: int(item[0])):
+        layers = [(side, round_data[side.lower()]['grid']) for side in sides]
+        output_path = output_dir / f"heatmap_{map_name}_round_{int(round_num):02d}.png"
+        jobs.append((layers, str(radar_path), str(output_path), args.size, args.alpha))
+
+    print(f"Rendering {len(jobs)} round heatmaps...")
+    written = render_batch(jobs, args.workers)
+    print(f"\n✓ {len(written)} PNGs saved to: {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,43 @@
+"""
+JSON structure inspector
+
+Prints the structure of a (parser output) JSON file. The file is streamed:
+objects are walked key by key and arrays element by element, so only one
+row at a time is held in memory, plus the first few rows of every array
+that the structure and examples are built from. In the same pass every
+array ("table") gets row counts, per-field type counts, null/missing
+counts and min/max, which makes it usable as a quick pre-ingest check of
+multi-GB dumps (--validate).
+"""
+
 import json
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
 from typing import Union, Dict, Any, List
 
 StructureType = Union[str, Dict[str, Any], List[Any]]
 
+CHUNK_SIZE = 1 << 20  # Characters read from the file at a time
+BATCH_ROWS = 4096  # Rows of a table whose stats are updated together
+MAX_FIELDS = 512  # Distinct fields tracked per table
+VALUE_FIELD = "(value)"  # Stats name of array elements that are not objects
+
+# Fields the backend needs to ingest a demo (see backend/app/bulk_import.py)
+REQUIRED_FIELDS = {
+    "ticks": ("tick", "steamId", "x", "y"),
+    "rounds": ("roundNum", "startTick", "endTick"),
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_TYPE_NAMES = {
+    str: 'string', int: 'number', float: 'number', bool: 'boolean',
+    type(None): 'null', dict: 'object', list: 'array',
+}
+
+
 def get_structure(data: Any, show_example: bool = False, num_examples: int = 2) -> StructureType:
     if isinstance(data, dict):
         structure = {}
@@ -16,7 +51,7 @@ def get_structure(data: Any, show_example: bool = False, num_examples: int = 2)
         if data:
             first = data[0]
             structure = [get_structure(first, show_example, num_examples)]
-            
+
             if show_example:
                 for i in range(min(num_examples, len(data))):
                     structure.append({"__example__": _simplify_example(data[i])})
@@ -43,7 +78,7 @@ def _simplify_example(value: Any, max_depth: int = 3, current_depth: int = 0) ->
         elif isinstance(value, list):
             return ["..."]
         return value
-    
+
     if isinstance(value, str):
         return value
     elif isinstance(value, (int, float, bool)) or value is None:
@@ -55,17 +90,324 @@ def _simplify_example(value: Any, max_depth: int = 3, current_depth: int = 0) ->
     return str(value)
 
 
+class JsonStream:
+    """Buffered text reader that decodes one JSON value or delimiter at a time"""
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.consumed = 0  # Characters dropped from the front of the buffer
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def offset(self) -> int:
+        """Character offset of the read position in the file"""
+        return self.consumed + self.pos
+
+    def _fill(self, size: int) -> bool:
+        """Append up to size characters (dropping what was consumed), False at end of file"""
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, '' at end of file"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def take(self, expected: str) -> str:
+        """Consume the next character, which must be one of expected"""
+        ch = self.peek()
+        if not ch or ch not in expected:
+            raise ValueError(f"Expected one of {expected!r} at offset {self.offset()}, found {ch or 'end of file'!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more of the file until it fits in the buffer"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ValueError(f"Invalid JSON at offset {self.consumed + e.pos}: {e.msg}") from None
+            self._fill(size)
+            size *= 2
+
+
+def _new_table() -> Dict[str, Any]:
+    return {"rows": 0, "objects": 0, "elementTypes": Counter(), "fields": {}, "fieldsTruncated": False}
+
+
+def _new_field() -> Dict[str, Any]:
+    return {"present": 0, "types": Counter(), "min": None, "max": None,
+            "minLength": None, "maxLength": None, "true": 0}
+
+
+def _update_field(stats: Dict[str, Any], values: List[Any]):
+    """Fold one batch of a field's values into its stats"""
+    stats["present"] += len(values)
+    types = Counter(map(type, values))
+    for value_type, count in types.items():
+        stats["types"][_TYPE_NAMES.get(value_type, value_type.__name__)] += count
+
+    if types[int] or types[float]:
+        numbers = values
+        if types[int] + types[float] < len(values) or (types[float] and math.isnan(sum(values))):
+            # Mixed types or NaN: keep only the comparable numbers
+            numbers = [v for v in values if type(v) in (int, float) and v == v]
+        if numbers:
+            low, high = min(numbers), max(numbers)
+            stats["min"] = low if stats["min"] is None else min(stats["min"], low)
+            stats["max"] = high if stats["max"] is None else max(stats["max"], high)
+    if types[str]:
+        lengths = [len(v) for v in values if type(v) is str]
+        low, high = min(lengths), max(lengths)
+        stats["minLength"] = low if stats["minLength"] is None else min(stats["minLength"], low)
+        stats["maxLength"] = high if stats["maxLength"] is None else max(stats["maxLength"], high)
+    if types[bool]:
+        stats["true"] += sum(1 for v in values if v is True)
+
+
+def _update_table(table: Dict[str, Any], rows: List[Any]):
+    """Fold one batch of array elements into the table stats"""
+    if not rows:
+        return
+    table["rows"] += len(rows)
+    table["elementTypes"].update(_TYPE_NAMES.get(type(r), type(r).__name__) for r in rows)
+    objects = [r for r in rows if type(r) is dict]
+    if len(objects) < len(rows):
+        values = [r for r in rows if type(r) is not dict]
+        _update_field(table["fields"].setdefault(VALUE_FIELD, _new_field()), values)
+    if not objects:
+        return
+
+    table["objects"] += len(objects)
+    fields = table["fields"]
+    for key in set().union(*objects):
+        stats = fields.get(key)
+        if stats is None:
+            if len(fields) >= MAX_FIELDS:
+                table["fieldsTruncated"] = True
+                continue
+            stats = fields[key] = _new_field()
+        try:
+            values = [r[key] for r in objects]
+        except KeyError:
+            values = [r[key] for r in objects if key in r]
+        _update_field(stats, values)
+
+
+def _walk(stream: JsonStream, path: str, tables: Dict[str, Dict[str, Any]], keep: int) -> Any:
+    """
+    Stream one value, collecting table stats
+
+    Returns the value with every array cut to its first keep elements, which
+    is all get_structure and the examples look at.
+    """
+    ch = stream.peek()
+    if ch == '{':
+        stream.take('{')
+        node = {}
+        if stream.peek() == '}':
+            stream.take('}')
+            return node
+        while True:
+            key = stream.value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at offset {stream.offset()}")
+            stream.take(':')
+            node[key] = _walk(stream, f"{path}.{key}" if path else key, tables, keep)
+            if stream.take(',}') == '}':
+                return node
+
+    if ch == '[':
+        stream.take('[')
+        table = tables.setdefault(path or "[]", _new_table())
+        kept, batch = table.setdefault("kept", []), []
+        if stream.peek() == ']':
+            stream.take(']')
+            return kept
+        while True:
+            # Elements are decoded whole; one row is the unit of memory
+            item = stream.value()
+            if len(kept) < keep:
+                kept.append(item)
+            batch.append(item)
+            if len(batch) >= BATCH_ROWS:
+                _update_table(table, batch)
+                batch = []
+            if stream.take(',]') == ']':
+                break
+        _update_table(table, batch)
+        return kept
+
+    if not ch:
+        raise ValueError(f"Unexpected end of file at offset {stream.offset()}")
+    return stream.value()
+
+
+def _field_report(stats: Dict[str, Any], rows: int) -> Dict[str, Any]:
+    report = {
+        "types": dict(stats["types"]),
+        "present": stats["present"],
+        "missing": rows - stats["present"],
+        "nulls": stats["types"].get('null', 0),
+    }
+    if stats["min"] is not None:
+        report.update(min=stats["min"], max=stats["max"])
+    if stats["minLength"] is not None:
+        report.update(minLength=stats["minLength"], maxLength=stats["maxLength"])
+    if stats["types"].get('boolean'):
+        report["true"] = stats["true"]
+    return report
+
+
+def inspect_json(file_path: str, num_examples: int = 2, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Structure and per-table stats of a JSON file in one streaming pass
+
+    Args:
+        file_path: JSON file to inspect
+        num_examples: Example rows kept per table
+        chunk_size: Characters read at a time
+
+    Returns:
+        Dict with the structure (as read_json_structure without examples),
+        and for every array path ("ticks", "game.rounds", ...) its row count,
+        element types, per-field stats and the first num_examples rows
+    """
+    started = time.perf_counter()
+    tables: Dict[str, Dict[str, Any]] = {}
+    keep = max(num_examples, 2)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        stream = JsonStream(f, chunk_size)
+        skeleton = _walk(stream, "", tables, keep)
+        if stream.peek():
+            raise ValueError(f"Extra data after the JSON value at offset {stream.offset()}")
+
+    return {
+        "file": str(file_path),
+        "bytes": Path(file_path).stat().st_size,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "topLevel": _TYPE_NAMES.get(type(skeleton), type(skeleton).__name__),
+        "structure": get_structure(skeleton),
+        "tables": {
+            path: {
+                "rows": table["rows"],
+                "elementTypes": dict(table["elementTypes"]),
+                "fields": {
+                    name: _field_report(stats, table["objects"] if name != VALUE_FIELD else table["rows"] - table["objects"])
+                    for name, stats in sorted(table["fields"].items())
+                },
+                "fieldsTruncated": table["fieldsTruncated"],
+                "examples": [_simplify_example(row) for row in table["kept"][:num_examples]],
+            }
+            for path, table in tables.items()
+        },
+    }
+
+
+def validate_report(report: Dict[str, Any]) -> List[str]:
+    """Problems that would keep the backend from ingesting the inspected file (empty if none)"""
+    if report["topLevel"] != 'object':
+        return ["Top-level JSON value is not an object"]
+    structure = report["structure"]
+    prefix = "game." if isinstance(structure.get('game'), dict) else ""
+    if isinstance(structure.get('data'), dict) and isinstance(structure.get('metadata'), dict):
+        # Saved request body ({"metadata": ..., "data": ...})
+        prefix = "data.game." if isinstance(structure['data'].get('game'), dict) else "data."
+
+    problems = []
+    for name, required in REQUIRED_FIELDS.items():
+        table = report["tables"].get(prefix + name)
+        if table is None:
+            problems.append(f"Missing table '{prefix + name}'")
+            continue
+        if not table["rows"]:
+            continue
+        for field in required:
+            stats = table["fields"].get(field)
+            if stats is None:
+                problems.append(f"{prefix + name}: field '{field}' is missing from every row")
+                continue
+            if stats["missing"]:
+                problems.append(f"{prefix + name}: field '{field}' is missing from {stats['missing']} rows")
+            if stats["nulls"]:
+                problems.append(f"{prefix + name}: field '{field}' is null in {stats['nulls']} rows")
+            other = {t: n for t, n in stats["types"].items() if t not in ('number', 'null')}
+            if other:
+                problems.append(f"{prefix + name}: field '{field}' has non-numeric values {other}")
+    return problems
+
+
+def validate_json_file(file_path: str) -> List[str]:
+    """Stream-check that a file is parser output the backend can ingest, returns the problems found"""
+    try:
+        report = inspect_json(file_path, num_examples=0)
+    except (ValueError, UnicodeDecodeError) as e:
+        return [f"Unreadable JSON: {e}"]
+    return validate_report(report)
+
+
 def read_json_structure(file_path: str, show_example: bool = False, num_examples: int = 2) -> StructureType:
     with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+        stream = JsonStream(f)
+        data = _walk(stream, "", {}, max(num_examples, 2))
         return get_structure(data, show_example, num_examples)
 
 
 if __name__ == "__main__":
+    import argparse
+    import sys
+    from profiling import add_profile_arguments, enable_profiling
+
     YOUR_FILE_PATH = "match_data.json"
 
     SHOW_EXAMPLE = True
     NUM_EXAMPLES = 2
 
-    structure = read_json_structure(YOUR_FILE_PATH, show_example=SHOW_EXAMPLE, num_examples=NUM_EXAMPLES)
-    print(json.dumps(structure, indent=4, ensure_ascii=False))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Print the structure of a JSON file')
+    parser.add_argument('file_path', nargs='?', default=YOUR_FILE_PATH,
+                        help=f'JSON file to inspect (default: {YOUR_FILE_PATH})')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print row counts, per-field stats and examples of every table')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check the file can be ingested by the backend (exit status 1 if not)')
+    parser.add_argument('--examples', type=int, default=NUM_EXAMPLES,
+                        help=f'Examples per array (default: {NUM_EXAMPLES})')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    enable_profiling(args, 'json_header_extractor')
+
+    if args.validate:
+        problems = validate_json_file(args.file_path)
+        for problem in problems:
+            print(f"✗ {problem}")
+        if not problems:
+            print(f"✓ {args.file_path} looks ingestible")
+        sys.exit(1 if problems else 0)
+
+    if args.stats:
+        report = inspect_json(args.file_path, num_examples=args.examples)
+        print(json.dumps(report, indent=4, ensure_ascii=False))
+    else:
+        structure = read_json_structure(args.file_path, show_example=SHOW_EXAMPLE, num_examples=args.examples)
+        print(json.dumps(structure, indent=4, ensure_ascii=False))
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+CS2 Map Registry
+The heatmap scripts use the backend's map registry (backend/app/maps.py)
+so bounds, levels and radar images are defined in a single place.
+
+Usage:
+    python maps.py            # list registered maps
+"""
+
+import backend_path  # noqa: F401  (puts the backend's app package on sys.path)
+from app.maps import (  # noqa: E402
+    MAP_CONFIG,
+    RADAR_SIZE,
+    SITE_POLYGONS,
+    get_map_config,
+    grid_transform,
+    level_index,
+    level_names,
+    level_splits,
+    main,
+    position_counts,
+    site_polygon,
+    to_world,
+    world_to_grid,
+)
+
+
+if __name__ == '__main__':
+    main()
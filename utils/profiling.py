@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Shared --profile support for the utils/ CLIs
+
+Usage inside a script's main():
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    enable_profiling(args, 'generate_heatmap')
+
+The whole run is recorded with cProfile; on exit the stats are written to
+the profile directory (keeping the newest MAX_PROFILES files) and the top
+functions by cumulative time are printed.
+"""
+
+import atexit
+import cProfile
+import io
+import pstats
+import re
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_PROFILE_DIR = Path(__file__).parent / "profiles"
+MAX_PROFILES = 20
+TOP_FUNCTIONS = 15
+
+
+def add_profile_arguments(parser):
+    """Add --profile and --profile-dir to an argparse parser"""
+    parser.add_argument('--profile', action='store_true',
+                       help='Profile this run with cProfile')
+    parser.add_argument('--profile-dir', type=str, default=str(DEFAULT_PROFILE_DIR),
+                       help=f'Directory for profile output (default: {DEFAULT_PROFILE_DIR})')
+
+
+def _rotate(profile_dir, keep):
+    """Delete the oldest profiles beyond the retention limit"""
+    profiles = sorted(profile_dir.glob("*.prof"))
+    for old in profiles[:-keep]:
+        old.unlink(missing_ok=True)
+
+
+def _write_profile(profiler, profile_dir, name):
+    """Dump stats, rotate the directory and print a short summary"""
+    profiler.disable()
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-")
+    output_path = profile_dir / f"{timestamp}_{slug}.prof"
+    profiler.dump_stats(str(output_path))
+    _rotate(profile_dir, MAX_PROFILES)
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    print(summary.getvalue())
+    print(f"✓ Profile saved to: {output_path}")
+
+
+def enable_profiling(args, name):
+    """
+    Start profiling if --profile was given
+
+    Args:
+        args: Parsed arguments (from a parser with add_profile_arguments)
+        name: Script name used in the profile file name
+
+    Returns:
+        The running profiler, or None if profiling is off
+    """
+    if not getattr(args, 'profile', False):
+        return None
+    profiler = cProfile.Profile()
+    atexit.register(_write_profile, profiler, Path(args.profile_dir), name)
+    profiler.enable()
+    return profiler